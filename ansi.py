@@ -0,0 +1,210 @@
+"""Drop colour sequences that do not change what the terminal shows.
+
+game.py's colours are each a reset followed by a foreground and a style,
+and its banners switch colour every character or two, so much of the
+output is SGR ("ESC [ ... m") sequences restating the current state.
+SGRMinimizer follows the graphic state a terminal would be in and, just
+before anything else is written, sends the shortest sequence that takes
+the terminal from what it last saw to what the game asked for; runs of
+SGRs collapse into one and no-ops vanish.
+
+It works on raw bytes as they are read, holding back an escape sequence
+split across reads until the rest arrives. Anything it does not model
+(other escape sequences, control bytes) passes through untouched; the
+state is brought up to date first since erasing and scrolling use the
+current background. ESC 7 / ESC 8 save and restore the state along with
+the cursor, as terminals do.
+"""
+import re
+
+# Everything after a CSI introducer up to and including its final byte.
+_csi = re.compile(rb"\x1b\[[0-?]*[ -/]*[@-~]")
+_sgr_params = re.compile(rb"[0-9;]*")
+
+# Longest escape sequence we will hold back waiting for its end.
+MAX_HELD = 256
+
+# SGR code -> the attribute it turns on, and attribute -> its off code.
+_FLAGS = {
+    1: "bold", 2: "dim", 3: "italic", 4: "underline", 5: "blink",
+    7: "inverse", 8: "hidden", 9: "strike",
+}
+_FLAG_OFF = {
+    "italic": 23, "underline": 24, "blink": 25,
+    "inverse": 27, "hidden": 28, "strike": 29,
+}
+
+DEFAULT = (frozenset(), None, None)  # (flags, foreground, background)
+UNKNOWN = None  # the terminal's state is not something we can describe
+
+
+def _apply(state, params):
+    """The state after an SGR with ``params``; UNKNOWN if unmodelled."""
+    flags, fg, bg = state
+    codes = [int(code) if code else 0 for code in params.split(b";")] if params else [0]
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        if code == 0:
+            flags, fg, bg = DEFAULT
+        elif code in _FLAGS:
+            flags = flags | {_FLAGS[code]}
+        elif code == 22:
+            flags = flags - {"bold", "dim"}
+        elif 23 <= code <= 29 and code != 26:
+            flags = flags - {name for name, off in _FLAG_OFF.items() if off == code}
+        elif 30 <= code <= 37 or 90 <= code <= 97:
+            fg = (code,)
+        elif 40 <= code <= 47 or 100 <= code <= 107:
+            bg = (code,)
+        elif code == 39:
+            fg = None
+        elif code == 49:
+            bg = None
+        elif code in (38, 48):
+            # Extended colour: 5;n or 2;r;g;b.
+            size = {5: 3, 2: 5}.get(codes[i + 1] if i + 1 < len(codes) else None)
+            if size is None or i + size > len(codes):
+                return UNKNOWN
+            colour = tuple(codes[i:i + size])
+            if code == 38:
+                fg = colour
+            else:
+                bg = colour
+            i += size - 1
+        else:
+            return UNKNOWN
+        i += 1
+    return flags, fg, bg
+
+
+def _codes(current, wanted):
+    """SGR codes turning ``current`` into ``wanted`` without a reset."""
+    flags, fg, bg = current
+    want_flags, want_fg, want_bg = wanted
+    codes = []
+    if {"bold", "dim"} & (flags - want_flags):
+        # 22 clears bold and dim together.
+        codes.append(22)
+        flags = flags - {"bold", "dim"}
+    for name in sorted(flags - want_flags):
+        codes.append(_FLAG_OFF[name])
+    for code, name in sorted(_FLAGS.items()):
+        if name in want_flags and name not in flags:
+            codes.append(code)
+    if want_fg != fg:
+        codes.extend(want_fg or (39,))
+    if want_bg != bg:
+        codes.extend(want_bg or (49,))
+    return codes
+
+
+def transition(current, wanted):
+    """The shortest SGR sequence from ``current`` to ``wanted`` (bytes)."""
+    if current == wanted or wanted is UNKNOWN:
+        return b""
+    options = [[0] + _codes(DEFAULT, wanted)]
+    if current is not UNKNOWN:
+        options.append(_codes(current, wanted))
+    codes = min(options, key=lambda codes: len(";".join(map(str, codes))))
+    if codes == [0]:
+        return b"\x1b[m"
+    return ("\x1b[%sm" % ";".join(map(str, codes))).encode()
+
+
+class SGRMinimizer:
+    """Streaming SGR optimiser for one terminal's output."""
+
+    def __init__(self, state=DEFAULT):
+        self._shown = state  # what the terminal has been told
+        self._wanted = state  # what the stream has asked for since
+        self._saved = state
+        self._held = b""
+
+    def feed(self, data):
+        """Optimise ``data``; returns the bytes to send on.
+
+        Colour changes at the very end are sent too, so whatever the user
+        types next appears in the right colour.
+        """
+        data = self._held + data
+        self._held = b""
+        out = bytearray()
+        pos = 0
+        while True:
+            esc = data.find(b"\x1b", pos)
+            if esc == -1:
+                self._content(out, data[pos:])
+                break
+            self._content(out, data[pos:esc])
+            match = _csi.match(data, esc)
+            if match:
+                self._sequence(out, match.group(), data[esc + 2:match.end() - 1])
+                pos = match.end()
+                continue
+            if esc + 1 >= len(data) or (data[esc + 1:esc + 2] == b"[" and _incomplete(data, esc)):
+                # Cut off by the end of this read.
+                if len(data) - esc <= MAX_HELD:
+                    self._held = data[esc:]
+                    break
+            self._escape(out, data[esc:esc + 2])
+            pos = esc + 2
+        self._sync(out)
+        return bytes(out)
+
+    def flush(self):
+        """Anything held back, for when no more data is coming."""
+        held, self._held = self._held, b""
+        return held
+
+    def restore(self):
+        """An SGR putting a freshly reset terminal in the current state."""
+        return transition(DEFAULT, self._wanted)
+
+    def _sync(self, out):
+        out += transition(self._shown, self._wanted)
+        self._shown = self._wanted
+
+    def _content(self, out, text):
+        if text:
+            self._sync(out)
+            out += text
+
+    def _sequence(self, out, seq, params):
+        if not seq.endswith(b"m") or params[:1] in (b"<", b"=", b">", b"?"):
+            self._content(out, seq)
+            if seq == b"\x1b[!p":
+                # Soft reset clears the graphic state too.
+                self._shown = self._wanted = DEFAULT
+            return
+        base = self._wanted
+        if base is UNKNOWN and not params.split(b";")[0].strip(b"0"):
+            # Starts with a reset, so the state is known again.
+            base = DEFAULT
+        state = UNKNOWN
+        if base is not UNKNOWN and _sgr_params.fullmatch(params):
+            state = _apply(base, params)
+        if state is not UNKNOWN:
+            self._wanted = state
+            return
+        # Not something we model: pass it on and stop assuming anything.
+        self._sync(out)
+        out += seq
+        self._shown = self._wanted = UNKNOWN
+
+    def _escape(self, out, seq):
+        self._content(out, seq)
+        if seq == b"\x1b7":
+            self._saved = self._shown
+        elif seq == b"\x1b8":
+            self._shown = self._wanted = self._saved
+        elif seq == b"\x1bc":
+            self._shown = self._wanted = DEFAULT
+
+
+def _incomplete(data, esc):
+    """True if the CSI at ``esc`` runs to the end of ``data`` unfinished."""
+    for byte in data[esc + 2:]:
+        if not 0x20 <= byte <= 0x3F:
+            return False
+    return True
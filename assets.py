@@ -0,0 +1,188 @@
+"""Maps and banners, compiled once and cached on disk.
+
+Each asset's source lives in assets/<name>.txt with colours written as
+{{colourName}}. The first time an asset is used in a process it is
+looked up in the on-disk cache by a hash of its source and the palette,
+or compiled (colours substituted, encoded) and written there, replacing
+the entries for older versions of it. The result
+is kept in memory and shared, read-only, by every session in the
+process; the zygote preloads them all so forked children share the same
+pages.
+
+Games run by the server do not print assets at all: they send an
+``asset`` event naming the asset by a hash of the bytes it prints (see
+asset_id()), and the server, which has the same assets loaded, sends the
+bytes on only to browsers that do not have them cached yet.
+"""
+import hashlib
+import os
+import re
+import threading
+
+from colorama import Back, Fore, Style
+
+from ansi import UNKNOWN, SGRMinimizer
+
+dimWhite = Style.RESET_ALL + Fore.WHITE + Style.DIM
+brightWhite = Style.RESET_ALL + Fore.WHITE + Style.BRIGHT
+normalWhite = Style.RESET_ALL + Fore.WHITE + Style.NORMAL
+dimRed = Style.RESET_ALL + Fore.RED + Style.DIM
+brightRed = Style.RESET_ALL + Fore.RED + Style.BRIGHT
+brightGreen = Style.RESET_ALL + Fore.GREEN + Style.BRIGHT
+brightBlue = Style.RESET_ALL + Fore.BLUE + Style.BRIGHT
+brightCyan = Style.RESET_ALL + Fore.CYAN + Style.BRIGHT
+brightMagenta = Style.RESET_ALL + Fore.MAGENTA + Style.BRIGHT
+dimMagenta = Style.RESET_ALL + Fore.MAGENTA + Style.DIM
+brightYellow = Style.RESET_ALL + Fore.YELLOW + Style.BRIGHT
+
+palette = {
+    "dimWhite": dimWhite,
+    "brightWhite": brightWhite,
+    "normalWhite": normalWhite,
+    "dimRed": dimRed,
+    "brightRed": brightRed,
+    "brightGreen": brightGreen,
+    "brightBlue": brightBlue,
+    "brightCyan": brightCyan,
+    "brightMagenta": brightMagenta,
+    "dimMagenta": dimMagenta,
+    "brightYellow": brightYellow,
+    "resetBackground": Back.RESET,
+}
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+CACHE_DIR = os.environ.get(
+    "ASSET_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asset-cache"),
+)
+
+_colour = re.compile(r"\{\{(\w+)\}\}")
+_loaded = {}
+_lock = threading.Lock()
+
+
+def compile_source(source):
+    """Substitute the palette into asset markup; returns the final bytes."""
+    return _colour.sub(lambda m: palette[m.group(1)], source).encode("utf-8")
+
+
+def _palette_digest():
+    return "".join("%s=%s;" % item for item in sorted(palette.items()))
+
+
+def _load(name):
+    with open(os.path.join(SOURCE_DIR, name + ".txt"), encoding="utf-8", newline="") as f:
+        source = f.read()
+    digest = hashlib.sha256((_palette_digest() + source).encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(CACHE_DIR, "%s.%s.bin" % (name, digest))
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+    data = compile_source(source)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        _prune(name, digest)
+    except OSError:
+        # Read-only checkout: compile in memory every start instead.
+        pass
+    return data
+
+
+def _prune(name, digest):
+    """Remove cached versions of ``name`` other than ``digest``."""
+    for filename in os.listdir(CACHE_DIR):
+        parts = filename.split(".")
+        if len(parts) == 3 and parts[0] == name and parts[2] == "bin" and parts[1] != digest:
+            try:
+                os.remove(os.path.join(CACHE_DIR, filename))
+            except OSError:
+                pass
+
+
+def asset_bytes(name):
+    """The compiled bytes of asset ``name``, loaded on first use."""
+    data = _loaded.get(name)
+    if data is None:
+        with _lock:
+            data = _loaded.get(name)
+            if data is None:
+                data = _loaded[name] = _load(name)
+    return data
+
+
+_text = {}
+
+
+def asset(name):
+    """Asset ``name`` as text, ready to print."""
+    text = _text.get(name)
+    if text is None:
+        text = _text[name] = asset_bytes(name).decode("utf-8")
+    return text
+
+
+class Asset:
+    """A reference to an asset that is only loaded when printed."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return asset(self.name)
+
+
+_printed = {}
+_ids = {}  # asset_id -> name
+_preloaded = False
+
+
+def printed_bytes(name):
+    """What printing asset ``name`` sends to a terminal (newlines as CR LF).
+
+    Redundant colour sequences are already taken out, assuming nothing
+    about the colours in effect before it.
+    """
+    data = _printed.get(name)
+    if data is None:
+        sgr = SGRMinimizer(UNKNOWN)
+        data = asset_bytes(name).replace(b"\n", b"\r\n")
+        data = _printed[name] = sgr.feed(data) + sgr.flush()
+    return data
+
+
+def asset_id(name):
+    """Content hash naming asset ``name`` in caches outside this process."""
+    data = printed_bytes(name)
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    _ids[digest] = name
+    return digest
+
+
+def find(digest):
+    """The printed bytes of the asset with id ``digest``, or None.
+
+    Once every asset has been loaded an unknown id is not looked for
+    again, so a session sending bad ids costs a dict lookup each.
+    """
+    if digest not in _ids and not _preloaded:
+        preload()
+    name = _ids.get(digest)
+    return printed_bytes(name) if name else None
+
+
+def preload():
+    """Load every asset now (the zygote does this before forking)."""
+    global _preloaded
+    for filename in sorted(os.listdir(SOURCE_DIR)):
+        if filename.endswith(".txt"):
+            asset(filename[:-4])
+            asset_id(filename[:-4])
+    _preloaded = True
@@ -0,0 +1,79 @@
+"""Time loading assets and rendering junction maps, cold and cached.
+
+- assets: preload() with an empty on-disk cache (every asset compiled),
+  with a warm one (every asset read back), and find() for a known and an
+  unknown id once everything is loaded;
+- maps: a generated maze's view for half its junctions, rendered the
+  first time and then taken from MazeMap's LRU cache.
+
+    python3 bench_assets.py [--maze WxH] [--junctions N] [--repeat N]
+"""
+import argparse
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+import assets
+from mazemap import MazeMap, generate
+
+
+def timed(function, repeat=1):
+    """Seconds per call of ``function``, averaged over ``repeat`` calls."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def fresh_assets(cache_dir):
+    """The assets module as a new process has it, caching in ``cache_dir``."""
+    os.environ["ASSET_CACHE_DIR"] = cache_dir
+    return importlib.reload(assets)
+
+
+def bench_assets(repeat):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        compiled = timed(fresh_assets(cache_dir).preload)
+        read = timed(fresh_assets(cache_dir).preload)
+        module = fresh_assets(cache_dir)
+        module.preload()
+        digest = module.asset_id("title")
+        found = timed(lambda: module.find(digest), repeat)
+        missing = timed(lambda: module.find("0000000000000000"), repeat)
+    print("assets (%d)" % len([name for name in os.listdir(assets.SOURCE_DIR) if name.endswith(".txt")]))
+    print("  preload, empty disk cache  %10.2f ms" % (compiled * 1e3))
+    print("  preload, warm disk cache   %10.2f ms" % (read * 1e3))
+    print("  find, known id             %10.2f us" % (found * 1e6))
+    print("  find, unknown id           %10.2f us" % (missing * 1e6))
+
+
+def bench_maps(width, height, junctions, repeat):
+    drawing = generate(width, height, junctions, random.Random(1))
+    maze_map = MazeMap(drawing)
+    visited = frozenset(range(1, junctions // 2 + 1))
+    here = max(visited)
+    cold = timed(lambda: maze_map.view(visited, here))
+    cached = timed(lambda: maze_map.view(visited, here), repeat)
+    print("maps (%dx%d cells, %d junctions, view of %d)" % (width, height, junctions, len(visited)))
+    print("  view, first render         %10.2f ms" % (cold * 1e3))
+    print("  view, cached               %10.2f us" % (cached * 1e6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--maze", default="200x200", help="size of the generated maze in cells (default 200x200)")
+    parser.add_argument("--junctions", type=int, default=400, help="junctions in the generated maze (default 400)")
+    parser.add_argument("--repeat", type=int, default=10000, help="calls averaged for the cached timings")
+    args = parser.parse_args()
+    width, height = (int(n) for n in args.maze.lower().split("x"))
+    bench_assets(args.repeat)
+    print()
+    bench_maps(width, height, args.junctions, args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
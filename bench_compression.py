@@ -0,0 +1,160 @@
+"""Compare ways of compressing what the server sends a browser.
+
+Plays game.py through scripted sessions without sleeping, collects the
+messages the server would send (coalesced output after SGR minimising,
+game events as JSON, assets inline on a first visit and by reference on
+a return visit) and compresses each session's stream with:
+
+- none: as sent;
+- ws-deflate: permessage-deflate with context takeover, as browsers and
+  the server negotiate by default;
+- ws-deflate-no-context: permessage-deflate, each message on its own;
+- dictionary: main.py's --compression dictionary, a raw deflate stream
+  primed with compression.dictionary().
+
+For each it prints the bytes on the wire, the ratio, the CPU time to
+compress a session and the compressor's memory (zlib's documented
+figure; it is allocated in C and invisible to tracemalloc).
+
+    python3 bench_compression.py [--repeat N]
+"""
+import argparse
+import json
+import sys
+import time
+import zlib
+
+import assets
+import compression
+import game
+from ansi import SGRMinimizer
+
+PATHS = {
+    "escape": ["left", "right", "left", "left", "yes", "right", "left", "b", "right", "right", "true", "left", "left", "no"],
+    "death": ["x"] * 4 + ["left", "left", "a", "left", "left", "c", "left", "right", "false"],
+    "short": ["right", "left", "no"],
+}
+
+
+class Recorder:
+    """A game console that records the messages the server would send."""
+
+    events = True
+
+    def __init__(self, inputs, cached):
+        self.inputs = iter(inputs)
+        self.cached = cached
+        self.messages = []
+        self.pending = bytearray()
+        self.sgr = SGRMinimizer()
+
+    def print(self, *args, sep=" ", end="\n", file=None, flush=False):
+        text = sep.join(str(arg) for arg in args) + end
+        self.pending += self.sgr.feed(text.replace("\n", "\r\n").encode())
+
+    def input(self, prompt=""):
+        self.flush()
+        try:
+            return next(self.inputs)
+        except StopIteration:
+            raise SystemExit
+
+    def sleep(self, seconds):
+        self.flush()
+
+    def event(self, event):
+        self.flush()
+        if event.get("type") == "asset":
+            event = self.asset(event)
+        elif event.get("type") == "scene":
+            steps = []
+            for at, item in event["steps"]:
+                if isinstance(item, str):
+                    item = self.sgr.feed(item.encode()).decode()
+                elif item.get("type") == "asset":
+                    item = self.asset(item)
+                steps.append([at, item])
+            event = dict(event, steps=steps)
+        self.messages.append(json.dumps(event, default=compression._text).encode())
+
+    def asset(self, event):
+        data = assets.find(event["id"])
+        self.sgr.feed(data)
+        event = dict(event, size=len(data))
+        if event["id"] not in self.cached:
+            self.cached.add(event["id"])
+            event["data"] = data
+        return event
+
+    def flush(self):
+        if self.pending:
+            self.messages.append(bytes(self.pending))
+            self.pending.clear()
+
+
+def record(inputs, cached):
+    recorder = Recorder(inputs, cached)
+    token = game.console.set(recorder)
+    try:
+        game.main([])
+    except SystemExit:
+        pass
+    finally:
+        game.console.reset(token)
+    recorder.flush()
+    return recorder.messages
+
+
+def none(messages):
+    return sum(len(message) for message in messages)
+
+
+def ws_deflate(messages, takeover=True):
+    deflate = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    size = 0
+    for message in messages:
+        if not takeover:
+            deflate = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        # The trailing 00 00 ff ff of the sync flush is left off the wire.
+        size += len(deflate.compress(message) + deflate.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return size
+
+
+def dictionary(messages):
+    compressor = compression.Compressor()
+    return sum(len(compressor.compress(message)) for message in messages)
+
+
+SCHEMES = [
+    ("none", none),
+    ("ws-deflate", ws_deflate),
+    ("ws-deflate-no-context", lambda messages: ws_deflate(messages, takeover=False)),
+    ("dictionary", dictionary),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20, help="times each session is compressed when timing")
+    args = parser.parse_args()
+    print("dictionary: %d bytes, id %s" % (len(compression.dictionary()), compression.dictionary_id()))
+    print("compressor memory: deflate (1 << (windowBits + 2)) + (1 << (memLevel + 9)) = 256 KiB per connection\n")
+    print("%-8s %-7s %-22s %8s %6s %11s" % ("path", "visit", "scheme", "bytes", "ratio", "cpu/session"))
+    for name, inputs in PATHS.items():
+        cached = set()
+        for visit in ("first", "return"):
+            messages = record(inputs, cached)
+            raw = none(messages)
+            for scheme, measure in SCHEMES:
+                size = measure(messages)
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    measure(messages)
+                cpu = (time.perf_counter() - start) / args.repeat
+                print("%-8s %-7s %-22s %8d %5.1fx %9.2fms" % (name, visit, scheme, size, raw / size, cpu * 1000))
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
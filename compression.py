@@ -0,0 +1,108 @@
+"""Deflate primed with a dictionary of what the game is going to say.
+
+Browsers already get every websocket message compressed with
+permessage-deflate, which learns the game's colour codes and phrases as
+a session goes on but starts every connection from nothing. In the
+optional "dictionary" mode the server instead deflates everything it
+sends a browser as one raw deflate stream whose window starts out holding
+a preset dictionary: the game's story text, its assets and the colour
+sequences and event JSON it emits, built from game.py and assets/ and
+served to the browser at /output-dictionary. The first map, banner and
+paragraph then compress as well as the hundredth.
+
+bench_compression.py compares the two on a scripted game.
+"""
+import ast
+import functools
+import hashlib
+import json
+import os
+import zlib
+
+import assets
+from ansi import UNKNOWN, SGRMinimizer
+
+# The deflate window: a dictionary longer than this cannot be used.
+MAX_SIZE = 32768
+# Strings in game.py shorter than this are mostly keys, not text.
+MIN_TEXT = 16
+
+_here = os.path.dirname(os.path.abspath(__file__))
+
+
+def _game_text():
+    """The string constants in game.py long enough to be story text."""
+    with open(os.path.join(_here, "game.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    seen = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            text = node.value
+            if len(text) >= MIN_TEXT and text not in seen and "\x1b" not in text:
+                seen.add(text)
+                yield text
+
+
+def _snippets():
+    """Colour sequences and event JSON, as they appear on the wire."""
+    colours = set()
+    for value in assets.palette.values():
+        sgr = SGRMinimizer(UNKNOWN)
+        colours.add(sgr.feed(value.encode()))
+    events = [
+        {"type": "title", "name": "junction1:"},
+        {"type": "state", "lives": 3, "visits": [1, 2]},
+        {"type": "outcome", "question": "question1", "correct": True},
+        {"type": "asset", "id": "0123456789abcdef", "size": 100},
+    ]
+    return sorted(colours) + [json.dumps(event).encode() for event in events]
+
+
+@functools.lru_cache(maxsize=1)
+def dictionary():
+    """The preset dictionary (bytes), built once per process.
+
+    Deflate finds matches closer to the end of the window more cheaply,
+    so what every session sends comes last.
+    """
+    parts = []
+    for name in _asset_names():
+        parts.append(assets.printed_bytes(name))
+    for text in _game_text():
+        parts.append(text.replace("\n", "\r\n").encode())
+    parts.extend(_snippets())
+    return b"".join(parts)[-MAX_SIZE:]
+
+
+def _asset_names():
+    return sorted(name[:-4] for name in os.listdir(assets.SOURCE_DIR) if name.endswith(".txt"))
+
+
+def dictionary_id():
+    """A hash naming this version of the dictionary."""
+    return hashlib.sha256(dictionary()).hexdigest()[:16]
+
+
+class Compressor:
+    """One connection's raw deflate stream, primed with the dictionary.
+
+    Each message is flushed so the browser can inflate it on arrival; the
+    window carries over from one message to the next, as with
+    permessage-deflate's context takeover.
+    """
+
+    def __init__(self, level=6):
+        self._deflate = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary())
+
+    def compress(self, data):
+        return self._deflate.compress(data) + self._deflate.flush(zlib.Z_SYNC_FLUSH)
+
+    def compress_event(self, event):
+        """``event`` as compressed JSON; bytes in it are sent as text."""
+        return self.compress(json.dumps(event, default=_text).encode())
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    raise TypeError("%r is not JSON serializable" % (value,))
@@ -0,0 +1,104 @@
+"""Structured game events carried alongside the game's terminal output.
+
+game.py reports its state (title, lives, visited junctions, question
+outcomes) and whole paced scenes as events. On a PTY they travel in the
+output stream as APC frames,
+
+    ESC _ game:{"type": "title", "name": "junction1:"} ESC \\
+
+which terminals are required to ignore, so nothing else has to agree on
+a second channel. FrameParser takes them back out on the server in
+stream order, even when a frame is split across reads; the JSON never
+contains a raw ESC, since json.dumps escapes control characters. A frame
+that does not hold a JSON object is passed on to the terminal as it is. Games
+hosted in-process skip the framing and hand their events over directly.
+"""
+import json
+import logging
+
+PREFIX = b"\x1b_game:"
+END = b"\x1b\\"
+APC = b"\x1b_"
+
+# A frame that never ends is not ours; give up on it past this size.
+MAX_FRAME = 1 << 20
+
+
+def frame(event):
+    """Encode ``event`` (a dict with a "type") as an APC frame string."""
+    return "\x1b_game:" + json.dumps(event, separators=(",", ":")) + "\x1b\\"
+
+
+class FrameParser:
+    """Split a byte stream into terminal output and decoded events."""
+
+    def __init__(self):
+        self._held = b""
+
+    def feed(self, data):
+        """Return the output bytes and event dicts in ``data``, in order.
+
+        The tail of ``data`` that may be the start of a frame is held back
+        until the next call.
+        """
+        data = self._held + data
+        self._held = b""
+        items = []
+        start = 0
+        while True:
+            begin = data.find(APC, start)
+            if begin == -1:
+                tail = _partial_prefix(data, start)
+                if tail < len(data):
+                    self._held = data[tail:]
+                if tail > start:
+                    items.append(data[start:tail])
+                return items
+            if data[begin:begin + len(PREFIX)] != PREFIX[:len(data) - begin]:
+                # Some other APC string: pass it through to the terminal.
+                items.append(data[start:begin + len(APC)])
+                start = begin + len(APC)
+                continue
+            end = data.find(END, begin)
+            if end == -1:
+                if len(data) - begin > MAX_FRAME:
+                    items.append(data[start:])
+                    return items
+                if begin > start:
+                    items.append(data[start:begin])
+                self._held = data[begin:]
+                return items
+            try:
+                event = json.loads(data[begin + len(PREFIX):end])
+            except ValueError:
+                event = None
+            if isinstance(event, dict):
+                if begin > start:
+                    items.append(data[start:begin])
+                items.append(event)
+            else:
+                # Not an event (any program on the PTY can write one): the
+                # terminal ignores it as it would any APC string.
+                logging.warning("passing on malformed game event frame")
+                items.append(data[start:end + len(END)])
+            start = end + len(END)
+
+    def flush(self):
+        """Output held back, for when no more data is coming.
+
+        A game frame cut off by the end of the stream cannot be decoded
+        and is dropped; a fragment that was only possibly one is output.
+        """
+        held, self._held = self._held, b""
+        if held.startswith(PREFIX):
+            logging.warning("dropping unfinished game event frame")
+            return b""
+        return held
+
+
+def _partial_prefix(data, start):
+    """Where a trailing fragment of PREFIX begins in ``data`` (or its end)."""
+    for size in range(min(len(PREFIX) - 1, len(data) - start), 0, -1):
+        if data.endswith(PREFIX[:size]):
+            return len(data) - size
+    return len(data)
@@ -0,0 +1,270 @@
+"""Per-session pipelines between a PTY and its Socket.IO client.
+
+Raw PTY bytes are batched here so a burst of small print() calls becomes
+one binary Socket.IO packet. Bytes are forwarded undecoded: the browser
+keeps a streaming UTF-8 decoder per session, so a multi-byte character
+split across two reads is reassembled instead of dropped.
+
+The browser acknowledges each packet once xterm.js has rendered it, and
+OutboundWindow uses those acks to stop reading a session's PTY while too
+much output is still in flight.
+
+In the other direction, InputQueue writes keystrokes to the non-blocking
+PTY only as fast as it accepts them and as a per-session rate limit
+allows, so a paste flood from one browser never blocks the server.
+
+Scrollback keeps a compressed copy of the most recent output so a browser
+that reconnects can be brought back up to date without a new game.
+"""
+import collections
+import os
+import threading
+import time
+import zlib
+
+
+class OutputCoalescer:
+    """Batch output until ``window`` seconds pass or ``max_bytes`` pile up.
+
+    ``send(data)`` is called with each batch, always from the reactor.
+    """
+
+    def __init__(self, reactor, send, window=0.005, max_bytes=16384):
+        self.reactor = reactor
+        self.send = send
+        self.window = window
+        self.max_bytes = max_bytes
+        self._buffer = bytearray()
+        self._timer = None
+
+    @property
+    def pending(self):
+        """Bytes read from the PTY but not yet sent."""
+        return len(self._buffer)
+
+    def feed(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self.max_bytes or self.window <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._timer = self.reactor.call_later(self.window, self.flush)
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            self.send(data)
+
+    def close(self):
+        """Drop any pending output and cancel the flush timer."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._buffer.clear()
+
+
+class OutboundWindow:
+    """Bytes sent to one browser but not yet acknowledged, with watermarks.
+
+    ``pause()`` is called once ``high`` bytes are in flight and ``resume()``
+    once acks bring that back down to ``low``; in between the session's
+    PTY is left unread so memory per session stays bounded.
+    """
+
+    def __init__(self, pause, resume, high=65536, low=16384):
+        self.pause = pause
+        self.resume = resume
+        self.high = high
+        self.low = min(low, high)
+        self.inflight = 0
+        self.paused = False
+        self._lock = threading.Lock()
+
+    def sent(self, size):
+        with self._lock:
+            self.inflight += size
+            pause = not self.paused and self.inflight >= self.high
+            if pause:
+                self.paused = True
+        if pause:
+            self.pause()
+
+    def acked(self, size):
+        with self._lock:
+            self.inflight = max(0, self.inflight - size)
+            resume = self.paused and self.inflight <= self.low
+            if resume:
+                self.paused = False
+        if resume:
+            self.resume()
+
+
+class InputQueue:
+    """Browser input waiting to be written to a session's non-blocking PTY.
+
+    Writes are limited to ``rate`` bytes per second (with up to one second
+    of burst) and at most ``max_bytes`` may wait in the queue. ``push()``
+    never blocks: a chunk that does not fit is rejected whole, so a paste
+    is either delivered completely or not at all. ``on_error(exc)`` is
+    called if a PTY write fails. ``written`` counts the bytes that reached
+    the PTY; ``on_write(written)``, if set, is called after every write.
+    """
+
+    def __init__(self, reactor, fd, on_error, rate=2048, max_bytes=8192):
+        self.reactor = reactor
+        self.fd = fd
+        self.on_error = on_error
+        self.rate = rate
+        self.max_bytes = max_bytes
+        self._buffer = bytearray()
+        self._tokens = float(rate)
+        self._stamp = time.monotonic()
+        self._timer = None
+        self._waiting_writable = False
+        self._closed = False
+        self._lock = threading.Lock()
+        self.written = 0
+        self.on_write = None
+
+    @property
+    def pending(self):
+        return len(self._buffer)
+
+    def push(self, data):
+        """Queue ``data``; returns False (dropping it) if the queue is full."""
+        with self._lock:
+            if self._closed or len(self._buffer) + len(data) > self.max_bytes:
+                return False
+            self._buffer += data
+        self._drain()
+        return True
+
+    def _drain(self):
+        try:
+            with self._lock:
+                self._write_some()
+        except OSError as exc:
+            self.close()
+            self.on_error(exc)
+
+    def _write_some(self):
+        if self._closed or not self._buffer:
+            return
+        now = time.monotonic()
+        self._tokens = min(float(self.rate), self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        allowed = min(len(self._buffer), int(self._tokens))
+        written = 0
+        if allowed:
+            try:
+                written = os.write(self.fd, self._buffer[:allowed])
+            except BlockingIOError:
+                pass
+        del self._buffer[:written]
+        self._tokens -= written
+        if written:
+            self.written += written
+            if self.on_write is not None:
+                self.on_write(self.written)
+        # Wait for the PTY when the kernel took less than we offered,
+        # otherwise for the rate limit to hand out more tokens.
+        wait_writable = bool(self._buffer) and written < allowed
+        if wait_writable != self._waiting_writable:
+            self._waiting_writable = wait_writable
+            if wait_writable:
+                self.reactor.add_writer(self.fd, lambda _fd: self._drain())
+            else:
+                self.reactor.remove_writer(self.fd)
+        if self._buffer and not wait_writable and self._timer is None:
+            delay = max(0.001, (1 - self._tokens) / self.rate)
+            self._timer = self.reactor.call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._drain()
+
+    def close(self):
+        """Drop queued input and stop waiting on the PTY."""
+        with self._lock:
+            self._closed = True
+            self._buffer.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._waiting_writable:
+                self._waiting_writable = False
+                self.reactor.remove_writer(self.fd)
+
+
+class Scrollback:
+    """Bounded ring of a session's most recent output, compressed in blocks.
+
+    Output is addressed by stream offset (bytes sent since the session
+    started). Up to ``max_bytes`` of the newest output is retained; it is
+    zlib-compressed in ``block_size`` chunks, so the real memory cost is a
+    fraction of that for a terminal game's repetitive output.
+
+    Output relies on colours set before it, which a replay from the start
+    of what is kept has lost. Given a ``tracker`` (an ansi.SGRMinimizer),
+    each block remembers the SGR that recreates the state at its start,
+    available as ``prologue``.
+    """
+
+    def __init__(self, max_bytes=262144, block_size=16384, tracker=None):
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.tracker = tracker
+        self.total = 0
+        self._blocks = collections.deque()  # (start offset, raw length, zlib data, prologue)
+        self._tail = bytearray()
+        self._tail_prologue = b""
+        self._lock = threading.Lock()
+
+    @property
+    def start(self):
+        """Offset of the oldest byte still retained."""
+        if self._blocks:
+            return self._blocks[0][0]
+        return self.total - len(self._tail)
+
+    @property
+    def prologue(self):
+        """What to send ahead of a replay from ``start`` to set its colours."""
+        if self._blocks:
+            return self._blocks[0][3]
+        return self._tail_prologue
+
+    @property
+    def compressed_size(self):
+        return sum(len(block[2]) for block in self._blocks) + len(self._tail)
+
+    def append(self, data):
+        with self._lock:
+            self._tail += data
+            self.total += len(data)
+            while len(self._tail) >= self.block_size:
+                chunk = bytes(self._tail[: self.block_size])
+                del self._tail[: self.block_size]
+                start = self.total - len(self._tail) - len(chunk)
+                self._blocks.append((start, len(chunk), zlib.compress(chunk, 6), self._tail_prologue))
+                if self.tracker:
+                    self.tracker.feed(chunk)
+                    self._tail_prologue = self.tracker.restore()
+            while self._blocks and self.total - self._blocks[0][0] - self._blocks[0][1] >= self.max_bytes:
+                self._blocks.popleft()
+
+    def since(self, offset):
+        """Everything retained from ``offset`` on (clamped to what is kept)."""
+        with self._lock:
+            parts = []
+            for start, length, data, _ in self._blocks:
+                if start + length <= offset:
+                    continue
+                raw = zlib.decompress(data)
+                parts.append(raw[max(0, offset - start):])
+            tail_start = self.total - len(self._tail)
+            parts.append(bytes(self._tail[max(0, offset - tail_start):]))
+            return b"".join(parts)
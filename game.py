@@ -1,175 +1,126 @@
 #!/.env/bin/python3
+import argparse
+import builtins
+import contextlib
+import contextvars
+import functools
+import os
+import random
 import sys
-from time import sleep
-from colorama import Back, Fore, Style
-
-dimWhite = Style.RESET_ALL+Fore.WHITE+Style.DIM
-brightWhite = Style.RESET_ALL+Fore.WHITE+Style.BRIGHT
-normalWhite = Style.RESET_ALL+Fore.WHITE+Style.NORMAL
-dimRed = Style.RESET_ALL+Fore.RED+Style.DIM
-brightRed = Style.RESET_ALL+Fore.RED+Style.BRIGHT
-brightGreen = Style.RESET_ALL+Fore.GREEN+Style.BRIGHT
-brightBlue = Style.RESET_ALL+Fore.BLUE+Style.BRIGHT
-brightCyan = Style.RESET_ALL+Fore.CYAN+Style.BRIGHT
-brightMagenta = Style.RESET_ALL+Fore.MAGENTA+Style.BRIGHT
-dimMagenta = Style.RESET_ALL+Fore.MAGENTA+Style.DIM
-brightYellow = Style.RESET_ALL+Fore.YELLOW+Style.BRIGHT
-
-lives = 3
-retries = 0
-startMap = dimWhite+ """: - - : -- :
-|      
-:     :
-|  """+ brightRed +"^" +dimWhite+ """  |
-: - - :""" +brightGreen
-j1Map = dimWhite+ """: -- : - - :
-|          |
-:    :     :
-|    |     | 
-: -- :  """+ brightRed +"V" +dimWhite+ """  : -- :
-|               
-:    : - - : -- :"""+brightGreen
-j12Map =dimWhite+ """: -- : -- :
-|         |
-:    :    : 
-|    |    |
-: -- :    : -- :    
-|                   
-:    : -- : -- : 
-|         |         |
-: -- :    : -- :    :
-     |        """+ brightRed +">" +dimWhite+ """     |
-     : -- : -- :    :"""+brightGreen
-j121Map =dimWhite+ """: -- : - - :
-|          |
-:    :     : 
-|    |     |
-: -- :  """+ brightRed +"V" +dimWhite+ """  : -- :    
-|                   
-:    : - - : -- : 
-|          |         |
-: -- :     : -- :    :
-     |               |
-     : - - : -- :    :"""+brightGreen
-j13Map = dimWhite+ """: -- : -- :    :     :    :
-|         |    |     |
-:    :    :    : - - :    :
-|    |    |               |
-: -- :    : -- :  """+ brightRed +"^" +dimWhite+ """  : -- :
-|                    |
-:    : -- : -- : - - :"""+brightGreen
-j123Map = dimWhite+ """: -- : -- :    :    :    :
-|         |    |     |
-:    :    :    : - - :    :
-|    |    |               |
-: -- :    : -- :  """+ brightRed +"^" +dimWhite+ """  : -- :
-|                    |
-:    : -- : -- : - - :
-                     |
-: -- :    : -- :     :
-     |               |
-: -- : -- : -- :     :"""+brightGreen
-j134Map = dimWhite+ """.              . -- . -- . -- . -- .
-|              |                   |
-:    : -- : -- :    : -- : -- :    :
-|   """+ brightRed +"<" +dimWhite+ """               |         |    |
-:    : -- : -- : -- :    :    :    :
-|         |         |    |    |    |
-: -- :    :    :    :    : -- :    :
-          |    |    |              |
-          : -- :    : -- :    : -- :
-          |                   |
-          :    : -- : -- : -- :"""+brightGreen
-j1234Map = dimWhite+ """.              . -- . -- . -- . -- .
-|              |                   |
-:    : -- : -- :    : -- : -- :    :
-|   """+ brightRed +"<" +dimWhite+ """               |         |    |
-:    : -- : -- : -- :    :    :    :
-|         |         |    |    |    |
-: -- :    :    :    :    : -- :    :
-          |    |    |              |
-          : -- :    : -- :    : -- :
-          |                   |
-          :    : -- : -- : -- :
-          |         |         |
-          : -- :    : -- :    :
-               |              |
-               : -- : -- :    :
-               |              |
-               : -- : -- : -- :"""+brightGreen
-j12345Map = dimWhite+ """. -- . - - . -- . -- . -- . -- . -- .
-|              |                    |
-:    : - - : -- :    : -- : -- :    :
-|                    |         |    |
-:    : - - : -- : -- :    :    :    :
-|          |         |    |    |    |
-: -- :     :    :    :    : -- :    :
-     |     |    |    |              |
-     :     : -- :    : -- :    : -- :
-     |     |                   |
-     :     :    : -- : -- : -- :
-     |     |         |         | 
-     :  """+ brightRed +"V" +dimWhite+ """  : -- :    : -- :    :
-               |              |
-  -- : - - :    : -- : -- :    :
-               |              |
-               : -- : -- : -- :"""+brightGreen
-j1345Map = dimWhite+ """ . -- . - - . -- . -- . -- . -- . -- .
-|                |                   |
-:    : - - : - - :    : -- : -- :    :
-|                     |         |    |
-:    : - - : - - : -- :    :    :    :
-|          |          |    |    |    |
-: -- :     :     :    :    : -- :    :
-     |     |     |    |              |
-     :     : - - :    : -- :    : -- :
-     |     |                    |     
-     :     :     : -- : -- : -- :
-     |     |     
-     :  """+ brightRed +"V" +dimWhite+ """  : - - :
-                 |
-: -- : - - :     :"""+brightGreen
-fullMap = dimWhite+ """. -- . -- . -- . -- . -- . -- . -- .
-|              |                   |
-:    : -- : -- :    : -- : -- :    :     """+ brightRed +"*" + brightCyan +"   *" +dimWhite+ """  
-|                   |         |    | """+ brightGreen +"*" +dimRed+ """   |  /"""+ brightYellow +"*"+ brightBlue +"  *" +dimWhite+ """ 
-:    : -- : -- : -- :    :    :    :  """+ dimRed +"\\  | /  \\ |"+brightYellow +"   *"+ brightCyan +"    *" +dimWhite+ """ 
-|         |         |    |    |    |   """+ dimRed +"\\ |/    \\| "+ brightMagenta +"*"+dimRed+"  \\"+ brightGreen +"*" +dimRed+ """ /"""+dimWhite+ """ 
-: -- :    :    :    :    : -- :    :   """+dimRed+"  /    """+ brightRed +"*" +dimRed+ " |/ "+ dimRed +"  /\\/ "+dimWhite+ """
-|    |    |    |    |              |   """+dimRed+"       | /   / /\\   "+dimWhite+ """
-:    :    : -- :    : -- :    : -- : """+brightBlue+" \\"+brightYellow+"e"+brightBlue+"/ "+brightMagenta+" *"+dimRed+"  |/  "+brightBlue+"*"+dimWhite+ """
-|    |    |                   |      """+brightBlue+"  I    "+dimRed+"\\ |  /"+dimWhite+ """
-:    :    :    : -- : -- : -- :    :"""+brightGreen+" _"+brightBlue+"/ \\"+brightGreen+"_"+dimRed+"   \\  /"+dimWhite+ """
-|    |    |         |         |    |
-:    :    : -- :    : -- :    :    :
-|              |              |    |
-: -- : -- :    : -- : -- :    :    :
-|              |              |    |
-:    : -- : -- : -- : -- : -- :    :
-|                                  |
-: -- : -- : -- : -- : -- : -- : -- :"""+brightGreen
-visits = []
+import time
+from assets import (
+  Asset, asset, asset_id, brightBlue, brightCyan, brightGreen, brightMagenta, brightRed,
+  brightWhite, brightYellow, dimWhite,
+)
+from events import frame
+from mazemap import MapPane, MazeMap, generate
+
+# Where the game's output, input and pauses go. Normally the real
+# terminal; main.py sets a per-session console when it hosts games
+# inside the server process instead of on a PTY. "events" says whoever
+# reads our output understands game events (main.py sets GAME_EVENTS
+# for the games it starts); a plain terminal gets none.
+class Terminal:
+  print = staticmethod(builtins.print)
+  input = staticmethod(builtins.input)
+  sleep = staticmethod(time.sleep)
+  events = bool(os.environ.get("GAME_EVENTS"))
+
+  def event(self, event):
+    builtins.print(frame(event), end="", flush=True)
+
+console = contextvars.ContextVar("console", default=Terminal())
+
+def print(*args, **kwargs):
+  console.get().print(*args, **kwargs)
+
+def input(prompt=""):
+  return console.get().input(prompt)
+
+def sleep(seconds):
+  console.get().sleep(seconds)
+
+def event(kind, **fields):
+  """Report game state to the server, out of band of the text."""
+  target = console.get()
+  if getattr(target, "events", False):
+    target.event(dict(fields, type=kind))
+
+class Scene:
+  """Stands in for the console while a scene is recorded.
+
+  Nothing is printed or waited for: each print (or event) is noted with
+  the time it would have happened, and sleep() only moves that time on.
+  """
+  events = True
+
+  def __init__(self):
+    self.steps = []
+    self.at = 0
+
+  def print(self, *args, sep=" ", end="\n", file=None, flush=False):
+    # The text skips the terminal's newline translation, so do it here.
+    text = (sep.join(str(arg) for arg in args) + end).replace("\n", "\r\n")
+    if self.steps and self.steps[-1][0] == self.at and isinstance(self.steps[-1][1], str):
+      self.steps[-1][1] += text
+    else:
+      self.steps.append([self.at, text])
+
+  def input(self, prompt=""):
+    raise RuntimeError("scenes cannot ask for input")
+
+  def sleep(self, seconds):
+    self.at += seconds
+
+  def event(self, event):
+    self.steps.append([self.at, event])
+
+@contextlib.contextmanager
+def scene():
+  """Send everything printed inside as one timeline, if the console can play it.
+
+  The browser then plays the pauses back with its own timers, so the game
+  goes straight on to its next question instead of sleeping through them.
+  Without any pauses the text is simply printed.
+  """
+  outer = console.get()
+  if not getattr(outer, "events", False) or isinstance(outer, Scene):
+    yield
+    return
+  recording = Scene()
+  token = console.set(recording)
+  try:
+    yield
+  finally:
+    console.reset(token)
+  if recording.at:
+    if not recording.steps or recording.steps[-1][0] < recording.at:
+      # A closing empty step keeps the scene's final pause.
+      recording.steps.append([recording.at, ""])
+    outer.event({"type": "scene", "steps": recording.steps})
+    return
+  for _, step in recording.steps:
+    if isinstance(step, str):
+      outer.print(step.replace("\r\n", "\n"), end="", flush=True)
+    else:
+      outer.event(step)
+
+def show(name, end="\n"):
+  """Print asset ``name``; whoever reads our events gets just its ID."""
+  if getattr(console.get(), "events", False):
+    event("asset", id=asset_id(name))
+    if end:
+      print("", end=end)
+  else:
+    print(asset(name), end=end)
 
 # Helper function to set current name for terminal
 def set_title(name):
-    print(f"[[__TITLE__:{name}]]", flush=True)
+  event("title", name=name)
 
 #Beginning of game
 def title():
-  print(Back.RESET + "")
-  print(dimMagenta+ "           +" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+")
-  print(brightYellow+ "           |                                                 |")
-  print(dimMagenta+ "           +" +dimWhite + " ┌─┐┬  ┌─┐┌─┐┌─┐  ┌─┐┌┐┌┌─┐┌─┐┬ ┬┌┐┌┌┬┐┌─┐┬─┐┌─┐ " + dimMagenta + "+")
-  print(brightYellow+ "           |" +normalWhite + " │  │  │ │└─┐├┤   ├┤ ││││  │ ││ ││││ │ ├┤ ├┬┘└─┐ " + brightYellow + "|")
-  print(dimMagenta+ "           +" +dimWhite + " └─┘┴─┘└─┘└─┘└─┘  └─┘┘└┘└─┘└─┘└─┘┘└┘ ┴ └─┘┴└─└─┘ " + dimMagenta + "+")
-  print(brightYellow+ "           |" +normalWhite + "                  ┌─┐ ┌─┐   ┌─┐                  " + brightYellow + "|")
-  print(dimMagenta+ "           +" +dimWhite + "                  │ │ ├┤    ├─┤                  " + dimMagenta + "+")
-  print(brightYellow+ "           |" +normalWhite + "                  └─┘ └     ┴ ┴                  " + brightYellow + "|")
-  print(dimMagenta+ "           +" +dimWhite + "       ┌─┐┬ ┬┌┬┐┬ ┬┌─┐┌┐┌      ┬┌─┬┌┐┌┌┬┐        " + dimMagenta + "+")
-  print(brightYellow+ "           |" +normalWhite + "       ├─┘└┬┘ │ ├─┤│ ││││      ├┴┐││││ ││        " + brightYellow + "|")
-  print(dimMagenta+ "           +" +dimWhite + "       ┴   ┴  ┴ ┴ ┴└─┘┘└┘      ┴ ┴┴┘└┘─┴┘       " + dimMagenta + " +")
-  print(brightYellow+ "           |                                                 |")
-  print(dimMagenta+ "           +" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+")
+  show("title", end="")
   sleep(3)
   
 def rules():
@@ -195,25 +146,10 @@ def intro():
   sleep(3)
   print("You take a moment to consider how steam is trapped under a field of crops without the floor feeling hot. You also wonder who built a corridor in the middle of a field, before making your decision.")
   sleep(3)
-  junction1()
   
 def aliens():
   set_title("aliens:")
-  print(brightCyan +'                  _____                                         ')
-  print('              _.-"     "-._                     _____            ')
-  print('             /    ' + brightGreen+')_-_(    '+brightCyan +'\\                _.-"     "-._        ')
-  print('            /    ' + brightGreen+'(' + brightBlue+' o o ' + brightGreen+') '+brightCyan +'   \\              /   ' + brightGreen+' }_-_{  '+brightCyan +'  \\       ')
-  print('           /      ' + brightGreen+'( o )  '+brightCyan +'    \\            /   ' + brightGreen+' { ' + brightBlue+'o o' + brightGreen+' }  '+brightCyan +'  \\      ')
-  print('          /        ' + brightGreen+'(-)  '+brightCyan +'      \\          /     ' + brightGreen+' { o }    '+brightCyan +'  \\     ')   
-  print('         / '+brightRed +' o   ' + brightGreen+' .-"-"-.  '+brightRed +'  o '+brightCyan +''+brightCyan +' \\        /        ' + brightGreen+'{-}   '+brightCyan +'     \\    ')  
-  print('        / '+brightRed +'  I  ' + brightGreen+' /       \\ '+brightRed +'  I '+brightCyan +'  \\      /  '+brightRed +'o    ' + brightGreen+'.-"-"-.  '+brightRed +'  o '+brightCyan +' \\   ')   
-  print('       (   ' + brightGreen+'(_} /\\       /\\ {_) '+brightCyan +'  )    / '+brightRed +'  I  ' + brightGreen+' /       \\  '+brightRed +' I '+brightCyan +'  \\  ')  
-  print('        \\'+normalWhite +'.__]' + brightGreen+'\\/'+normalWhite +'__' + brightGreen+'\\'+normalWhite +'_____' + brightGreen+'/' + normalWhite+'__' + brightGreen+'\\/' + normalWhite+'[__.' + brightCyan+'/    (   ' + brightGreen+'(_} /\\       /\\ {_)   ' + brightCyan+') ')
-  print('       ' + normalWhite+'(                         )    ' + brightCyan+'\\' + normalWhite+'.__]' + brightGreen+'\\/' + normalWhite+'__' + brightGreen+'\\' + normalWhite+'_____' + brightGreen+'/' + normalWhite+'__' + brightGreen+'\\/' + normalWhite+'[__.' + brightCyan+'/  ') 
-  print(normalWhite+'        "-_    '+brightWhite+' O o O o O'+normalWhite+'     _-"    (                         ) ') 
-  print('           "--.___________.--"        "-_    '+brightWhite+' O o O o O'+normalWhite+'     _-"  ')
-  print('                                         "--.___________.--"     ')
-  print("")
+  show("aliens", end="")
   sleep(2)
   
 def beginning():
@@ -239,420 +175,343 @@ def beginning():
   print(brightCyan + "*Blink, blink, blink*")
   sleep(3)
   print(brightGreen + "You rub your eyes trying to help see in the engulfing darkness. A putrid smell fills the air, and your head hurts. Clambering to your feet you reach out and feel huge crops surrounding you, but notice a narrow gap. Thus, your fight to escape the maze begins....")
-  print(startMap)
+  show("startMap")
   sleep(3)
   
-def map(visits):
-  if visits == [1]:
-    print(j1Map)
-  elif visits == [1, 2]:
-    print(j12Map)
-  elif visits == [1, 2, 1]:
-    print(j121Map)
-  elif visits == [1, 3]:
-    print(j13Map)
-  elif visits == [1, 2, 3]:
-    print(j123Map)
-  elif visits == [1, 3, 4]:
-    print(j134Map)
-  elif visits == [1, 2, 3, 4, 5]:
-    print(j12345Map)
-  elif visits == [1, 2, 3, 4]:
-    print(j1234Map)
-  elif visits == [1, 3, 4, 5]:
-    print(j1345Map)
-
-#Junctions
-def junction1():
-  set_title("junction1:")
-  global lives
-  global visits
-  global retries
-  if visits.count(1) == 0:
-    visits.insert(1, 1)
-    map(visits)
-  else:
-    if visits.count(2) == 1:
-      map([1, 2, 1])
-    else:
-      map(visits)
-  print(brightWhite + "Will you choose left or right?")
-  for retries in range(5):
-    choice = str(input())
-    if choice.lower() == "left":
-      junction3()
-    elif choice.lower() == "right":
-      junction2()
-    else:
-      print(brightYellow + "Please enter 'left' or 'right'.")
-      retries += 1
-  if lives > 1:
-    print(brightRed + "You kept making invalid choices, the UFO came back and abducted you again. The aliens removed a life, then returned you to the crop circle.")
-    sleep(1)
-    lives -= 1
-    junction1()
-  elif lives == 1:
-    print(brightRed + "You were warned... but you kept making invalid choices, and got trapped in the maze forever. You eventually lost every last shred of life left in your body and were doomed to haunt the maze for the rest of eternity.")
-    sleep(3)
-    death()
-          
-def junction2():
-  set_title("junction2:")
-  global visits
-  global lives
-  global retries
-  if visits.count(2) == 0:
-    visits.append(2)
-    map(visits)
-  else:
-    map(visits)
-
-  directions=["left","right"]
-  print(brightGreen + "You wander through some snaking turns and find the path splits in two.")
-  user_input=""
-  for retries in range(5):
-    while user_input not in directions:
-      print(brightWhite + "Your options are: Left or Right")
-      user_input=input().lower()
-      if user_input=="left":
-        q1()
-      elif user_input=="right":
-        q2()
-      else:
-        print(brightYellow + "Please enter left or right.")
-        retries += 1
-  if lives > 1:
-    print(brightRed + "You kept making invalid choices, the UFO came back and abducted you again. The aliens removed a life, then returned you to the crop circle.")
-    sleep(1)
-    lives -= 1
-    junction1()
-  elif lives == 1:
-    print(brightRed + "You were warned... but you kept making invalid choices, and got trapped in the maze forever. You eventually lost every last shred of life left in your body and were doomed to haunt the maze for the rest of eternity.")
-    sleep(3)
-    death()
-          
-def junction3():
-  set_title("junction3:")
-  global lives
-  global visits
-  global retries
-  if visits.count(3) == 0:
-    visits.append(3)
-    map(visits)
-  else:
-    map(visits)
-
-  if lives <= 0:
-    print(brightRed + "You have no lives left. Game over!")
-    sleep(2)
-    death()
-    return
+# The whole maze, drawn once. Each cell is labelled with the junction
+# whose visit reveals it; the glyph beside a label marks where that
+# junction is. Maps shown on arrival are cut from this drawing.
+mazeMap = MazeMap(r"""
+. -- . -- . -- . -- . -- . -- . -- .
+|  1    1    3 |  3    3    4    4 |
+:    : -- : -- :    : -- : -- :    :
+|  1    1    3    3 |  3    4<|  4 |
+:    : -- : -- : -- :    :    :    :
+|  1    1V|  3    3^|  3 |  4 |  4 |
+: -- :    :    :    :    : -- :    :
+|  2 |  2 |  2 |  2 |  4    4    4 |
+:    :    : -- :    : -- :    : -- :
+|  2 |  2 |  2>   2    4    4 |  4
+:    :    :    : -- : -- : -- :    :
+|  5 |  5 |  5    5 |  5    5 |  5 |
+:    :    : -- :    : -- :    :    :
+|  5    5V   5 |  5    5    5 |  5 |
+: -- : -- :    : -- : -- :    :    :
+|  5    5    5 |  5    5    5 |  5 |
+:    : -- : -- : -- : -- : -- :    :
+|  5    5    5    5    5    5    5 |
+: -- : -- : -- : -- : -- : -- : -- :
+""", wall=dimWhite, marker=brightRed, end=brightGreen)
 
-  directions = ["right", "left"]
-  print(brightGreen + "You run into another junction, take the correct turn and you'll be one step closer to making it out of the maze alive!")
-  print(brightWhite + "Which way will you go?")
-  
-  for retries in range(5):
-    userInput = ""
-    while userInput not in directions:
-      print(brightYellow + "Options:Right/Left")
-      retries += 1
-      userInput = input().lower()
-      if userInput == "left":
-        print("You take a few steps down the dark corridor and the wall of the maze closes behind you!  You took the wrong turn!")
-        q3()
-      elif userInput == "right":
-        print("You chose the right direction keep going, you are almost out!")
-        junction4() 
-      
-  if lives > 1:
-    print(brightRed + "You kept making invalid choices, the UFO came back and abducted you again. The aliens removed a life, then returned you to the crop circle.")
-    sleep(1)
-    lives -= 1
-    junction1()
-  elif lives == 1:
-    print(brightRed + "You were warned... but you kept making invalid choices, and got trapped in the maze forever. You eventually lost every last shred of life left in your body and were doomed to haunt the maze for the rest of eternity.")
-    sleep(3)
-    death()
-          
-def junction4(): 
-  set_title("junction4:")
-  global visits
-  global lives
-  global retries
-  if visits.count(4) == 0:
-    visits.append(4)
-    map(visits)
-  else:
-    map(visits)
-  print(brightGreen + "You stumble onward, reaching yet another fork in the road. When will this end? You think to yourself.")
-  print(brightWhite + "Which way will you go?")
-  for retries in range(5):
-    print("Options: Right/Left")
-    userInput = input()
-    if userInput.lower() == "right":
-      q4()
-    elif userInput.lower() == "left":
-      junction5()
-    else:
-      print(brightYellow + "Please enter left or right.")
-      retries += 1
-  if lives > 1:
-    print(brightRed + "You kept making invalid choices, the UFO came back and abducted you again. The aliens removed a life, then returned you to the crop circle.")
-    sleep(1)
-    lives -= 1
-    junction1()
-  elif lives == 1:
-    print(brightRed + "You were warned... but you kept making invalid choices, and got trapped in the maze forever. You eventually lost every last shred of life left in your body and were doomed to haunt the maze for the rest of eternity.")
-    sleep(3)
-    death()
-      
-def junction5():
-  set_title("junction5:")
-  global visits
-  global lives
-  global retries
-  if visits.count(5) == 0:
-    visits.append(5)
-    map(visits)
-  else:
-    map(visits)
-  directions = ["right","left"]
-  for retries in range(5):
-    print(brightWhite + "You arrive at another junction which direction do you choose to take: ")
-    user_input = "".lower()
-    while user_input not in directions:
-      print(brightYellow + "Options: right/left")
-      user_input = input().lower()
-      if user_input == "right":
-        q5()
-      elif user_input == "left":
-        escape()
-  if lives > 1:
-    print(brightRed + "You kept making invalid choices, the UFO came back and abducted you again. The aliens removed a life, then returned you to the crop circle.")
-    sleep(1)
-    lives -= 1
-    junction1()
-  elif lives == 1:
-    print(brightRed + "You were warned... but you kept making invalid choices, and got trapped in the maze forever. You eventually lost every last shred of life left in your body and were doomed to haunt the maze for the rest of eternity.")
-    sleep(3)
-    death()
-
-#Questions
-def q1():
-  set_title("question1:")
-  global lives
-  user_options = ["true", "false"]
-  print(brightCyan + "There are 450 programming languages used in coding.")
-  user_input = "".lower()
-  while user_input not in user_options:
-    print(brightWhite + "Options: True/False: ")
-    user_input = input()
-    if user_input.lower() == "false":
-      print(brightBlue + "CORRECT! There are actually over 700 programming languages used in coding. You return to the start without losing a life")
-      sleep(2)
-      junction1()
-    elif user_input.lower() == "true":
-      lives -= 1
-      print(brightRed + f"INCORRECT! There are actually over 700 programming languages used in coding. You have {lives} lives left, ")
-      sleep(2)
-      print("You return to the start of the maze.")
-      if lives <= 0:
-        print(brightRed + "You have run out of lives")
-        sleep(2)
-        death()
-      else:
-        junction1()
-              
-def q2():
-  set_title("question2:")
-  global lives
-  options=["a","b","c"]
-  print(brightCyan + "You find a sign that reads: The world's longest maze is located in Yancheng, China and is 36,000 meters squared in size, What is it's length?") 
-  user_input=""
-  while user_input not in options:
-    print(brightWhite + """ 
+# The maze as data. Junctions ("visit" is their number on the map) and
+# questions are nodes: "say" is printed on arrival, "ask" before every
+# answer, and "choices" maps an answer to the next node, what is printed
+# on the way, whether it costs a life and which junctions it strikes off
+# the map. "otherwise" catches any other answer; without it the answer is
+# invalid, and "patience" invalid answers in a row cost a life.
+maze = {
+  "junction1": {
+    "title": "junction1:", "visit": 1, "patience": 5,
+    "say": [brightWhite + "Will you choose left or right?"],
+    "invalid": brightYellow + "Please enter 'left' or 'right'.",
+    "choices": {"left": {"to": "junction3"}, "right": {"to": "junction2"}},
+  },
+  "junction2": {
+    "title": "junction2:", "visit": 2, "patience": 5,
+    "say": [brightGreen + "You wander through some snaking turns and find the path splits in two."],
+    "ask": brightWhite + "Your options are: Left or Right",
+    "invalid": brightYellow + "Please enter left or right.",
+    "choices": {"left": {"to": "question1"}, "right": {"to": "question2"}},
+  },
+  "junction3": {
+    "title": "junction3:", "visit": 3, "patience": 5,
+    "say": [
+      brightGreen + "You run into another junction, take the correct turn and you'll be one step closer to making it out of the maze alive!",
+      brightWhite + "Which way will you go?",
+    ],
+    "ask": brightYellow + "Options:Right/Left",
+    "choices": {
+      "left": {"to": "question3", "say": ["You take a few steps down the dark corridor and the wall of the maze closes behind you!  You took the wrong turn!"]},
+      "right": {"to": "junction4", "say": ["You chose the right direction keep going, you are almost out!"]},
+    },
+  },
+  "junction4": {
+    "title": "junction4:", "visit": 4, "patience": 5,
+    "say": [
+      brightGreen + "You stumble onward, reaching yet another fork in the road. When will this end? You think to yourself.",
+      brightWhite + "Which way will you go?",
+    ],
+    "ask": "Options: Right/Left",
+    "invalid": brightYellow + "Please enter left or right.",
+    "choices": {"right": {"to": "question4"}, "left": {"to": "junction5"}},
+  },
+  "junction5": {
+    "title": "junction5:", "visit": 5, "patience": 5,
+    "say": [brightWhite + "You arrive at another junction which direction do you choose to take: "],
+    "ask": brightYellow + "Options: right/left",
+    "choices": {"right": {"to": "question5"}, "left": {"to": "escape"}},
+  },
+  "question1": {
+    "title": "question1:",
+    "say": [brightCyan + "There are 450 programming languages used in coding."],
+    "ask": brightWhite + "Options: True/False: ",
+    "choices": {
+      "false": {"to": "junction1", "say": [(brightBlue + "CORRECT! There are actually over 700 programming languages used in coding. You return to the start without losing a life", 2)]},
+      "true": {"to": "junction1", "costsLife": True, "say": [
+        (brightRed + "INCORRECT! There are actually over 700 programming languages used in coding. You have {lives} lives left, ", 2),
+        "You return to the start of the maze.",
+      ]},
+    },
+  },
+  "question2": {
+    "title": "question2:",
+    "say": [brightCyan + "You find a sign that reads: The world's longest maze is located in Yancheng, China and is 36,000 meters squared in size, What is it's length?"],
+    "ask": brightWhite + """ 
     Your options are:
     A - 7 km
     B - 9 km
     C - 15 km
-    Please enter: A, B or C""")
-    user_input=input().lower()
-    if user_input=="b":
-      print(brightBlue + "Correct! Hopefully this maze isn't that long.")
-      print("You return to the start without losing a life.")
-      junction1()
-    elif True:
-      lives-=1
-      print(brightRed + f"Incorrect, you only have {lives} lives left")
-      print("You return to the start of the maze.")
-      if lives<=0:
-        print(brightRed + "You have run out of lives")
-        sleep(2)
-        death()
-      else:
-        junction1()
-              
-def q3():
-  set_title("question3:")
-  print(brightGreen + "To go back you'll need to bypass the security system by answering the following question correctly.")
-  global lives
-  question = "What would a nihilist coder's approach to a morning cup of coffee be?"
-  options = [
-    "A) Drinking coffee with a sense of purpose, as it is the only thing that matters in life",
-    "B) Deciding not to drink coffee because it has no intrinsic value or meaning",
-    "C) Drinking an existential blend of coffee, pondering the meaninglessness of life",
-    "D) Mixing coding marathons with energy drinks to maximize the futility of existence"
-  ]
-  print(brightCyan + f"{question}")
-  print(brightWhite + f"{options}")
-  options = ["A", "B", "C", "D"]
-  userinput = ""
-  while userinput not in options:
-    print(brightYellow + "Options: A/B/C/D")
-    userinput = input().upper()
-    if userinput in ["A", "C", "D"]:
-      lives -= 1
-      print(brightRed + f"INCORRECT, you only have {lives} lives left, you have gone back to the beginning")
-      print("You return to the start of the maze.")
-      if lives<=0:
-        print(brightRed + "You have run out of lives")
-        sleep(2)
-        death()
-      else:
-        visits.remove(3)
-        if 2 in visits:
-          visits.remove(2)
-          junction1()
-        else:
-          junction1()
-    elif userinput == "B":
-      print(brightBlue + "Correct".upper())
-      print("The wall of the maze opens back up and you make your way back to the last junction, you didn't lose any lives")
-      junction3()
-          
-def q4():
-  set_title("question4:")
-  global lives
-  print(brightCyan + "You must be lost! Before moving ahead, answer me this.. 'True or False: A potato was the first vegetable to be planted on the space shuttle.', if you answer incorrectly you will lose a life'")
-  userinput = "".lower()
-  print(brightWhite + "Options: True/False")
-  userinput = input()
-  if userinput.lower() == "true":
-    print(brightBlue + "Correct".upper())
-    print("You return to the previous junction without losing a life")
-    junction4()
-  elif userinput.lower() == "false":
-    lives -= 1
-    print(brightRed + f"INCORRECT, you only have {lives} lives left")
-    print("You return to the start of the maze.")
-    if lives<=0:
-      print(brightRed + "You have run out of lives")
-      sleep(2)
-      death()
+    Please enter: A, B or C""",
+    "choices": {
+      "b": {"to": "junction1", "say": [brightBlue + "Correct! Hopefully this maze isn't that long.", "You return to the start without losing a life."]},
+    },
+    "otherwise": {"to": "junction1", "costsLife": True, "say": [brightRed + "Incorrect, you only have {lives} lives left", "You return to the start of the maze."]},
+  },
+  "question3": {
+    "title": "question3:", "case": "upper",
+    "say": [
+      brightGreen + "To go back you'll need to bypass the security system by answering the following question correctly.",
+      brightCyan + "What would a nihilist coder's approach to a morning cup of coffee be?",
+      brightWhite + str([
+        "A) Drinking coffee with a sense of purpose, as it is the only thing that matters in life",
+        "B) Deciding not to drink coffee because it has no intrinsic value or meaning",
+        "C) Drinking an existential blend of coffee, pondering the meaninglessness of life",
+        "D) Mixing coding marathons with energy drinks to maximize the futility of existence",
+      ]),
+    ],
+    "ask": brightYellow + "Options: A/B/C/D",
+    "choices": dict(
+      {"B": {"to": "junction3", "say": [brightBlue + "CORRECT", "The wall of the maze opens back up and you make your way back to the last junction, you didn't lose any lives"]}},
+      **{wrong: {"to": "junction1", "costsLife": True, "forget": [3, 2], "say": [
+        brightRed + "INCORRECT, you only have {lives} lives left, you have gone back to the beginning",
+        "You return to the start of the maze.",
+      ]} for wrong in "ACD"},
+    ),
+  },
+  "question4": {
+    "title": "question4:",
+    "say": [brightCyan + "You must be lost! Before moving ahead, answer me this.. 'True or False: A potato was the first vegetable to be planted on the space shuttle.', if you answer incorrectly you will lose a life'"],
+    "ask": brightWhite + "Options: True/False",
+    "choices": {
+      "true": {"to": "junction4", "say": [brightBlue + "CORRECT", "You return to the previous junction without losing a life"]},
+      "false": {"to": "junction1", "costsLife": True, "forget": [4, 3, 2], "say": [brightRed + "INCORRECT, you only have {lives} lives left", "You return to the start of the maze."]},
+    },
+  },
+  "question5": {
+    "title": "question5:",
+    "say": [brightCyan + "You see a sign that reads 'true or false: A group of jellyfish is called a smack', If you answer incorrectly you will lose a life and be returned to the start of the maze: "],
+    "ask": brightWhite + "Options: True/False: ",
+    "choices": {
+      "true": {"to": "junction5", "say": [brightBlue + "CORRECT", "You return to the previous junction with your lives intact"]},
+      "false": {"to": "junction1", "costsLife": True, "forget": [5, 4, 3, 2], "say": [
+        brightRed + "INCORRECT, You only have {lives} lives left, ",
+        ("You return to the start of the maze.", 2),
+      ]},
+    },
+  },
+  "escape": {
+    "title": "escape:",
+    "say": [brightGreen + "Congratulations you have escaped the maze ", Asset("fullMap"), brightWhite + "Would you like to restart? "],
+    "ask": brightYellow + "Options: Yes/No: ",
+    "choices": {
+      "no": {"to": "credits", "say": [(brightMagenta + "You choose to forget this ever happened and escape...", 2), (brightCyan + '"Where am I?"', 2)]},
+      "yes": {"to": "junction1", "forget": [5, 4, 3, 2], "say": [(brightYellow + "For some reason you decided to return to the center of the maze", 2)]},
+    },
+  },
+}
+
+# Too many invalid answers at a junction: the aliens step in.
+abducted = {"to": "junction1", "costsLife": True, "say": [(brightRed + "You kept making invalid choices, the UFO came back and abducted you again. The aliens removed a life, then returned you to the crop circle.", 1)]}
+trapped = {"to": "death", "say": [(brightRed + "You were warned... but you kept making invalid choices, and got trapped in the maze forever. You eventually lost every last shred of life left in your body and were doomed to haunt the maze for the rest of eternity.", 3)]}
+outOfLives = {"to": "death", "say": [(brightRed + "You have run out of lives", 2)]}
+
+@functools.lru_cache(maxsize=8)
+def generatedMaze(width, height, junctions, seed):
+  """A random maze as (nodes, map) that plays like the one above.
+
+  At each junction one turn leads on and the other to a question from
+  the maze above; a right answer returns to the junction, a wrong one
+  costs a life and sends the player back to the start. Cached, so
+  sessions playing the same seed share one copy.
+  """
+  rng = random.Random(seed)
+  mapOfMaze = MazeMap(generate(width, height, junctions, rng), wall=dimWhite, marker=brightRed, end=brightGreen)
+  questions = [maze["question%d" % n] for n in range(1, 6)]
+  nodes = {}
+  for n in range(1, junctions + 1):
+    onward = rng.choice(["left", "right"])
+    wrong = "right" if onward == "left" else "left"
+    nodes["junction%d" % n] = {
+      "title": "junction%d:" % n, "visit": n, "patience": 5,
+      "say": [brightWhite + "Junction %d of %d. Will you choose left or right?" % (n, junctions)],
+      "invalid": brightYellow + "Please enter 'left' or 'right'.",
+      "choices": {
+        onward: {"to": "junction%d" % (n + 1) if n < junctions else "escape"},
+        wrong: {"to": "question%d" % n},
+      },
+    }
+    question = dict(rng.choice(questions), title="question%d:" % n)
+    back = {"to": "junction%d" % n}
+    lost = {"to": "junction1", "forget": list(range(n, 1, -1))}
+    question["choices"] = {
+      answer: dict(choice, **(lost if choice.get("costsLife") else back))
+      for answer, choice in question["choices"].items()
+    }
+    if question.get("otherwise"):
+      question["otherwise"] = dict(question["otherwise"], **lost)
+    nodes["question%d" % n] = question
+  nodes["escape"] = dict(maze["escape"], say=[brightGreen + "Congratulations you have escaped the maze ", brightWhite + "Would you like to restart? "])
+  nodes["escape"]["choices"] = dict(maze["escape"]["choices"], yes=dict(maze["escape"]["choices"]["yes"], forget=list(range(junctions, 1, -1))))
+  return nodes, mapOfMaze
+
+def newState():
+  """Everything one playthrough remembers."""
+  return {"lives": 3, "visits": [], "attempts": 0}
+
+def arrive(name, state, nodes=maze, view=mazeMap):
+  """Enter node ``name``; returns the lines to show (text or (text, pause)).
+
+  ``view`` draws the map on arrival at a junction; None leaves that to
+  the caller.
+  """
+  node = nodes[name]
+  state["attempts"] = 0
+  lines = []
+  number = node.get("visit")
+  if number:
+    if number not in state["visits"]:
+      state["visits"].append(number)
+    if view:
+      lines.append(view.view(state["visits"], here=number))
+  return lines + node["say"]
+
+def transition(name, state, answer, nodes=maze):
+  """Apply ``answer`` at node ``name``.
+
+  Returns (next node, lines to show); next is None when the same node
+  should ask again. Only ``state`` is touched, so every move is O(1).
+  """
+  node = nodes[name]
+  answer = answer.strip()
+  answer = answer.upper() if node.get("case") == "upper" else answer.lower()
+  choice = node["choices"].get(answer) or node.get("otherwise")
+  if choice is None:
+    state["attempts"] += 1
+    if node.get("patience") and state["attempts"] >= node["patience"]:
+      choice = abducted if state["lives"] > 1 else trapped
     else:
-      visits.remove(4)
-      visits.remove(3)
-      if 2 in visits:
-        visits.remove(2)
-        junction1()
-      else:
-        junction1()
-          
-def q5():
-  set_title("question5:")
-  global lives
-  user_options = ["true", "false"]
-  print(brightCyan + "You see a sign that reads 'true or false: A group of jellyfish is called a smack', If you answer incorrectly you will lose a life and be returned to the start of the maze: ")
-  user_input = "".lower()
-  while user_input not in user_options:
-    print(brightWhite + "Options: True/False: ")
-    user_input = input()
-    if user_input == "true":
-      print(brightBlue + "Correct".upper())
-      print("You return to the previous junction with your lives intact")
-      junction5()
-    elif user_input == "false":
-      lives -= 1
-      print(brightRed + f"INCORRECT, You only have {lives} lives left, ")
-      print("You return to the start of the maze.")
-      sleep(2)
-      junction1()
-      if lives <= 0:
-        print(brightRed + "You have run out of lives")
-        sleep(2)
-        death()
+      return None, [node["invalid"]] if node.get("invalid") else []
+  lines = []
+  if choice.get("costsLife"):
+    state["lives"] -= 1
+  for line in choice.get("say", []):
+    if isinstance(line, tuple):
+      lines.append((line[0].format(lives=state["lives"]), line[1]))
+    else:
+      lines.append(line.format(lives=state["lives"]))
+  if choice.get("costsLife") and state["lives"] <= 0:
+    return outOfLives["to"], lines + outOfLives["say"]
+  for number in choice.get("forget", []):
+    if number in state["visits"]:
+      state["visits"].remove(number)
+  return choice["to"], lines
+
+def say(lines):
+  with scene():
+    for line in lines:
+      if isinstance(line, tuple):
+        print(line[0])
+        sleep(line[1])
+      elif isinstance(line, Asset):
+        show(line.name)
       else:
-        visits.remove(5)
-        visits.remove(4)
-        visits.remove(3)
-        if 2 in visits:
-          visits.remove(2)
-          junction1()
-        else:
-          junction1()
-            
-#End of game
-def escape():
-  set_title("escape:")
-  print(brightGreen + "Congratulations you have escaped the maze ")
-  print(fullMap)
-  print(brightWhite + "Would you like to restart? ")
-  print(brightYellow + "Options: Yes/No: ")
-  user_Input = "".lower()
-  user_Input = input()
-  if user_Input == "no":
-    print(brightMagenta + "You choose to forget this ever happened and escape...")
-    sleep(2)
-    print(brightCyan + '"Where am I?"')
-    sleep(2)
-    credits()
-  elif user_Input == "yes":
-    # This will restart the game
-    print(brightYellow + "For some reason you decided to return to the center of the maze")
-    sleep(2)
-    visits.remove(5)
-    visits.remove(4)
-    visits.remove(3)
-    if 2 in visits:
-      visits.remove(2)
-      junction1()
+        print(line)
+
+def play(state=None, start="junction1", nodes=maze, pane=None):
+  """Drive the maze one move at a time until it ends in death or credits.
+
+  With a MapPane the map is kept up to date in its pane instead of being
+  printed on arrival at each junction.
+  """
+  state = state or newState()
+  name = start
+  while name in nodes:
+    node = nodes[name]
+    set_title(node["title"])
+    if pane:
+      lines = arrive(name, state, nodes, view=None)
+      print(pane.update(state["visits"], node.get("visit")), end="")
     else:
-      junction1()
+      lines = arrive(name, state, nodes)
+    event("state", lives=state["lives"], visits=list(state["visits"]))
+    say(lines)
+    nextName = None
+    while nextName is None:
+      if node.get("ask"):
+        print(node["ask"])
+      lives = state["lives"]
+      nextName, lines = transition(name, state, input(), nodes)
+      if nextName and name.startswith("question"):
+        event("outcome", question=name, correct=state["lives"] == lives)
+      say(lines)
+    name = nextName
+  endings[name]()
       
 def death():
   set_title("gameOver:")
   # This function runs if the player runs out of lives
-  print(dimMagenta+ "           +" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+")
-  print(brightYellow+ "           |                                                 |")
-  print(dimMagenta+ "           +" + dimRed + "           ┌─┐┌─┐┌┬┐┌─┐  ┌─┐┬  ┬┌─┐┬─┐           " + dimMagenta + "+")
-  print(brightYellow+ "           |" + dimRed + "           │ ┬├─┤│││├┤   │ │└┐┌┘├┤ ├┬┘           " + brightYellow + "|")
-  print(dimMagenta+ "           +" + dimRed + "           └─┘┴ ┴┴ ┴└─┘  └─┘ └┘ └─┘┴└─           " + dimMagenta + "+")
-  print(brightYellow+ "           |                                                 |")
-  print(dimMagenta+ "           +" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+")
+  show("gameOver", end="")
   credits()
   
 def credits():
   set_title("credits:")
-  print(dimMagenta+ "           +" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+")
-  print(brightYellow+ "           |                                                 |")
-  print(dimMagenta+ "           +                             " +dimMagenta+"     .--" +brightMagenta+".----. "+dimMagenta+"     +")
-  print(brightYellow+ "           |                            " +dimMagenta+"     / " +brightMagenta+" /      `\\ "+brightYellow+ "   |")
-  print(dimMagenta+ "           +" +brightBlue + "      ┌┬┐┌─┐┌┬┐┌─┐  ┌┐ ┬ ┬ " +dimMagenta+"      \\``" +brightMagenta+"\\  .--   \\"+dimMagenta+ "   +")
-  print(brightYellow+ "           |" +brightBlue+"      │││├─┤ ││├┤   ├┴┐└┬┘" +dimMagenta+"        \\__" +brightMagenta+"\\/ " +dimMagenta+"\\" +brightMagenta+" \\  :"+brightYellow+ "  "+brightYellow+ " |")
-  print(dimMagenta+ "           +" +brightBlue+ "      ┴ ┴┴ ┴─┴┘└─┘  └─┘ ┴  " +dimMagenta+"              ;" +brightMagenta+" ; | "+dimMagenta+ "  +")
-  print(brightYellow+ "           |"+ dimRed+"   _                           " +dimMagenta+"         /" +brightMagenta+" /  /  "+brightYellow+ ""+brightYellow+ " |")
-  print(dimMagenta+ "           +" + dimRed + "  |\\_\\_ __  __ _  _ __ __   " +dimMagenta+"            \\ " +brightMagenta+"\\  \\  "+dimMagenta+ " +")
-  print(brightYellow+ "           |"+dimRed+"  |"+brightBlue+"| |_"+dimRed+"\\"+brightBlue+"__"+dimRed+"\\/\\"+brightBlue+"_"+dimRed+"\\"+brightBlue+"_"+dimRed+"\\\\"+brightBlue+"_"+dimRed+"\\"+brightBlue+"__"+dimRed+"\\"+brightBlue+"___"+dimRed+"\\"+dimMagenta+"      ____   /" +brightMagenta+" :  | "+brightYellow+ "  |")
-  print(dimMagenta+ "           +" +dimRed+"  |"+brightBlue+"| __/ _ \\/ _` | '_ ` _  \\ "+dimMagenta+ "   / " +brightMagenta+"  /\\" +dimMagenta+" /" +brightMagenta+" /   :  " +dimMagenta+" +")
-  print(brightYellow+ "           |"+dimRed+"  |"+brightBlue+"| |_|  _/ (_| | |"+dimRed+"|"+brightBlue+"| |"+dimRed+"|"+brightBlue+"| | "+dimMagenta+"  /  " +brightMagenta+" /  '--    / "+brightYellow+ "  |")
-  print(dimMagenta+ "           +" + brightBlue+ "   \\___\\___|\\__,_|_|"+dimRed+"\\"+brightBlue+"|_|"+dimRed+"\\"+brightBlue+"|_|  "+dimMagenta+" \\'''" +brightMagenta+"\\        /  "+dimMagenta+"  +")
-  print(brightYellow+ "           |                       " +dimMagenta+"         \\ " +brightMagenta+"  \\     .'  " +brightYellow+ "   |")
-  print(dimMagenta+ "           +                          " +dimMagenta+"       `--" +brightMagenta+"^----'   " +dimMagenta+ "    +")
-  print(brightYellow+ "           |                                                 |")
-  print(dimMagenta+ "           +" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+" +brightYellow+"-"+dimMagenta+"+")
+  show("credits", end="")
   sys.exit()
 
+endings = {"death": death, "credits": credits}
+
+def size(text):
+  width, _, height = text.lower().partition("x")
+  return int(width), int(height)
+
+def parseArgs(argv):
+  parser = argparse.ArgumentParser(prog="game.py", description="Close Encounters of a Python Kind")
+  parser.add_argument("--maze", type=size, metavar="WxH", help="play a randomly carved maze of this many cells instead of the usual one")
+  parser.add_argument("--junctions", type=int, default=5, help="junctions in a random maze (default 5)")
+  parser.add_argument("--seed", type=int, help="seed for the random maze; the same seed always carves the same maze")
+  parser.add_argument("--pane", type=size, default=(60, 11), metavar="WxH", help="size of the map pane kept at the top of the screen in a random maze (default 60x11)")
+  args = parser.parse_args(argv)
+  if args.maze and (min(args.maze) < 1 or not 1 <= args.junctions <= min(args.maze[0], 999)):
+    parser.error("--junctions must be between 1 and the width of the --maze (at most 999)")
+  return args
+
 #Begin the game
-title()
-intro()
\ No newline at end of file
+def main(argv=None):
+  args = parseArgs(sys.argv[1:] if argv is None else argv)
+  with scene():
+    title()
+    intro()
+  if not args.maze:
+    play()
+    return
+  seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+  nodes, mapOfMaze = generatedMaze(args.maze[0], args.maze[1], args.junctions, seed)
+  pane = MapPane(mapOfMaze, *args.pane)
+  print(pane.open(), end="")
+  try:
+    play(nodes=nodes, pane=pane)
+  finally:
+    print(pane.close(), end="")
+
+if __name__ == "__main__":
+  main()
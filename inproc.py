@@ -0,0 +1,142 @@
+"""Host game.py sessions inside the server process instead of on a PTY.
+
+game.py only talks to the world through print(), input() and sleep(), and
+looks those up on its per-session console. Console implements them for a
+browser: print() feeds the session's output pipeline, input() waits for
+the next line typed in the browser and sleep() waits on an event, so
+under eventlet each game is just a green thread of a few KB rather than
+an interpreter on its own PTY.
+"""
+import io
+import queue
+import threading
+
+
+class SessionClosed(Exception):
+    """Raised inside the game when its session is ended from outside."""
+
+
+class Console:
+    """print/input/sleep for one in-process game, wired to its browser.
+
+    ``write(data)`` receives the game's output as bytes with terminal line
+    endings. Input arrives through ``feed()``; unless the browser edits
+    lines itself (``line_mode``), Console echoes and handles backspace the
+    way a PTY in canonical mode would. Game events (see events.py) go
+    straight to ``on_event(event)`` instead of being framed into the output.
+    """
+
+    events = True
+
+    def __init__(self, write, on_event, max_input=8192):
+        self.write = write
+        self.on_event = on_event
+        self.max_input = max_input
+        self.line_mode = False
+        self.closed = False
+        self._lines = queue.Queue()
+        self._queued = 0
+        self._partial = ""
+        self._stop = threading.Event()
+        self._writable = threading.Event()
+        self._writable.set()
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Bytes typed but not yet read by the game."""
+        return self._queued + len(self._partial)
+
+    # Called from the game's green thread.
+
+    def print(self, *args, sep=" ", end="\n", file=None, flush=False):
+        buffer = io.StringIO()
+        print(*args, sep=sep, end=end, file=buffer)
+        self._output(buffer.getvalue())
+
+    def input(self, prompt=""):
+        if prompt:
+            self._output(prompt)
+        line = self._lines.get()
+        if line is None:
+            raise SessionClosed()
+        with self._lock:
+            self._queued -= len(line)
+        return line
+
+    def sleep(self, seconds):
+        if self._stop.wait(seconds):
+            raise SessionClosed()
+
+    def event(self, event):
+        if self.closed:
+            raise SessionClosed()
+        self.on_event(event)
+
+    def _output(self, text):
+        # Stand in for the PTY's blocking write while the browser is behind.
+        while not self._writable.wait(1.0):
+            if self.closed:
+                break
+        if self.closed:
+            raise SessionClosed()
+        self.write(text.replace("\n", "\r\n").encode())
+
+    # Called by the server.
+
+    def feed(self, data):
+        """Take keystrokes or whole lines from the browser.
+
+        Returns False (dropping ``data``) if too much input is waiting.
+        """
+        with self._lock:
+            if self.closed or self.pending + len(data) > self.max_input:
+                return False
+            echo = []
+            for ch in data:
+                if ch in "\r\n":
+                    self._lines.put(self._partial)
+                    self._queued += len(self._partial)
+                    self._partial = ""
+                    echo.append("\r\n")
+                elif ch in "\x7f\b":
+                    if self._partial:
+                        self._partial = self._partial[:-1]
+                        echo.append("\b \b")
+                elif ch in "\x03\x04":
+                    # Ctrl-C / Ctrl-D end the game, as they would on a PTY.
+                    self._stop.set()
+                    self._lines.put(None)
+                elif ch >= " ":
+                    self._partial += ch
+                    echo.append(ch)
+        if echo and not self.line_mode:
+            self.write("".join(echo).encode())
+        return True
+
+    def pause(self):
+        self._writable.clear()
+
+    def resume(self):
+        self._writable.set()
+
+    def close(self):
+        """Make the game's next print/input/sleep raise SessionClosed."""
+        self.closed = True
+        self._stop.set()
+        self._writable.set()
+        self._lines.put(None)
+
+
+def run_game(console, argv=()):
+    """Play one game on ``console``; returns when it ends for any reason.
+
+    ``argv`` are game.py's command line options.
+    """
+    import game
+
+    game.console.set(console)
+    try:
+        game.main(list(argv))
+    except (SystemExit, SessionClosed):
+        pass
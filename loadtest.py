@@ -0,0 +1,391 @@
+"""Find out how many players one main.py can take.
+
+Opens N Socket.IO clients to /pty at once and plays each through a
+scripted game, typing one key at a time like ``index.html?raw`` (or whole
+lines with --line-mode), then does the same at the next concurrency of
+the ramp. Every player waits for the game to fall quiet before typing, so
+they play as fast as the server lets them. For each step it reports:
+
+- first byte: connect to the first output or event of the game;
+- echo: a keystroke sent to its echo arriving;
+- answer: Enter to the first of the game's reply (not the echoed newline);
+- the server's CPU use and peak RSS over the step, and its games' RSS,
+  from /metrics (--start samples every second);
+- games completed and failures by kind (connect errors, refusals, time
+  outs, games closed early, dropped input).
+
+Everything runs on this machine. Point --url at a server on loopback, or
+have --start run one (python3 main.py on a free port, with the options
+given) for the length of the test:
+
+    python3 loadtest.py --start "--session-mode inproc" --ramp 1,10,50,100
+    python3 loadtest.py --url http://127.0.0.1:5000 --json before.json
+
+--max-echo-ms makes a slow median echo fail the run; tests/test_latency.py
+does the same for one player against a fresh server.
+
+The clients need python-socketio's client dependencies, listed in
+requirements-dev.txt: ``pip install -r requirements-dev.txt``.
+"""
+import argparse
+import collections
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import socketio
+
+# Answers for game.py, each ending the game. "retry" gets answers wrong,
+# is abducted and plays on after the escape before leaving.
+PATHS = {
+    "escape": ["left", "right", "left", "left", "no"],
+    "death": ["left", "left", "a"] * 3,
+    "retry": ["maybe", "x", "right", "left", "false", "left", "right", "left", "left", "yes",
+              "left", "right", "left", "left", "no"],
+}
+
+# What the report takes from /metrics.
+SERVER_METRICS = {
+    "cpu": "pyxterm_server_cpu_seconds",
+    "rss": "pyxterm_server_rss_bytes",
+    "children_rss": "pyxterm_children_rss_bytes",
+}
+
+
+class Player:
+    """One scripted browser: connects, plays ``answers`` and disconnects.
+
+    Results go into ``stats``, shared by every player of a step and
+    guarded by ``stats["lock"]``.
+    """
+
+    def __init__(self, url, answers, options, stats):
+        self.url = url
+        self.answers = answers
+        self.options = options
+        self.stats = stats
+        self.arrived = threading.Condition()
+        self.received = 0  # messages so far
+        self.last = None  # when the latest one arrived
+        self.reply = None  # when a reply to Enter arrived
+        self.waiting_reply = False
+        self.closed = None
+        self.dropped = False
+
+    def run(self):
+        try:
+            self.play()
+        except Failure as failure:
+            self.record("failures", str(failure))
+        except Exception as exc:
+            self.record("failures", "error: %s" % type(exc).__name__)
+
+    def play(self):
+        client = socketio.Client(reconnection=False)
+        client.on("pty-output", self.on_output, namespace="/pty")
+        client.on("game-event", self.on_event, namespace="/pty")
+        client.on("pty-closed", self.on_closed, namespace="/pty")
+        client.on("pty-input-dropped", self.on_dropped, namespace="/pty")
+        timeout = self.options.timeout
+        started = time.perf_counter()
+        try:
+            client.connect(self.url, namespaces=["/pty"], transports=["websocket"], wait_timeout=timeout)
+        except socketio.exceptions.ConnectionError as exc:
+            raise Failure("refused" if "full" in str(exc) else "connect error")
+        try:
+            self.wait(lambda: self.received or self.closed, timeout, "first byte")
+            if self.closed:
+                raise Failure("closed early: %s" % self.closed)
+            self.record("first_byte", self.last - started)
+            if self.options.line_mode:
+                client.emit("line-mode", {"enabled": True}, namespace="/pty")
+            for answer in self.answers:
+                self.settle()
+                if not self.options.line_mode:
+                    for key in answer:
+                        self.type(client, key)
+                self.answer(client, answer + "\r" if self.options.line_mode else "\r")
+            self.wait(lambda: self.closed, timeout, "game end")
+            self.record("games", 1)
+        finally:
+            client.disconnect()
+
+    def type(self, client, key):
+        with self.arrived:
+            seen = self.received
+        sent = time.perf_counter()
+        self.send(client, key)
+        self.wait(lambda: self.received > seen, self.options.timeout, "echo")
+        self.record("echo", self.last - sent)
+        time.sleep(self.options.key_interval)
+
+    def answer(self, client, data):
+        with self.arrived:
+            self.reply = None
+            self.waiting_reply = True
+        sent = time.perf_counter()
+        self.send(client, data)
+        self.wait(lambda: self.reply or self.closed, self.options.timeout, "answer")
+        if self.reply:
+            self.record("answer", self.reply - sent)
+
+    def send(self, client, data):
+        if self.closed:
+            raise Failure("closed early: %s" % self.closed)
+        if self.dropped:
+            raise Failure("input dropped")
+        client.emit("pty-input", {"input": data}, namespace="/pty")
+
+    def settle(self):
+        """Wait until nothing has arrived for --settle seconds."""
+        deadline = time.perf_counter() + self.options.timeout
+        with self.arrived:
+            while not self.closed:
+                quiet = time.perf_counter() - self.last
+                if quiet >= self.options.settle:
+                    return
+                if time.perf_counter() > deadline:
+                    raise Failure("timeout: settle")
+                self.arrived.wait(self.options.settle - quiet)
+
+    def wait(self, predicate, timeout, what):
+        with self.arrived:
+            if not self.arrived.wait_for(predicate, timeout):
+                raise Failure("timeout: %s" % what)
+
+    def arrival(self, text):
+        now = time.perf_counter()
+        with self.arrived:
+            self.received += 1
+            self.last = now
+            if self.waiting_reply and text.strip("\r\n"):
+                self.reply = now
+                self.waiting_reply = False
+            self.arrived.notify_all()
+
+    def on_output(self, data):
+        self.arrival(data.decode("utf-8", "replace"))
+        # Acknowledged at once, as if rendered instantly.
+        return True
+
+    def on_event(self, event):
+        self.arrival("event")
+
+    def on_closed(self, info):
+        with self.arrived:
+            self.closed = info.get("reason") or "closed"
+            self.arrived.notify_all()
+
+    def on_dropped(self, info):
+        self.dropped = True
+
+    def record(self, key, value):
+        stats = self.stats
+        with stats["lock"]:
+            if key == "games":
+                stats["games"] += value
+            elif key == "failures":
+                stats["failures"][value] += 1
+            else:
+                stats[key].append(value)
+
+
+class Failure(Exception):
+    """A player could not finish its game; the message is the kind."""
+
+
+def scrape(url, names=SERVER_METRICS):
+    """Gauges from ``url``/metrics, as {key: value} for {key: metric name}."""
+    try:
+        with urllib.request.urlopen(url + "/metrics", timeout=5) as response:
+            text = response.read().decode()
+    except OSError:
+        return {}
+    values = {}
+    for key, name in names.items():
+        match = re.search(r"^%s (\S+)$" % name, text, re.M)
+        if match:
+            values[key] = float(match.group(1))
+    return values
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def run_step(url, players, options):
+    """Play ``players`` games at once; returns the step's results."""
+    stats = {
+        "lock": threading.Lock(),
+        "games": 0,
+        "failures": collections.Counter(),
+        "first_byte": [],
+        "echo": [],
+        "answer": [],
+    }
+    names = options.paths
+    threads = []
+    for i in range(players):
+        player = Player(url, PATHS[names[i % len(names)]], options, stats)
+        threads.append(threading.Thread(target=player.run, daemon=True))
+    before = scrape(url)
+    peak = dict(before)
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(1.0)
+        sample = scrape(url)
+        for key in ("rss", "children_rss"):
+            if key in sample:
+                peak[key] = max(peak.get(key, 0), sample[key])
+    elapsed = time.perf_counter() - started
+    after = scrape(url)
+    result = {
+        "players": players,
+        "seconds": round(elapsed, 3),
+        "games": stats["games"],
+        "failures": dict(stats["failures"]),
+    }
+    for key in ("first_byte", "echo", "answer"):
+        values = stats[key]
+        result[key] = {
+            "count": len(values),
+            "p50": percentile(values, 0.5),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+        }
+    if "cpu" in before and "cpu" in after:
+        result["server_cpu"] = round((after["cpu"] - before["cpu"]) / elapsed, 3)
+    for key in ("rss", "children_rss"):
+        if key in peak:
+            result["peak_" + key] = int(peak[key])
+    return result
+
+
+def start_server(extra):
+    """Run main.py on a free loopback port; returns (process, url)."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    here = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, os.path.join(here, "main.py"), "--host", "127.0.0.1", "--port", str(port)]
+    command += ["--metrics-interval", "1"] + extra
+    # No browser tab for the server to open.
+    env = dict(os.environ, BROWSER="true")
+    process = subprocess.Popen(command, cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+    url = "http://127.0.0.1:%d" % port
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("main.py exited with status %d" % process.returncode)
+        try:
+            urllib.request.urlopen(url + "/healthz", timeout=1).close()
+            return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("main.py did not come up on %s" % url)
+
+
+def ms(value):
+    return "-" if value is None else "%.1f" % (value * 1000)
+
+
+def mib(value):
+    return "-" if value is None else "%.0f" % (value / 1048576)
+
+
+def report(result):
+    echo, answer = result["echo"], result["answer"]
+    cpu = result.get("server_cpu")
+    print(
+        "%7d %6d %6d %8s %8s %8s %8s %8s %8s %6s %7s %8s"
+        % (
+            result["players"],
+            result["games"],
+            sum(result["failures"].values()),
+            ms(result["first_byte"]["p50"]),
+            ms(result["first_byte"]["p95"]),
+            ms(echo["p50"]),
+            ms(echo["p99"]),
+            ms(answer["p50"]),
+            ms(answer["p99"]),
+            "-" if cpu is None else "%.0f%%" % (cpu * 100),
+            mib(result.get("peak_rss")),
+            mib(result.get("peak_children_rss")),
+        )
+    )
+    for kind, count in sorted(result["failures"].items()):
+        print("        %5d x %s" % (count, kind))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="server to test (ignored with --start)")
+    parser.add_argument("--start", metavar="OPTIONS", help='run main.py with these options for the test, e.g. "--session-mode inproc"')
+    parser.add_argument("--ramp", default="1,5,10,25,50", help="comma-separated numbers of concurrent players")
+    parser.add_argument(
+        "--paths", default=",".join(PATHS), help="scripted paths players take in turn (%s)" % ", ".join(PATHS)
+    )
+    parser.add_argument("--line-mode", action="store_true", help="send whole lines like index.html does by default")
+    parser.add_argument("--key-interval", type=float, default=0.02, help="seconds between a key's echo and the next key")
+    parser.add_argument("--settle", type=float, default=0.2, help="seconds of quiet that mean the game is waiting")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for anything before failing")
+    parser.add_argument("--pause", type=float, default=2.0, help="seconds between steps so the server can settle")
+    parser.add_argument("--json", metavar="FILE", help="also write the results here, to compare runs")
+    parser.add_argument(
+        "--max-echo-ms", type=float, help="fail (exit status 1) if any step's median keystroke echo is slower"
+    )
+    options = parser.parse_args()
+    options.paths = options.paths.split(",")
+    unknown = [name for name in options.paths if name not in PATHS]
+    if unknown:
+        parser.error("unknown path %s" % ", ".join(unknown))
+    try:
+        ramp = [int(step) for step in options.ramp.split(",")]
+    except ValueError:
+        parser.error("--ramp takes numbers, e.g. 1,10,50")
+    server = None
+    url = options.url.rstrip("/")
+    if options.start is not None:
+        server, url = start_server(options.start.split())
+    results = []
+    try:
+        print("%s, paths %s, %s" % (url, ",".join(options.paths), "lines" if options.line_mode else "keys"))
+        print(
+            "%7s %6s %6s %8s %8s %8s %8s %8s %8s %6s %7s %8s"
+            % ("players", "games", "failed", "first50", "first95", "echo50", "echo99",
+               "reply50", "reply99", "cpu", "rss MiB", "games MiB")
+        )
+        for players in ramp:
+            result = run_step(url, players, options)
+            results.append(result)
+            report(result)
+            time.sleep(options.pause)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump({"url": url, "options": vars(options), "steps": results}, f, indent=2)
+    if options.max_echo_ms is not None and any(
+        (result["echo"]["p50"] or 0) * 1000 > options.max_echo_ms for result in results
+    ):
+        print("median echo over %g ms" % options.max_echo_ms)
+        return 1
+    return 0 if all(not result["failures"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,35 @@
 import argparse
-from flask import Flask, render_template, request
-from flask_socketio import SocketIO
+import collections
+import gc
+import itertools
+import json
+from flask import Flask, Response, render_template, request
+from flask_socketio import ConnectionRefusedError, SocketIO
 import pty
 import os
-import subprocess
-import select
 import signal
+import socket
 import termios
 import struct
 import fcntl
 import shlex
 import logging
+import secrets
 import sys
+import threading
+import time
 import webbrowser
+import assets
+import compression
+import tracing
+from ansi import SGRMinimizer
+from events import FrameParser
+from forwarder import InputQueue, OutboundWindow, OutputCoalescer, Scrollback
+from inproc import Console, run_game
+from metrics import CONTENT_TYPE, Registry, open_fds, os_threads, proc_stat
+from reactor import Reactor
+from supervisor import Supervisor, apply_limits
+from zygote import ZygoteClient
 
 logging.getLogger("werkzeug").setLevel(logging.ERROR)
 
@@ -20,8 +37,59 @@ __version__ = "0.5.0.2"
 
 app = Flask(__name__, template_folder=".", static_folder=".", static_url_path="")
 app.config["SECRET_KEY"] = "secret!"
-# Per-client PTY state: map session id -> {fd, pid}
+# Per-client PTY state: map socket id -> session {fd, pid, token, sid, ...}
 app.config["clients"] = {}
+# Every live session by resume token, including ones whose browser has
+# disconnected but may still come back within the grace period.
+app.config["sessions"] = {}
+# What each connected browser told us when it connected, by socket id:
+# the asset IDs it has cached and the compressor it asked for, if any.
+app.config["browsers"] = {}
+app.config["reconnect_grace"] = 60.0
+app.config["scrollback_bytes"] = 262144
+# Admission control: at most max_sessions live sessions (attached or not);
+# further visitors wait in line (socket ids, oldest first) up to
+# max_waiting, beyond which connections are refused outright. Sessions
+# without input for idle_timeout seconds are ended (0 disables).
+app.config["max_sessions"] = 32
+app.config["max_waiting"] = 64
+app.config["waiting"] = []
+app.config["idle_timeout"] = 900.0
+# Per-child resource limits ("as" bytes, "cpu" seconds, "nproc"; 0 = unset).
+app.config["rlimits"] = {"as": 512 * 1024 * 1024, "cpu": 600, "nproc": 0}
+# "pty" runs --command on a PTY per session; "inproc" runs game.py sessions
+# as green threads inside this process.
+app.config["session_mode"] = "pty"
+# Zygote fork server (None when running an arbitrary --command) and the
+# pool of pre-forked idle sessions it feeds: list of {fd, pid, start}.
+app.config["zygote"] = None
+app.config["pool"] = []
+app.config["pool_size"] = 0
+app.config["refilling"] = False
+# Keystroke tracing: the share of keystrokes browsers are asked to trace
+# (0 = off) and the latest finished traces, oldest first.
+app.config["trace_rate"] = 0.0
+app.config["traces"] = collections.deque(maxlen=1000)
+# Output coalescing: flush a session's pending PTY output after this many
+# seconds or once this many bytes are buffered, whichever comes first.
+app.config["coalesce_window"] = 0.005
+app.config["coalesce_bytes"] = 16384
+# Backpressure: stop reading a session's PTY once this many bytes are sent
+# but not yet acknowledged by the browser, resume at the low watermark.
+app.config["queue_high"] = 65536
+app.config["queue_low"] = 16384
+# Input flood protection: bytes per second written to each PTY and the most
+# input that may wait in a session's queue before new input is rejected.
+app.config["input_rate"] = 2048
+app.config["input_max_bytes"] = 8192
+# Strip colour sequences that do not change what the terminal shows.
+app.config["minimize_sgr"] = True
+# "websocket" (permessage-deflate), "dictionary" (see compression.py) or "none".
+app.config["compression"] = "websocket"
+# Seconds between samples of /proc and queue depths for /metrics (0: never).
+app.config["metrics_interval"] = 5.0
+# Count live greenlets at each sample: a walk over the heap, for soak tests.
+app.config["count_greenlets"] = False
 
 # Choose an async mode for Flask-SocketIO. Prefer eventlet if available,
 # otherwise fall back to the standard threading mode. Some hosts (or
@@ -40,7 +108,130 @@ try:
 except Exception:
     preferred_async = "threading"
 
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode=preferred_async)
+# always_connect: accept the namespace before the connect handler runs, so
+# output from a game started there never reaches the client first.
+socketio = SocketIO(
+    app, cors_allowed_origins="*", async_mode=preferred_async, always_connect=True
+)
+
+
+def websocket_compression(wsgi_app):
+    """Keep permessage-deflate off connections that should not have it.
+
+    Browsers always offer it and the server always accepts; without the
+    offer the handshake settles on plain frames. Dictionary-compressed
+    connections (which say so in their query) would only be deflated twice.
+    """
+
+    def middleware(environ, start_response):
+        mode = app.config["compression"]
+        if mode == "none" or (
+            mode == "dictionary" and "compression=dictionary" in environ.get("QUERY_STRING", "")
+        ):
+            environ.pop("HTTP_SEC_WEBSOCKET_EXTENSIONS", None)
+        return wsgi_app(environ, start_response)
+
+    return middleware
+
+
+def no_delay(wsgi_app):
+    """Turn Nagle's algorithm off on every connection that makes a request.
+
+    A binary Socket.IO event goes out as two websocket frames. With Nagle
+    on, the second waits for the browser's delayed ACK, adding about 40 ms
+    to every echo.
+    """
+
+    def middleware(environ, start_response):
+        if "eventlet.input" in environ:
+            sock = environ["eventlet.input"].get_socket()
+        else:
+            sock = environ.get("werkzeug.socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                # Not TCP, e.g. a Unix socket behind a proxy.
+                pass
+        return wsgi_app(environ, start_response)
+
+    return middleware
+
+
+app.wsgi_app = no_delay(websocket_compression(app.wsgi_app))
+# Single event loop that forwards output for every client's PTY.
+reactor = Reactor(socketio)
+# Reaps game children and escalates SIGTERM to SIGKILL without blocking.
+supervisor = Supervisor(reactor)
+# Sessions can be torn down from a socket handler and the reactor at once.
+release_lock = threading.Lock()
+# Only one caller replaces a zygote that has died.
+zygote_lock = threading.Lock()
+# How often the pty's mode is re-read while the browser holds an unsent line.
+line_mode_poll_interval = 0.25
+
+# What /metrics reports. Counters are bumped where things happen; anything
+# that needs /proc or a walk over every session is left to sample_metrics().
+registry = Registry()
+spawn_seconds = registry.histogram(
+    "pyxterm_session_spawn_seconds",
+    "Time to start a session's game, by where it came from (pool, zygote, fork, inproc).",
+    [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5],
+    labels=("source",),
+)
+sessions_ended = registry.counter("pyxterm_sessions_ended_total", "Sessions ended for any reason.")
+forwarded_bytes = registry.counter(
+    "pyxterm_forwarded_bytes_total",
+    "Terminal bytes forwarded: out to browsers (before compression), in from them.",
+    labels=("direction",),
+)
+forwarded_messages = registry.counter(
+    "pyxterm_forwarded_messages_total", "Output batches sent and input messages received.", labels=("direction",)
+)
+game_events = registry.counter("pyxterm_game_events_total", "Game events forwarded, by type.", labels=("type",))
+dropped_input = registry.counter("pyxterm_input_dropped_bytes_total", "Browser input rejected by a full input queue.")
+pty_reads = registry.histogram(
+    "pyxterm_pty_read_bytes", "Size of each read from a game's PTY.", [16, 64, 256, 1024, 4096, 16384]
+)
+stop_seconds = registry.histogram(
+    "pyxterm_child_stop_seconds",
+    "Time from SIGTERM to a game child being reaped.",
+    [0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0],
+)
+supervisor.on_stopped = stop_seconds.observe
+keystroke_seconds = registry.histogram(
+    "pyxterm_keystroke_seconds",
+    "Where a traced keystroke's time went, by hop (see tracing.py); only with --trace-sample.",
+    [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5],
+    labels=("hop",),
+)
+trace_sessions = itertools.count(1)
+registry.gauge(
+    "pyxterm_sessions",
+    "Sessions by state: attached to a browser, detached within the reconnect grace, waiting for a seat.",
+    labels=("state",),
+    function=lambda: session_counts(),
+)
+sampled = {
+    name: registry.gauge(name, help)
+    for name, help in [
+        ("pyxterm_outbound_queue_bytes", "Output sent to browsers but not yet acknowledged, all sessions."),
+        ("pyxterm_outbound_queue_max_bytes", "The largest unacknowledged backlog of any one session."),
+        ("pyxterm_children", "Live game processes (sessions and the idle pool)."),
+        ("pyxterm_children_rss_bytes", "Resident memory of all game processes."),
+        ("pyxterm_children_rss_max_bytes", "Resident memory of the largest game process."),
+        ("pyxterm_children_cpu_seconds", "CPU time used so far by the live game processes."),
+        ("pyxterm_zombies", "Game processes that have exited but are not reaped yet."),
+        ("pyxterm_reaper_lag_seconds", "How long the oldest unreaped game process has been a zombie."),
+        ("pyxterm_zygote_rss_bytes", "Resident memory of the zygote."),
+        ("pyxterm_reactor_lag_seconds", "How late the last metrics sample ran on the reactor."),
+        ("pyxterm_server_rss_bytes", "Resident memory of the server."),
+        ("pyxterm_server_cpu_seconds", "CPU time used by the server."),
+        ("pyxterm_server_open_fds", "File descriptors the server has open."),
+        ("pyxterm_server_threads", "OS threads of the server."),
+        ("pyxterm_server_greenlets", "Green threads alive in the server, counting the hub (--count-greenlets only)."),
+    ]
+}
 
 
 def set_winsize(fd, row, col, xpix=0, ypix=0):
@@ -49,47 +240,757 @@ def set_winsize(fd, row, col, xpix=0, ypix=0):
     fcntl.ioctl(fd, termios.TIOCSWINSZ, winsize)
 
 
-def read_and_forward_pty_output(sid: str):
-    """Background task that reads from a single client's PTY and forwards output."""
+def set_echo(fd, enabled):
+    """Turn the pty's own echo on or off (the browser echoes in line mode)."""
+    attrs = termios.tcgetattr(fd)
+    if enabled:
+        attrs[3] |= termios.ECHO
+    else:
+        attrs[3] &= ~termios.ECHO
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+
+def check_pty_mode(client):
+    """Tell the browser when the child changes the pty's canonical mode or echo.
+
+    Line mode is only safe while the child reads whole lines with echo on;
+    as soon as it goes raw (ICANON off) the browser must send every key
+    again, and a prompt with echo off (a password) must not be echoed by
+    the browser either. While line mode is on the pty's ECHO flag is ours,
+    so the child's own setting is the one saved when line mode began; if
+    ECHO comes back on, the child set it itself.
+    """
+    if not client.get("fd"):
+        return
+    try:
+        lflag = termios.tcgetattr(client["fd"])[3]
+    except (termios.error, OSError):
+        return
+    canonical = bool(lflag & termios.ICANON)
+    echo = bool(lflag & termios.ECHO)
+    if client.get("line_mode"):
+        if echo:
+            # The child restored its own settings over ours.
+            client["line_mode"] = False
+            client["echo"] = True
+        elif not canonical:
+            client["line_mode"] = False
+            try:
+                set_echo(client["fd"], client.get("echo", True))
+            except (termios.error, OSError):
+                pass
+        else:
+            echo = client.get("echo", True)
+    else:
+        client["echo"] = echo
+    mode = (canonical, echo, bool(client.get("line_mode")))
+    if mode == client.get("mode"):
+        return
+    client["mode"] = mode
+    client["canonical"] = canonical
+    emit_pty_mode(client)
+
+
+def poll_pty_mode(client):
+    """Re-check the pty's mode while the browser holds an unsent line.
+
+    Those keys only reach the child on Enter, so a child that goes raw
+    without printing anything must still be noticed promptly. Idle
+    sessions are not polled: output and each new partial line prompt a
+    check anyway.
+    """
+    client["mode_poll"] = None
+    if client.get("closed") or not (client.get("line_mode") and client.get("line_pending")):
+        return
+    check_pty_mode(client)
+    if client.get("line_mode"):
+        client["mode_poll"] = reactor.call_later(line_mode_poll_interval, lambda: poll_pty_mode(client))
+
+
+def emit_pty_mode(client):
+    emit_to(
+        client,
+        "pty-mode",
+        {
+            "canonical": bool(client.get("canonical")),
+            "echo": bool(client.get("echo", True)),
+            "line": bool(client.get("line_mode")),
+        },
+    )
+
+
+def emit_to(client, event, data, **kwargs):
+    """Emit to the browser currently attached to a session, if there is one."""
+    sid = client.get("sid")
+    if sid:
+        socketio.emit(event, data, namespace="/pty", to=sid, **kwargs)
+
+
+def read_and_forward_pty_output(client):
+    """Reactor callback: read whatever a client's PTY has ready and forward it."""
     max_read_bytes = 1024 * 20
-    while True:
-        socketio.sleep(0.01)
-        client = app.config["clients"].get(sid)
-        if not client:
+    fd = client.get("fd")
+    if not fd or client.get("closed"):
+        return
+    try:
+        raw = os.read(fd, max_read_bytes)
+    except BlockingIOError:
+        # Stale wakeup; the reactor will call again when data arrives.
+        return
+    except OSError:
+        raw = None
+    try:
+        if not raw:
+            raise OSError("pty closed")
+        pty_reads.observe(len(raw))
+        forward_output(client, raw)
+        check_pty_mode(client)
+    except OSError:
+        if client.get("closed"):
+            # Already being torn down elsewhere (e.g. killed by the reaper).
             return
-        fd = client.get("fd")
-        if not fd:
+        logging.exception("pty read error for session %s, cleaning up", client["token"])
+        held = client["frames"].flush()
+        if held:
+            send_output(client, held)
+        flush_output(client)
+        close_pty(client, "pty closed")
+
+
+def release_session(client):
+    """Forget a session and free its PTY; returns False if already released."""
+    with release_lock:
+        if client.get("closed"):
+            return False
+        client["closed"] = True
+    app.config["sessions"].pop(client["token"], None)
+    if client.get("sid"):
+        app.config["clients"].pop(client["sid"], None)
+    if client.get("expiry"):
+        client["expiry"].cancel()
+    fd = client.get("fd")
+    if fd:
+        reactor.remove_reader(fd)
+    for part in ("out", "input", "console"):
+        if client.get(part):
+            client[part].close()
+    try:
+        os.close(fd)
+    except Exception:
+        pass
+    sessions_ended.inc()
+    # The freed seat goes to whoever is first in line.
+    reactor.call_later(0, admit_waiting)
+    return True
+
+
+def close_pty(client, reason):
+    """Tear down a session whose PTY failed and tell its browser why."""
+    # The child is normally gone already; make sure it does not linger.
+    if client.get("pid"):
+        supervisor.terminate(client["pid"])
+    if release_session(client):
+        emit_to(client, "pty-closed", {"reason": reason})
+
+
+def end_session(client):
+    """Kill a session's child process and free everything it holds."""
+    # Stop forwarding first so the reactor does not race us to the EOF.
+    if client.get("fd"):
+        reactor.remove_reader(client["fd"])
+    # The supervisor reaps it in the background and follows up with
+    # SIGKILL if SIGTERM is ignored, so this never blocks the loop.
+    if client.get("pid"):
+        supervisor.terminate(client["pid"])
+    release_session(client)
+
+
+def expire_session(client):
+    """Grace period over without a reconnect: end the detached session."""
+    if client.get("sid") is None and not client.get("closed"):
+        logging.info("session %s expired after disconnect", client["token"])
+        end_session(client)
+
+
+def emit_output(client, data):
+    """Send a batch of raw PTY bytes to one client as a binary attachment.
+
+    Every batch is kept in the session's scrollback first so it can be
+    replayed after a reconnect. The browser acks once the batch is
+    rendered; until then it counts against the session's outbound window.
+    """
+    client["scrollback"].append(data)
+    sid = client.get("sid")
+    if not sid:
+        return
+    window = client["window"]
+    size = len(data)
+    window.sent(size)
+    forwarded_bytes.inc(size, direction="out")
+    forwarded_messages.inc(direction="out")
+    if client["deflate"]:
+        data = client["deflate"].compress(data)
+    trace = client.get("trace")
+    if trace and trace["read"] and not trace["emitted"]:
+        # Tells the browser the echo of its traced keystroke comes next.
+        trace["emitted"] = time.monotonic()
+        socketio.emit("trace-mark", {"id": trace["id"]}, namespace="/pty", to=sid)
+    # Emit only to this client (use room = sid)
+    socketio.emit(
+        "pty-output",
+        data,
+        namespace="/pty",
+        to=sid,
+        callback=lambda *args: window.acked(size),
+    )
+
+
+def forward_output(client, data):
+    """Pass a game's output on, taking its event frames out in order."""
+    for item in client["frames"].feed(data):
+        if isinstance(item, dict):
+            game_event(client, item)
+        else:
+            send_output(client, item)
+
+
+def send_output(client, data):
+    """Queue terminal output for the browser, minus redundant SGRs."""
+    trace = client.get("trace")
+    if trace and trace["written"] and not trace["read"]:
+        trace["read"] = time.monotonic()
+    if client["sgr"]:
+        data = client["sgr"].feed(data)
+    if data:
+        client["out"].feed(data)
+
+
+def flush_output(client):
+    """Send everything held back so far, e.g. an escape split by the last read."""
+    sgr = client["sgr"]
+    if sgr:
+        held = sgr.flush()
+        if held:
+            client["out"].feed(held)
+    client["out"].flush()
+
+
+def game_event(client, event):
+    """Record a game event in the session's state and send it to the browser.
+
+    Output batched so far goes out first so the browser sees the event
+    exactly where the game sent it. A scene's text is kept in the
+    scrollback as if it had been printed, and its ``size`` tells the
+    browser how far that moves the replay offset.
+    """
+    if client.get("closed") or not isinstance(event, dict):
+        return
+    game_events.inc(type=event.get("type"))
+    flush_output(client)
+    sgr = client["sgr"]
+    state = client["game"]
+    if event.get("type") == "scene":
+        steps = []
+        parts = []
+        for step in event["steps"] if isinstance(event.get("steps"), list) else []:
+            if not (isinstance(step, (list, tuple)) and len(step) == 2 and isinstance(step[0], (int, float))):
+                logging.warning("session %s sent a malformed scene step", client["token"])
+                continue
+            at, item = step
+            if isinstance(item, str):
+                data = item.encode()
+                if sgr:
+                    # The browser prints the steps in order, so they can be
+                    # optimised as one continuation of the output stream.
+                    data = sgr.feed(data) + sgr.flush()
+                parts.append((data, None))
+                steps.append([at, data.decode(errors="replace")])
+            elif isinstance(item, dict) and item.get("type") == "asset":
+                data, item = asset_event(client, item)
+                if item:
+                    parts.append((data, item["id"]))
+                    steps.append([at, item])
+            elif isinstance(item, dict):
+                update_game_state(state, item)
+                steps.append([at, item])
+        event = dict(event, steps=steps, size=keep_output(client, parts))
+    elif event.get("type") == "asset":
+        data, event = asset_event(client, event)
+        if not event:
             return
-        timeout_sec = 0
-        try:
-            (data_ready, _, _) = select.select([fd], [], [], timeout_sec)
-        except Exception:
-            data_ready = []
-        if data_ready:
+        event["size"] = keep_output(client, [(data, event["id"])])
+    else:
+        update_game_state(state, event)
+    if client.get("sid"):
+        emit_event(client, event)
+
+
+def emit_event(client, event):
+    """Send a game event to the session's browser, compressed if it asked."""
+    if client["deflate"]:
+        event = client["deflate"].compress_event(event)
+    socketio.emit("game-event", event, namespace="/pty", to=client["sid"])
+
+
+def asset_event(client, event):
+    """The bytes an ``asset`` event stands for and the event to send on.
+
+    The bytes only go along the first time the browser sees the asset;
+    after that it prints its cached copy.
+    """
+    digest = event.get("id")
+    data = assets.find(digest) if isinstance(digest, str) else None
+    if data is None:
+        logging.warning("session %s sent unknown asset %r", client["token"], digest)
+        return b"", None
+    if client["sgr"]:
+        # The terminal gets the asset as it is; keep up with its colours.
+        client["sgr"].feed(data)
+    event = {"type": "asset", "id": digest}
+    if digest not in client["assets"]:
+        client["assets"].add(digest)
+        event["data"] = data
+    return data, event
+
+
+def keep_output(client, parts):
+    """Add output sent as events to the scrollback; returns its size.
+
+    ``parts`` are (bytes, asset id or None). Where each asset lands is
+    noted so that a replay can send its ID instead.
+    """
+    scrollback = client["scrollback"]
+    spans = client["asset_spans"]
+    size = 0
+    for data, digest in parts:
+        if digest:
+            spans.append((scrollback.total, len(data), digest))
+        scrollback.append(data)
+        size += len(data)
+    while spans and spans[0][0] < scrollback.start:
+        spans.popleft()
+    return size
+
+
+def cut_assets(client, start, data):
+    """Take assets the browser has cached out of replay ``data`` from ``start``.
+
+    Returns the remaining bytes and [position, id] pairs saying where
+    each asset goes back in.
+    """
+    parts = []
+    refs = []
+    pos = start
+    length = 0
+    for span_start, size, digest in client["asset_spans"]:
+        if span_start < pos or digest not in client["assets"]:
+            continue
+        parts.append(data[pos - start:span_start - start])
+        length += len(parts[-1])
+        refs.append([length, digest])
+        pos = span_start + size
+    parts.append(data[pos - start:])
+    return b"".join(parts), refs
+
+
+def update_game_state(state, event):
+    kind = event.get("type")
+    if kind == "title":
+        state["title"] = event.get("name")
+    elif kind == "state":
+        state["lives"] = event.get("lives")
+        state["visits"] = event.get("visits")
+    elif kind == "outcome":
+        key = "correct" if event.get("correct") else "wrong"
+        state[key] = state.get(key, 0) + 1
+
+
+def build_pipeline(client, pause, resume):
+    """Scrollback, coalescer and outbound window shared by both session modes."""
+    client["frames"] = FrameParser()
+    client["game"] = {}
+    client["asset_spans"] = collections.deque()  # (offset, size, id) in the scrollback
+    client["sgr"] = SGRMinimizer() if app.config["minimize_sgr"] else None
+    client["scrollback"] = Scrollback(max_bytes=app.config["scrollback_bytes"], tracker=SGRMinimizer())
+    client["out"] = OutputCoalescer(
+        reactor,
+        lambda data: emit_output(client, data),
+        window=app.config["coalesce_window"],
+        max_bytes=app.config["coalesce_bytes"],
+    )
+    client["window"] = OutboundWindow(
+        pause=pause,
+        resume=resume,
+        high=app.config["queue_high"],
+        low=app.config["queue_low"],
+    )
+
+
+def watch_pty(client):
+    """Hand a session's PTY to the shared reactor for output forwarding."""
+    fd = client["fd"]
+    os.set_blocking(fd, False)
+    build_pipeline(client, lambda: reactor.pause_reader(fd), lambda: reactor.resume_reader(fd))
+    client["input"] = InputQueue(
+        reactor,
+        fd,
+        on_error=lambda exc: on_input_error(client, exc),
+        rate=app.config["input_rate"],
+        max_bytes=app.config["input_max_bytes"],
+    )
+    if app.config["trace_rate"]:
+        client["input"].on_write = lambda written: trace_written(client, written)
+    reactor.add_reader(fd, lambda _fd: read_and_forward_pty_output(client))
+    # Report the initial tty mode once the connect handshake has finished.
+    reactor.call_later(0, lambda: report_mode(client))
+
+
+def start_console(client):
+    """Run game.py for a session as a green thread of this process."""
+    console = Console(
+        # Game output joins the pipeline on the reactor, in order.
+        write=lambda data: reactor.call_later(0, lambda: send_output(client, data)),
+        on_event=lambda event: reactor.call_later(0, lambda: game_event(client, event)),
+        max_input=app.config["input_max_bytes"],
+    )
+    client["console"] = console
+    # input() reads whole lines, like a PTY that never leaves canonical mode.
+    client["canonical"] = True
+    build_pipeline(client, console.pause, console.resume)
+    socketio.start_background_task(run_console, client)
+    reactor.call_later(0, lambda: report_mode(client))
+
+
+def run_console(client):
+    run_game(client["console"], app.config["cmd"][2:])
+    reactor.call_later(0, lambda: finish_console(client))
+
+
+def finish_console(client):
+    if not client.get("closed"):
+        flush_output(client)
+        close_pty(client, "game over")
+
+
+def report_mode(client):
+    if not client.get("closed"):
+        check_pty_mode(client)
+        emit_pty_mode(client)
+
+
+def new_session(sid, fd, pid):
+    """Register a freshly spawned PTY/child as a session attached to ``sid``."""
+    client = {
+        "fd": fd,
+        "pid": pid,
+        "sid": sid,
+        "token": secrets.token_urlsafe(18),
+        "last_input": time.monotonic(),
+    }
+    client.update(browser_options(sid))
+    app.config["clients"][sid] = client
+    app.config["sessions"][client["token"]] = client
+    return client
+
+
+def session_info(client):
+    """The "session" event: the resume token and how often to trace keystrokes."""
+    info = {"token": client["token"]}
+    if app.config["trace_rate"]:
+        info["trace"] = app.config["trace_rate"]
+    return info
+
+
+def browser_options(sid):
+    """The assets and compressor of the browser connected as ``sid``."""
+    browser = app.config["browsers"].get(sid) or {}
+    return {"assets": browser.get("assets", set()), "deflate": browser.get("deflate")}
+
+
+def attach(client, sid):
+    """Attach a (possibly detached) session to a new browser connection."""
+    old_sid = client.get("sid")
+    if old_sid and old_sid != sid:
+        # The same session was opened somewhere else; that tab loses it.
+        app.config["clients"].pop(old_sid, None)
+        socketio.emit("pty-closed", {"reason": "resumed elsewhere"}, namespace="/pty", to=old_sid)
+    if client.get("expiry"):
+        client["expiry"].cancel()
+        client["expiry"] = None
+    client["sid"] = sid
+    # The new browser has no line half typed.
+    client["line_pending"] = False
+    client.update(browser_options(sid))
+    app.config["clients"][sid] = client
+    # Acks for anything sent to the old connection will never arrive.
+    window = client["window"]
+    window.acked(window.inflight)
+
+
+def resume_session(client, sid, offset):
+    """Reattach a session and replay the output the browser missed."""
+    if client.get("closed") or not socketio.server.manager.is_connected(sid, "/pty"):
+        return
+    # Batched output goes out before the new browser is attached: it then
+    # only lands in the scrollback and reaches that browser once, in the
+    # replay below.
+    client["out"].flush()
+    attach(client, sid)
+    scrollback = client["scrollback"]
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        offset = -1
+    # If the browser still has everything up to `offset` on screen, send
+    # just the rest; otherwise it must clear and redraw what we kept.
+    reset = not scrollback.start <= offset <= scrollback.total
+    start = scrollback.start if reset else offset
+    data, refs = cut_assets(client, start, scrollback.since(start))
+    if reset:
+        # Put the colours back to what they were where the replay starts;
+        # the offset moves back so the browser still ends up at `total`.
+        prologue = scrollback.prologue
+        data = prologue + data
+        refs = [[pos + len(prologue), digest] for pos, digest in refs]
+        start -= len(prologue)
+    if reset or data or refs:
+        if client["deflate"]:
+            data = client["deflate"].compress(data)
+        socketio.emit(
+            "pty-replay",
+            {"reset": reset, "offset": start, "data": data, "assets": refs},
+            namespace="/pty",
+            to=sid,
+        )
+    socketio.emit("session", session_info(client), namespace="/pty", to=sid)
+    if client["game"]:
+        emit_event(client, dict(client["game"], type="snapshot"))
+    report_mode(client)
+    logging.info(
+        "resumed session %s (pid %s) for sid %s, replaying from %s",
+        client["token"],
+        client["pid"],
+        sid,
+        "start" if reset else offset,
+    )
+
+
+def spawn_session():
+    """Fork a game child via the zygote; returns a pool entry {fd, pid, start}.
+
+    A zygote that has died is replaced by a new one, once per call.
+    """
+    zygote = app.config["zygote"]
+    try:
+        fd, pid, start = zygote.spawn()
+    except OSError:
+        if zygote.alive():
+            raise
+        with zygote_lock:
+            if app.config["zygote"] is zygote:
+                logging.error(
+                    "zygote pid %s exited with status %s; starting a new one",
+                    zygote.proc.pid,
+                    zygote.proc.returncode,
+                )
+                app.config["zygote"] = zygote.restart()
+        fd, pid, start = app.config["zygote"].spawn()
+    return {"fd": fd, "pid": pid, "start": start}
+
+
+def start_child(entry):
+    """Let a pre-forked child start playing; False if it is already gone.
+
+    The start pipe is closed either way, and a failed entry's PTY with it.
+    """
+    try:
+        set_winsize(entry["fd"], 50, 50)
+        # Release the child only once its window size is in place.
+        os.write(entry["start"], b"1")
+        return True
+    except OSError as exc:
+        logging.warning("pre-forked session pid %s could not start (%s); discarding it", entry["pid"], exc)
+        os.close(entry["fd"])
+        return False
+    finally:
+        os.close(entry["start"])
+
+
+def stop_zygote():
+    """Discard the idle pool and let the zygote exit; called at shutdown."""
+    zygote = app.config["zygote"]
+    if not zygote:
+        return
+    app.config["zygote"] = None
+    app.config["pool_size"] = 0
+    for entry in app.config["pool"]:
+        # EOF on its start pipe makes a pooled child exit without playing.
+        os.close(entry["start"])
+        os.close(entry["fd"])
+    app.config["pool"] = []
+    zygote.close()
+
+
+def refill_pool():
+    """Top the idle session pool back up to the configured size."""
+    if app.config["refilling"]:
+        # Each take starts a refill. Run one at a time, or they all top up
+        # the pool while spawns are in flight and it overfills for good.
+        return
+    app.config["refilling"] = True
+    pool = app.config["pool"]
+    try:
+        while app.config["zygote"] and len(pool) < app.config["pool_size"]:
             try:
-                raw = os.read(fd, max_read_bytes)
-                if not raw:
-                    raise OSError("pty closed")
-                output = raw.decode(errors="ignore")
-                # Emit only to this client (use room = sid)
-                socketio.emit("pty-output", {"output": output}, namespace="/pty", to=sid)
+                pool.append(spawn_session())
             except OSError:
-                logging.exception("pty read error for sid %s, cleaning up", sid)
-                # Attempt to reap child
-                try:
-                    pid = client.get("pid")
-                    if pid:
-                        os.waitpid(pid, os.WNOHANG)
-                except Exception:
-                    pass
-                # cleanup
-                try:
-                    os.close(fd)
-                except Exception:
-                    pass
-                app.config["clients"].pop(sid, None)
-                socketio.emit("pty-closed", {"reason": "pty closed"}, namespace="/pty", to=sid)
+                logging.exception("failed to pre-fork a pooled session")
                 return
+    finally:
+        app.config["refilling"] = False
+
+
+def take_session():
+    """Hand out a ready game child, preferring one from the idle pool."""
+    pool = app.config["pool"]
+    entry = pool.pop(0) if pool else spawn_session()
+    if app.config["pool_size"]:
+        socketio.start_background_task(refill_pool)
+    return entry
+
+
+def free_seats():
+    return max(0, app.config["max_sessions"] - len(app.config["sessions"]))
+
+
+def notify_waiting():
+    """Tell every waiting visitor where they are in line."""
+    waiting = app.config["waiting"]
+    for position, sid in enumerate(list(waiting), 1):
+        socketio.emit(
+            "queue",
+            {"position": position, "waiting": len(waiting)},
+            namespace="/pty",
+            to=sid,
+        )
+
+
+def admit_waiting():
+    """Start sessions for waiting visitors while there are free seats."""
+    waiting = app.config["waiting"]
+    admitted = False
+    while waiting and free_seats():
+        sid = waiting.pop(0)
+        start_session(sid)
+        admitted = True
+    if admitted:
+        notify_waiting()
+
+
+def reap_idle():
+    """Periodic reactor timer: end sessions nobody has typed into for too long."""
+    timeout = app.config["idle_timeout"]
+    now = time.monotonic()
+    for client in list(app.config["sessions"].values()):
+        if not client.get("closed") and now - client["last_input"] >= timeout:
+            logging.info("session %s idle for %ds; ending it", client["token"], timeout)
+            emit_to(client, "pty-closed", {"reason": "idle timeout"})
+            end_session(client)
+    reactor.call_later(min(60.0, timeout / 4), reap_idle)
+
+
+def session_counts():
+    counts = {("attached",): 0, ("detached",): 0, ("waiting",): len(app.config["waiting"])}
+    for client in list(app.config["sessions"].values()):
+        counts[("attached",) if client.get("sid") else ("detached",)] += 1
+    return counts
+
+
+zombie_since = {}  # pid -> when a sample first found it a zombie
+
+
+def count_greenlets():
+    """Greenlets alive in this process.
+
+    A walk over the whole heap on the event loop, tens of milliseconds and
+    growing with the sessions, so it is off unless --count-greenlets asks
+    for it (soak.py does).
+    """
+    if not app.config["count_greenlets"] or preferred_async != "eventlet":
+        return 0
+    import greenlet
+
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, greenlet.greenlet) and not obj.dead)
+
+
+def sample_metrics(due=None):
+    """Periodic reactor timer: take the readings /metrics reports.
+
+    Reads /proc/<pid>/stat once per game process, so the cost grows with
+    the number of sessions but is paid every few seconds, not per read.
+    """
+    interval = app.config["metrics_interval"]
+    now = time.monotonic()
+    if due is not None:
+        sampled["pyxterm_reactor_lag_seconds"].set(max(0.0, now - due))
+    inflight = [client["window"].inflight for client in list(app.config["sessions"].values()) if client.get("window")]
+    sampled["pyxterm_outbound_queue_bytes"].set(sum(inflight))
+    sampled["pyxterm_outbound_queue_max_bytes"].set(max(inflight, default=0))
+
+    pids = set(supervisor.pids()) | {entry["pid"] for entry in app.config["pool"]}
+    live = rss_total = rss_max = cpu_total = zombies = 0
+    for pid in pids:
+        stat = proc_stat(pid)
+        if stat is None:
+            continue
+        state, cpu, rss = stat
+        if state == "Z":
+            zombies += 1
+            zombie_since.setdefault(pid, now)
+            continue
+        zombie_since.pop(pid, None)
+        live += 1
+        rss_total += rss
+        rss_max = max(rss_max, rss)
+        cpu_total += cpu
+    for pid in [pid for pid in zombie_since if pid not in pids]:
+        del zombie_since[pid]
+    sampled["pyxterm_children"].set(live)
+    sampled["pyxterm_children_rss_bytes"].set(rss_total)
+    sampled["pyxterm_children_rss_max_bytes"].set(rss_max)
+    sampled["pyxterm_children_cpu_seconds"].set(cpu_total)
+    sampled["pyxterm_zombies"].set(zombies)
+    sampled["pyxterm_reaper_lag_seconds"].set(now - min(zombie_since.values(), default=now))
+
+    zygote = app.config["zygote"]
+    stat = proc_stat(zygote.proc.pid) if zygote else None
+    sampled["pyxterm_zygote_rss_bytes"].set(stat[2] if stat else 0)
+    stat = proc_stat(os.getpid())
+    if stat:
+        sampled["pyxterm_server_cpu_seconds"].set(stat[1])
+        sampled["pyxterm_server_rss_bytes"].set(stat[2])
+    sampled["pyxterm_server_open_fds"].set(open_fds() or 0)
+    sampled["pyxterm_server_threads"].set(os_threads() or 0)
+    sampled["pyxterm_server_greenlets"].set(count_greenlets())
+    if interval > 0:
+        due = time.monotonic() + interval
+        reactor.call_later(interval, lambda: sample_metrics(due))
+
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus text exposition of the counters and the latest sample."""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+@app.route("/trace")
+def keystroke_trace():
+    """Recent keystroke traces as a Chrome trace file (404 unless tracing)."""
+    if not app.config["trace_rate"]:
+        return {"error": "not enabled"}, 404
+    response = Response(json.dumps(tracing.chrome_trace(app.config["traces"])), mimetype="application/json")
+    response.headers["Content-Disposition"] = "attachment; filename=keystrokes.json"
+    return response
 
 
 @app.route("/")
@@ -97,6 +998,66 @@ def index():
     return render_template("index.html")
 
 
+@app.route("/sessions")
+def sessions():
+    """Per-session queue depths (tokens and sids are deliberately left out)."""
+    result = []
+    mode = app.config["session_mode"]
+    for client in list(app.config["sessions"].values()):
+        window = client.get("window")
+        out = client.get("out")
+        if not window or not out:
+            continue
+        result.append(
+            {
+                "pid": client.get("pid"),
+                "mode": mode,
+                "attached": client.get("sid") is not None,
+                "pending_bytes": out.pending,
+                "inflight_bytes": window.inflight,
+                "input_bytes": (client.get("input") or client["console"]).pending,
+                "paused": window.paused,
+                "scrollback_bytes": client["scrollback"].total - client["scrollback"].start,
+                "scrollback_compressed_bytes": client["scrollback"].compressed_size,
+                "game": client["game"],
+            }
+        )
+    return {"sessions": result}
+
+
+@app.route("/output-dictionary")
+def output_dictionary():
+    """The preset dictionary for --compression dictionary (404 otherwise)."""
+    if app.config["compression"] != "dictionary":
+        return {"error": "not enabled"}, 404
+    digest = compression.dictionary_id()
+    response = Response(compression.dictionary(), mimetype="application/octet-stream")
+    response.headers["X-Dictionary-Id"] = digest
+    response.set_etag(digest)
+    return response.make_conditional(request)
+
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: the server is up and answering requests."""
+    return {"status": "ok"}
+
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: 503 while every seat is taken so a balancer routes elsewhere."""
+    free = free_seats()
+    body = {
+        "status": "ready" if free else "full",
+        "sessions": len(app.config["sessions"]),
+        "max_sessions": app.config["max_sessions"],
+        "free": free,
+        "waiting": len(app.config["waiting"]),
+        "max_waiting": app.config["max_waiting"],
+    }
+    return body, 200 if free else 503
+
+
 @socketio.on("pty-input", namespace="/pty")
 def pty_input(data):
     """write to the child pty. The pty sees this as if you are typing in a real
@@ -104,24 +1065,128 @@ def pty_input(data):
     """
     sid = request.sid
     client = app.config["clients"].get(sid)
-    if client and client.get("fd"):
+    if client and (client.get("fd") or client.get("console")):
         logging.debug("received input from browser (sid=%s): %s", sid, data["input"])
+        payload = data["input"].encode()
+        client["last_input"] = time.monotonic()
+        forwarded_bytes.inc(len(payload), direction="in")
+        forwarded_messages.inc(direction="in")
+        if app.config["trace_rate"] and data.get("trace"):
+            start_trace(client, data["trace"], len(payload))
+        if client.get("console"):
+            accepted = client["console"].feed(data["input"])
+            if accepted and client.get("trace"):
+                # The game has it as soon as the console does.
+                client["trace"]["written"] = client["trace"]["received"]
+        else:
+            accepted = client["input"].push(payload)
+        if not accepted:
+            client.pop("trace", None)
+            # Reject the whole chunk rather than deliver half a paste.
+            logging.warning("input queue full for sid %s; dropped %d bytes", sid, len(payload))
+            dropped_input.inc(len(payload))
+            socketio.emit(
+                "pty-input-dropped",
+                {"bytes": len(payload), "reason": "input queue full"},
+                namespace="/pty",
+                to=sid,
+            )
+
+
+def start_trace(client, trace_id, size):
+    """Follow one keystroke the browser asked us to trace.
+
+    A trace still open (its echo never came, or the browser never
+    reported back) is dropped in favour of the new one.
+    """
+    if not isinstance(trace_id, int):
+        return
+    queue = client.get("input")
+    client["trace"] = {
+        "id": trace_id,
+        "session": client.setdefault("trace_session", next(trace_sessions)),
+        "bytes": size,
+        "received": time.monotonic(),
+        # Written once the PTY has taken everything queued up to this key.
+        "until": queue.written + queue.pending + size if queue else 0,
+        "written": None,
+        "read": None,
+        "emitted": None,
+    }
+
+
+def trace_written(client, written):
+    """InputQueue.on_write: note when a traced keystroke reaches the PTY."""
+    trace = client.get("trace")
+    if trace and not trace["written"] and written >= trace["until"]:
+        trace["written"] = time.monotonic()
+
+
+@socketio.on("trace-report", namespace="/pty")
+def trace_report(data):
+    """The browser's half of a trace: round trip and render time, in seconds."""
+    client = app.config["clients"].get(request.sid)
+    trace = client and client.get("trace")
+    if not trace or not isinstance(data, dict) or data.get("id") != trace["id"] or not trace["emitted"]:
+        return
+    try:
+        trace["round_trip"] = float(data["round_trip"])
+        trace["render"] = float(data["render"])
+    except (KeyError, TypeError, ValueError):
+        return
+    del client["trace"]
+    if not (0 <= trace["round_trip"] < 60 and 0 <= trace["render"] < 60):
+        return
+    for hop, seconds in tracing.hops(trace).items():
+        keystroke_seconds.observe(seconds, hop=hop)
+    app.config["traces"].append(trace)
+
+
+def on_input_error(client, exc):
+    logging.error("pty write error for session %s (%s); cleaning up", client["token"], exc)
+    close_pty(client, "pty write error")
+
+
+@socketio.on("line-mode", namespace="/pty")
+def line_mode(data):
+    """Browser asks to edit and echo lines itself and send them whole.
+
+    Granted only while the child has the pty in canonical mode with echo
+    on; the pty's echo is switched off so typed text is not printed twice.
+    """
+    sid = request.sid
+    client = app.config["clients"].get(sid)
+    if client and client.get("console"):
+        # No pty echo to turn off: the console just stops echoing.
+        client["line_mode"] = client["console"].line_mode = bool(data.get("enabled"))
+        emit_pty_mode(client)
+        return
+    if not client or not client.get("fd"):
+        return
+    check_pty_mode(client)
+    wanted = bool(data.get("enabled")) and bool(client.get("canonical")) and client.get("echo", True)
+    if wanted != bool(client.get("line_mode")):
         try:
-            os.write(client.get("fd"), data["input"].encode())
-        except OSError:
-            logging.exception("pty write error for sid %s; cleaning up", sid)
-            try:
-                pid = client.get("pid")
-                if pid:
-                    os.waitpid(pid, os.WNOHANG)
-            except Exception:
-                pass
-            try:
-                os.close(client.get("fd"))
-            except Exception:
-                pass
-            app.config["clients"].pop(sid, None)
-            socketio.emit("pty-closed", {"reason": "pty write error"}, namespace="/pty", to=sid)
+            # Leaving line mode gives the child back the echo it had.
+            set_echo(client["fd"], False if wanted else client.get("echo", True))
+            client["line_mode"] = wanted
+        except (termios.error, OSError):
+            logging.exception("could not switch line mode for sid %s", sid)
+        client["mode"] = (bool(client.get("canonical")), client.get("echo", True), client["line_mode"])
+    emit_pty_mode(client)
+
+
+@socketio.on("line-pending", namespace="/pty")
+def line_pending(data):
+    """Browser started (or finished) editing a line it has not sent yet."""
+    client = app.config["clients"].get(request.sid)
+    if not client or not client.get("fd"):
+        return
+    client["line_pending"] = bool(data.get("pending"))
+    if client["line_pending"] and client.get("line_mode") and not client.get("mode_poll"):
+        # Check at once: the first key of a line may be the first since
+        # the child went raw.
+        client["mode_poll"] = reactor.call_later(0, lambda: poll_pty_mode(client))
 
 
 @socketio.on("resize", namespace="/pty")
@@ -134,43 +1199,127 @@ def resize(data):
 
 
 @socketio.on("connect", namespace="/pty")
-def connect():
-    """new client connected: spawn a dedicated PTY for this sid."""
+def connect(auth=None):
+    """new client connected: resume its session or spawn a dedicated PTY."""
     sid = request.sid
     logging.info("new client connected: %s", sid)
 
     # If this sid already has a client (reconnect), clean it up first
     existing = app.config["clients"].get(sid)
     if existing:
+        end_session(existing)
+
+    # A browser coming back within the grace period presents the token we
+    # gave it and gets its running game back instead of a new one.
+    auth = auth if isinstance(auth, dict) else {}
+    register_browser(sid, auth)
+    resumable = app.config["sessions"].get(auth.get("token") or "")
+    if resumable and not resumable.get("closed"):
+        # Attach and replay from the reactor once the handshake is done,
+        # so the replay is ordered with the live output that follows it.
+        offset = auth.get("offset")
+        reactor.call_later(0, lambda: resume_session(resumable, sid, offset))
+        return
+
+    # New visitors queue for a seat once the server is at capacity; the
+    # line itself is bounded so a spike is shed instead of piling up.
+    waiting = app.config["waiting"]
+    if waiting or not free_seats():
+        if len(waiting) >= app.config["max_waiting"]:
+            logging.warning("server full; refusing sid %s", sid)
+            app.config["browsers"].pop(sid, None)
+            socketio.emit("pty-closed", {"reason": "server full"}, namespace="/pty", to=sid)
+            raise ConnectionRefusedError("server full")
+        waiting.append(sid)
+        logging.info("server full; sid %s waiting at position %d", sid, len(waiting))
+        reactor.call_later(0, notify_waiting)
+        return
+
+    start_session(sid)
+
+
+def register_browser(sid, auth):
+    """Note the assets a browser has cached and set up the compression it wants."""
+    cached = auth.get("assets")
+    browser = {"assets": set(), "deflate": None}
+    if isinstance(cached, list):
+        browser["assets"] = {
+            digest for digest in cached[:256] if isinstance(digest, str) and len(digest) <= 64
+        }
+    if app.config["compression"] == "dictionary" and auth.get("dictionary") == compression.dictionary_id():
+        browser["deflate"] = compression.Compressor()
+        # Sent before anything compressed, so the browser is ready for it.
+        socketio.emit("compression", {"method": "dictionary"}, namespace="/pty", to=sid)
+    app.config["browsers"][sid] = browser
+
+
+def start_session(sid):
+    """Start a game for the browser on ``sid``: in-process or on its own PTY."""
+    started = time.perf_counter()
+    if app.config["session_mode"] == "inproc":
+        client = new_session(sid, None, None)
+        # The browser starts counting output afresh on a new token, so it
+        # must have it before any output.
+        socketio.emit("session", session_info(client), namespace="/pty", to=sid)
+        start_console(client)
+        spawn_seconds.observe(time.perf_counter() - started, source="inproc")
+        logging.info("started in-process game for sid %s", sid)
+        return
+
+    entry = None
+    # A pooled child can die while it waits (with its zygote, say); try
+    # another before falling back to a plain fork.
+    for _ in range(3 if app.config["zygote"] else 0):
+        source = "pool" if app.config["pool"] else "zygote"
         try:
-            pid = existing.get("pid")
-            if pid:
-                os.kill(pid, signal.SIGTERM)
-        except Exception:
-            pass
-        try:
-            fd = existing.get("fd")
-            if fd:
-                os.close(fd)
-        except Exception:
-            pass
-        app.config["clients"].pop(sid, None)
+            entry = take_session()
+        except OSError:
+            logging.exception("zygote spawn failed for sid %s; forking the game directly", sid)
+            break
+        supervisor.watch(entry["pid"], own=False)
+        if start_child(entry):
+            break
+        entry = None
+    if entry:
+        fd, child_pid = entry["fd"], entry["pid"]
+        client = new_session(sid, fd, child_pid)
+        socketio.emit("session", session_info(client), namespace="/pty", to=sid)
+        watch_pty(client)
+        spawn_seconds.observe(time.perf_counter() - started, source=source)
+        logging.info("started zygote child pid %s for sid %s", child_pid, sid)
+        return
 
     (child_pid, fd) = pty.fork()
     if child_pid == 0:
-        # Ensure the child runs with the script's directory as CWD so
-        # relative paths like "game.py" resolve correctly even when
-        # the parent process was started from a different directory.
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        subprocess.run(app.config["cmd"], cwd=script_dir)
+        # Become the command itself rather than keeping a copy of the
+        # server around to wait for it: the pid the server tracks (and
+        # signals) is then the game's own.
+        try:
+            # Ensure the child runs with the script's directory as CWD so
+            # relative paths like "game.py" resolve correctly even when
+            # the parent process was started from a different directory.
+            os.chdir(os.path.dirname(os.path.abspath(__file__)))
+            apply_limits(app.config["rlimits"])
+            # Python ignores these at startup and exec would keep them ignored.
+            for signum in (signal.SIGPIPE, signal.SIGXFSZ):
+                signal.signal(signum, signal.SIG_DFL)
+            # The server reads game.py's events out of its output.
+            os.environ["GAME_EVENTS"] = "1"
+            os.execvp(app.config["cmd"][0], app.config["cmd"])
+        except BaseException as exc:
+            os.write(2, ("failed to start %s: %s\r\n" % (app.config["cmd"][0], exc)).encode())
+        os._exit(127)
     else:
-        app.config["clients"][sid] = {"fd": fd, "pid": child_pid}
+        client = new_session(sid, fd, child_pid)
+        supervisor.watch(child_pid)
         set_winsize(fd, 50, 50)
         cmd = " ".join(shlex.quote(c) for c in app.config["cmd"])
-        socketio.start_background_task(read_and_forward_pty_output, sid)
+        socketio.emit("session", session_info(client), namespace="/pty", to=sid)
+        watch_pty(client)
+        spawn_seconds.observe(time.perf_counter() - started, source="fork")
         logging.info("spawned child pid %s for sid %s", child_pid, sid)
         logging.info(
-            "starting background task with command `%s` to continously read and forward pty output to client %s",
+            "running command `%s` and forwarding its pty output to client %s",
             cmd,
             sid,
         )
@@ -178,34 +1327,25 @@ def connect():
 
 @socketio.on("disconnect", namespace="/pty")
 def disconnect():
-    """Clean up PTY and child process when a client disconnects."""
+    """Detach the session for a grace period, or clean it up right away."""
     sid = request.sid
     logging.info("client disconnected: %s", sid)
+    app.config["browsers"].pop(sid, None)
     client = app.config["clients"].pop(sid, None)
     if not client:
+        if sid in app.config["waiting"]:
+            app.config["waiting"].remove(sid)
+            notify_waiting()
         return
-    try:
-        pid = client.get("pid")
-        if pid:
-            try:
-                os.kill(pid, signal.SIGTERM)
-            except Exception:
-                pass
-            try:
-                os.waitpid(pid, 0)
-            except Exception:
-                pass
-    except Exception:
-        pass
-    try:
-        fd = client.get("fd")
-        if fd:
-            try:
-                os.close(fd)
-            except Exception:
-                pass
-    except Exception:
-        pass
+    grace = app.config["reconnect_grace"]
+    if grace <= 0 or client.get("closed"):
+        end_session(client)
+        return
+    # Keep the game running (its output goes to the scrollback only) so a
+    # reconnect within the grace period picks up where it left off.
+    client["sid"] = None
+    client["expiry"] = reactor.call_later(grace, lambda: expire_session(client))
+    logging.info("session %s detached; kept for %ss", client["token"], grace)
 
 
 def main():
@@ -234,6 +1374,141 @@ def main():
         default="game.py",
         help="arguments to pass to command (i.e. --cmd-args='arg1 arg2 --flag')",
     )
+    parser.add_argument(
+        "--pool-size",
+        default=2,
+        type=int,
+        help="number of pre-forked idle game sessions kept ready by the zygote",
+    )
+    parser.add_argument(
+        "--no-zygote",
+        action="store_true",
+        help="always start a fresh interpreter per session instead of forking from the zygote",
+    )
+    parser.add_argument(
+        "--coalesce-ms",
+        default=5.0,
+        type=float,
+        help="latency window for batching PTY output into one packet (0 disables)",
+    )
+    parser.add_argument(
+        "--coalesce-bytes",
+        default=16384,
+        type=int,
+        help="flush batched PTY output as soon as this many bytes are pending",
+    )
+    parser.add_argument(
+        "--queue-high",
+        default=65536,
+        type=int,
+        help="unacknowledged output bytes per session before its pty is paused",
+    )
+    parser.add_argument(
+        "--queue-low",
+        default=16384,
+        type=int,
+        help="unacknowledged output bytes per session at which its pty is resumed",
+    )
+    parser.add_argument(
+        "--input-rate",
+        default=2048,
+        type=int,
+        help="bytes per second of browser input written to each pty",
+    )
+    parser.add_argument(
+        "--input-max-bytes",
+        default=8192,
+        type=int,
+        help="queued input bytes per session before further input is rejected",
+    )
+    parser.add_argument(
+        "--no-minimize-sgr",
+        action="store_true",
+        help="send the game's colour sequences unchanged instead of dropping redundant ones",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=("websocket", "dictionary", "none"),
+        default="websocket",
+        help="'websocket' lets browsers negotiate permessage-deflate; 'dictionary' deflates output with a preset dictionary of the game's text (see bench_compression.py)",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        default=5.0,
+        type=float,
+        help="seconds between samples of game process memory/CPU and queue depths for /metrics (0 disables sampling)",
+    )
+    parser.add_argument(
+        "--count-greenlets",
+        action="store_true",
+        help="count live greenlets for /metrics on every sample; walks the whole heap, so for leak hunting only",
+    )
+    parser.add_argument(
+        "--trace-sample",
+        default=0.0,
+        type=float,
+        help="share of keystrokes (0-1) to trace from browser to PTY and back; see /trace (0 disables)",
+    )
+    parser.add_argument(
+        "--reconnect-grace",
+        default=60.0,
+        type=float,
+        help="seconds a disconnected session is kept alive for its browser to resume (0 ends it at once)",
+    )
+    parser.add_argument(
+        "--scrollback-bytes",
+        default=262144,
+        type=int,
+        help="recent output kept per session (compressed) for replay after a reconnect",
+    )
+    parser.add_argument(
+        "--max-sessions",
+        default=32,
+        type=int,
+        help="most concurrent game sessions; later visitors wait in line",
+    )
+    parser.add_argument(
+        "--max-waiting",
+        default=64,
+        type=int,
+        help="most visitors waiting for a session before new connections are refused",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        default=15.0,
+        type=float,
+        help="minutes without input after which a session is ended (0 disables)",
+    )
+    parser.add_argument(
+        "--kill-timeout",
+        default=5.0,
+        type=float,
+        help="seconds a game gets to exit after SIGTERM before it is sent SIGKILL",
+    )
+    parser.add_argument(
+        "--limit-memory-mb",
+        default=512,
+        type=int,
+        help="address space limit (RLIMIT_AS) per game process in MiB (0 disables)",
+    )
+    parser.add_argument(
+        "--limit-cpu",
+        default=600,
+        type=int,
+        help="CPU seconds (RLIMIT_CPU) per game process (0 disables)",
+    )
+    parser.add_argument(
+        "--limit-nproc",
+        default=0,
+        type=int,
+        help="RLIMIT_NPROC for each game process (0 disables); the kernel counts every process of the server's user against it, not just the game's",
+    )
+    parser.add_argument(
+        "--session-mode",
+        choices=("pty", "inproc"),
+        default="pty",
+        help="'inproc' runs each game.py session as a green thread of the server instead of a process on a PTY",
+    )
     args = parser.parse_args()
     if args.version:
         print(__version__)
@@ -245,7 +1520,30 @@ def main():
         python_cmd = sys.executable
     else:
         python_cmd = args.command
-    app.config["cmd"] = [python_cmd] + shlex.split(args.cmd_args)
+    cmd_args = shlex.split(args.cmd_args)
+    app.config["cmd"] = [python_cmd] + cmd_args
+    app.config["coalesce_window"] = max(0.0, args.coalesce_ms) / 1000.0
+    app.config["coalesce_bytes"] = max(1, args.coalesce_bytes)
+    app.config["queue_high"] = max(1, args.queue_high)
+    app.config["queue_low"] = max(0, min(args.queue_low, args.queue_high))
+    app.config["input_rate"] = max(1, args.input_rate)
+    app.config["input_max_bytes"] = max(1, args.input_max_bytes)
+    app.config["minimize_sgr"] = not args.no_minimize_sgr
+    app.config["compression"] = args.compression
+    app.config["metrics_interval"] = max(0.0, args.metrics_interval)
+    app.config["count_greenlets"] = args.count_greenlets
+    app.config["trace_rate"] = min(1.0, max(0.0, args.trace_sample))
+    app.config["reconnect_grace"] = max(0.0, args.reconnect_grace)
+    app.config["scrollback_bytes"] = max(1, args.scrollback_bytes)
+    app.config["max_sessions"] = max(1, args.max_sessions)
+    app.config["max_waiting"] = max(0, args.max_waiting)
+    app.config["idle_timeout"] = max(0.0, args.idle_timeout) * 60.0
+    supervisor.kill_timeout = max(0.0, args.kill_timeout)
+    app.config["rlimits"] = {
+        "as": max(0, args.limit_memory_mb) * 1024 * 1024,
+        "cpu": max(0, args.limit_cpu),
+        "nproc": max(0, args.limit_nproc),
+    }
     green = "\033[92m"
     end = "\033[0m"
     log_format = (
@@ -259,6 +1557,39 @@ def main():
         stream=sys.stdout,
         level=logging.DEBUG if args.debug else logging.INFO,
     )
+    app.config["session_mode"] = args.session_mode
+    if args.session_mode == "inproc" and (
+        args.command not in ("python", "python3") or cmd_args[:1] != ["game.py"]
+    ):
+        parser.error("--session-mode inproc only runs game.py; use the pty mode for other commands")
+    if args.session_mode == "inproc":
+        import game
+
+        # Bad game options should stop the server now, not every session.
+        game.parseArgs(cmd_args[1:])
+        assets.preload()
+    # The stock game gets a zygote with game.py pre-imported, so a session
+    # costs one fork instead of a cold interpreter start. Any other command
+    # keeps the plain pty.fork() path.
+    if (
+        args.session_mode == "pty"
+        and not args.no_zygote
+        and args.command in ("python", "python3")
+        and cmd_args[:1] == ["game.py"]
+    ):
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        app.config["zygote"] = ZygoteClient(script_dir, cmd_args[1:], app.config["rlimits"])
+        app.config["pool_size"] = max(0, args.pool_size)
+        refill_pool()
+        logging.info(
+            "zygote pid %s ready with %d pre-forked sessions",
+            app.config["zygote"].proc.pid,
+            len(app.config["pool"]),
+        )
+    if app.config["idle_timeout"]:
+        reactor.call_later(min(60.0, app.config["idle_timeout"] / 4), reap_idle)
+    if app.config["metrics_interval"]:
+        reactor.call_later(0, sample_metrics)
     display_host = args.host
     # webbrowser cannot open 0.0.0.0 — prefer localhost for the browser URL
     if args.host in ("0.0.0.0", "::", "::0"):
@@ -266,7 +1597,12 @@ def main():
     url = f"http://{display_host}:{args.port}/index.html"
     logging.info(f"serving on http://{args.host}:{args.port}")
     webbrowser.open_new_tab(url)
-    socketio.run(app, debug=args.debug, port=args.port, host=args.host, allow_unsafe_werkzeug=True)
+    # Stopping the service (SIGTERM) shuts down as cleanly as Ctrl-C.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        socketio.run(app, debug=args.debug, port=args.port, host=args.host, allow_unsafe_werkzeug=True)
+    finally:
+        stop_zygote()
     
 
 
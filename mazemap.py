@@ -0,0 +1,328 @@
+"""Revealed-map views computed from one ASCII drawing of the whole maze.
+
+The maze is drawn once as a grid of cells: wall posts every ``CELL_WIDTH``
+columns and every ``CELL_HEIGHT`` rows, e.g.
+
+    . -- . -- .
+    |  1    2>|
+    :    : -- :
+
+Each cell's interior is labelled with the number of the junction whose
+visit reveals it (up to three digits), optionally followed by a marker
+glyph (one of ``MARKERS``) that marks where that junction is, pointing
+the way onward. Labels are never drawn; a wall or post is drawn once any
+cell it touches is revealed. generate() carves such a drawing at random.
+
+MazeMap.view() renders the map for a set of visited junctions, cropped to
+what has been revealed. Rendering costs one pass over the revealed cells;
+views are kept in an LRU cache keyed by that set, so showing a map again
+is a dict lookup however large the maze is. For mazes too big to reprint
+every turn, MapPane keeps the map in a fixed pane at the top of the
+terminal and only sends the characters that changed.
+"""
+import functools
+import random
+import re
+
+CELL_WIDTH = 5
+CELL_HEIGHT = 2
+MARKERS = "^>V<"
+
+_label = re.compile(r"\d+")
+
+
+class MazeMap:
+    """A maze drawing split into the regions revealed by each junction."""
+
+    def __init__(self, drawing, wall="", marker="", end="", cache_size=256):
+        self.wall = wall
+        self.marker = marker
+        self.end = end
+        self._cells = {}  # junction -> [(row, col)] it reveals
+        self._markers = {}  # junction -> (y, x, glyph) in the drawing
+        self._view = functools.lru_cache(maxsize=cache_size)(self._render)
+        self._parse(drawing)
+
+    @property
+    def junctions(self):
+        return sorted(self._cells)
+
+    def _parse(self, drawing):
+        lines = drawing.strip("\n").split("\n")
+        width = max(len(line) for line in lines)
+        self.lines = [line.ljust(width) for line in lines]
+        self.height = len(self.lines)
+        self.width = width
+        rows = (self.height - 1) // CELL_HEIGHT
+        cols = (width - 1) // CELL_WIDTH
+        self._labels = [[None] * cols for _ in range(rows)]
+        for r in range(rows):
+            for c in range(cols):
+                y = r * CELL_HEIGHT + 1
+                x = c * CELL_WIDTH + 1
+                interior = self.lines[y][x:x + CELL_WIDTH - 1]
+                match = _label.search(interior)
+                if not match:
+                    continue
+                junction = int(match.group())
+                self._labels[r][c] = junction
+                self._cells.setdefault(junction, []).append((r, c))
+                for offset, ch in enumerate(interior):
+                    if ch in MARKERS:
+                        self._markers[junction] = (y, x + offset, ch)
+
+    def marker_at(self, junction):
+        """(y, x, glyph) of ``junction``'s marker in the drawing, or None."""
+        return self._markers.get(junction)
+
+    def cell_chars(self, junction):
+        """Every (y, x, char) of wall that visiting ``junction`` reveals.
+
+        Walls shared with a neighbouring cell come up once per cell.
+        """
+        for r, c in self._cells.get(junction, ()):
+            for y in range(r * CELL_HEIGHT, (r + 1) * CELL_HEIGHT + 1):
+                line = self.lines[y]
+                for x in range(c * CELL_WIDTH, (c + 1) * CELL_WIDTH + 1):
+                    ch = line[x]
+                    if ch != " " and not (y % CELL_HEIGHT and x % CELL_WIDTH):
+                        yield y, x, ch
+
+    def char_at(self, y, x, visited):
+        """What the drawing shows at (y, x) once ``visited`` are revealed."""
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            return " "
+        ch = self.lines[y][x]
+        if ch == " " or (y % CELL_HEIGHT and x % CELL_WIDTH):
+            # Blank, or inside a cell where only labels are written.
+            return " "
+        for r, c in _touching(y, x):
+            if r < len(self._labels) and c < len(self._labels[r]) and self._labels[r][c] in visited:
+                return ch
+        return " "
+
+    def view(self, visited, here=None):
+        """The map with every junction in ``visited`` revealed.
+
+        ``here`` is the junction the player is standing at, if any; its
+        marker is drawn when its cell is revealed.
+        """
+        return self._view(frozenset(visited), here)
+
+    def cache_info(self):
+        return self._view.cache_info()
+
+    def _render(self, visited, here):
+        chars = {}
+        for junction in visited:
+            for y, x, ch in self.cell_chars(junction):
+                chars[(y, x)] = ch
+        if not chars:
+            return ""
+        top = min(y for y, _ in chars)
+        bottom = max(y for y, _ in chars)
+        left = min(x for _, x in chars)
+        right = max(x for _, x in chars)
+        grid = [[" "] * (right - left + 1) for _ in range(bottom - top + 1)]
+        for (y, x), ch in chars.items():
+            grid[y - top][x - left] = ch
+        if here in visited and here in self._markers:
+            y, x, glyph = self._markers[here]
+            grid[y - top][x - left] = self.marker + glyph + self.wall
+        return self.wall + "\n".join("".join(row).rstrip() for row in grid) + self.end
+
+
+def _touching(y, x):
+    """The (row, col) cells a character of the drawing borders or is in."""
+    if y % CELL_HEIGHT:
+        rows = (y // CELL_HEIGHT,)
+    else:
+        rows = (y // CELL_HEIGHT - 1, y // CELL_HEIGHT)
+    if x % CELL_WIDTH:
+        cols = (x // CELL_WIDTH,)
+    else:
+        cols = (x // CELL_WIDTH - 1, x // CELL_WIDTH)
+    return [(r, c) for r in rows for c in cols if r >= 0 and c >= 0]
+
+
+class MapPane:
+    """Keeps one player's map drawn in a pane at the top of the terminal.
+
+    The rows below the pane become the scrolling region, so the game's
+    text scrolls underneath a map that stays put. update() returns only
+    the cursor-addressed writes needed to go from what is on screen to the
+    new view: the walls of newly visited junctions, the blanks left by
+    forgotten ones and the moved marker. The whole pane is only redrawn
+    when the player walks out of it, so output per turn stays proportional
+    to what changed, whatever the size of the maze.
+    """
+
+    def __init__(self, maze_map, width=60, height=11):
+        self.map = maze_map
+        self.width = width
+        self.height = height
+        self.origin = None  # (y, x) of the drawing shown in the top left
+        self.shown = frozenset()
+        self.here = None  # (y, x) of the marker on screen
+
+    def open(self):
+        """Clear the screen and reserve the pane above the scroll region."""
+        return "\x1b[2J\x1b[%d;r\x1b[%d;1H" % (self.height + 2, self.height + 2)
+
+    def close(self):
+        """Give the whole screen back to scrolling text."""
+        return "\x1b[r\x1b[%d;1H" % (self.height + 2)
+
+    def update(self, visited, here=None):
+        """The escape sequences that bring the pane up to date."""
+        visited = frozenset(visited)
+        marker = self.map.marker_at(here) if here in visited else None
+        origin = self._origin(marker)
+        if origin != self.origin:
+            self.origin, self.shown = origin, visited
+            return self._redraw(visited, marker)
+        changes = {}
+        for junction in visited - self.shown:
+            for y, x, ch in self.map.cell_chars(junction):
+                if self._visible(y, x):
+                    changes[(y, x)] = ch
+        for junction in self.shown - visited:
+            for y, x, _ in self.map.cell_chars(junction):
+                if self._visible(y, x):
+                    changes[(y, x)] = self.map.char_at(y, x, visited)
+        self.shown = visited
+        moved = marker[:2] if marker and self._visible(*marker[:2]) else None
+        if self.here and self.here != moved:
+            changes[self.here] = " "
+        self.here = moved
+        if moved:
+            changes[moved] = self.map.marker + marker[2] + self.map.wall
+        return self._write(changes)
+
+    def _visible(self, y, x):
+        top, left = self.origin
+        return top <= y < top + self.height and left <= x < left + self.width
+
+    def _origin(self, marker):
+        """Keep the pane where it is unless the marker is near its edge."""
+        if marker is None:
+            return self.origin or (0, 0)
+        y, x = marker[:2]
+        if self.origin is not None:
+            top, left = self.origin
+            margin_y, margin_x = self.height // 4, self.width // 4
+            if (top + margin_y <= y < top + self.height - margin_y
+                    and left + margin_x <= x < left + self.width - margin_x):
+                return self.origin
+        top = max(0, min(y - self.height // 2, self.map.height - self.height))
+        left = max(0, min(x - self.width // 2, self.map.width - self.width))
+        return top, left
+
+    def _redraw(self, visited, marker):
+        top, left = self.origin
+        out = ["\x1b7", self.map.wall]
+        for row in range(self.height):
+            text = "".join(
+                self.map.char_at(top + row, left + col, visited) for col in range(self.width)
+            ).rstrip()
+            out.append("\x1b[%d;1H%s\x1b[K" % (row + 1, text))
+        self.here = None
+        if marker and self._visible(*marker[:2]):
+            y, x, glyph = marker
+            self.here = (y, x)
+            out.append("\x1b[%d;%dH%s%s%s" % (y - top + 1, x - left + 1, self.map.marker, glyph, self.map.wall))
+        out.append("\x1b8")
+        return "".join(out)
+
+    def _write(self, changes):
+        if not changes:
+            return ""
+        top, left = self.origin
+        out = ["\x1b7", self.map.wall]
+        last = None
+        for y, x in sorted(changes):
+            if last != (y, x - 1):
+                out.append("\x1b[%d;%dH" % (y - top + 1, x - left + 1))
+            out.append(changes[(y, x)])
+            last = (y, x)
+        out.append("\x1b8")
+        return "".join(out)
+
+
+_steps = {(-1, 0): "^", (0, 1): ">", (1, 0): "V", (0, -1): "<"}
+
+
+def generate(width, height, junctions, seed=None):
+    """Carve a random ``width`` x ``height`` maze labelled for MazeMap.
+
+    The maze is a perfect maze (exactly one route between any two cells)
+    entered from below its bottom-left cell and left through a gap in its
+    right edge. ``junctions`` junctions are spaced along the route out;
+    each reveals the stretch of route up to the next one plus every dead
+    end branching off it, and its marker points along the route. The same
+    ``seed`` always carves the same maze.
+    """
+    if not 1 <= junctions <= 999:
+        raise ValueError("junctions must be between 1 and 999")
+    rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+    start = (height - 1, 0)
+    parent = {start: None}
+    order = [start]
+    stack = [start]
+    while stack:
+        r, c = stack[-1]
+        options = [
+            (r + dr, c + dc)
+            for dr, dc in _steps
+            if 0 <= r + dr < height and 0 <= c + dc < width and (r + dr, c + dc) not in parent
+        ]
+        if not options:
+            stack.pop()
+            continue
+        cell = rng.choice(options)
+        parent[cell] = (r, c)
+        order.append(cell)
+        stack.append(cell)
+    exit_cell = (rng.randrange(height), width - 1)
+    route = []
+    cell = exit_cell
+    while cell is not None:
+        route.append(cell)
+        cell = parent[cell]
+    route.reverse()
+    if len(route) < junctions:
+        raise ValueError("maze too small for %d junctions" % junctions)
+
+    labels = {}
+    markers = {}
+    stops = [k * len(route) // junctions for k in range(junctions)] + [len(route)]
+    for k in range(junctions):
+        for i in range(stops[k], stops[k + 1]):
+            labels[route[i]] = k + 1
+        here = route[stops[k]]
+        ahead = route[stops[k] + 1] if stops[k] + 1 < len(route) else (here[0], here[1] + 1)
+        markers[here] = _steps[(ahead[0] - here[0], ahead[1] - here[1])]
+    for cell in order:
+        # Parents come first in carving order, so side branches inherit
+        # the label of the route cell they hang off.
+        if cell not in labels:
+            labels[cell] = labels[parent[cell]]
+
+    open_walls = set()
+    for cell, up in parent.items():
+        if up is not None:
+            open_walls.add(frozenset((cell, up)))
+    lines = [". " + " . ".join(["--"] * width) + " ."]
+    for r in range(height):
+        row = "|"
+        for c in range(width):
+            row += ("%3d" % labels[(r, c)] + markers.get((r, c), " "))
+            east = (r, c) == exit_cell or frozenset(((r, c), (r, c + 1))) in open_walls
+            row += " " if east else "|"
+        lines.append(row)
+        below = []
+        for c in range(width):
+            south = (r, c) == start or frozenset(((r, c), (r + 1, c))) in open_walls
+            below.append("  " if south else "--")
+        lines.append(": " + " : ".join(below) + " :")
+    return "\n".join(lines)
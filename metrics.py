@@ -0,0 +1,178 @@
+"""Counters, gauges and histograms exposed in the Prometheus text format.
+
+Only what main.py needs, without a client library: metrics are updated
+with plain attribute arithmetic (no locks; under eventlet nothing can
+interleave with an update, and the threading fallback can at worst lose
+the odd increment) and rendered on demand by Registry.render(). Anything
+that costs more than an addition, like reading /proc, is done by a
+sampler on a timer and only its last result is rendered.
+"""
+import bisect
+import math
+import os
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self):
+        """(suffix, label string, value) for every series."""
+        for key, value in sorted(self._values.items()):
+            yield "", _labels(self.label_names, key), value
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)]
+        for suffix, labels, value in self.samples():
+            lines.append("%s%s%s %s" % (self.name, suffix, labels, _number(value)))
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that is set, or read from ``function`` at scrape time.
+
+    ``function`` returns a number, or a dict of label value tuples to
+    numbers for a labelled gauge.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), function=None):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.function is not None:
+            value = self.function()
+            values = value if isinstance(value, dict) else {(): value}
+        else:
+            values = self._values
+        for key, value in sorted(values.items()):
+            yield "", _labels(self.label_names, key), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets, labels=()):
+        super().__init__(name, help, labels)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            # One count per bucket (not cumulative), then sum and count.
+            series = self._values[key] = [0] * (len(self.buckets) + 1) + [0, 0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for key, series in sorted(self._values.items()):
+            total = 0
+            for bound, count in zip(self.buckets + [math.inf], series):
+                total += count
+                yield "_bucket", _labels(self.label_names, key, [("le", _number(float(bound)))]), total
+            yield "_sum", _labels(self.label_names, key), series[-2]
+            yield "_count", _labels(self.label_names, key), series[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), function=None):
+        return self.add(Gauge(name, help, labels, function))
+
+    def histogram(self, name, help, buckets, labels=()):
+        return self.add(Histogram(name, help, buckets, labels))
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+_ticks = os.sysconf("SC_CLK_TCK")
+_page = os.sysconf("SC_PAGE_SIZE")
+
+
+def proc_stat(pid):
+    """(state, CPU seconds, resident bytes) of ``pid`` from /proc, or None."""
+    try:
+        with open("/proc/%d/stat" % pid, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    # The command name is in parentheses and may itself contain spaces.
+    fields = data[data.rfind(b")") + 2:].split()
+    state = fields[0].decode()
+    cpu = (int(fields[11]) + int(fields[12])) / _ticks
+    rss = int(fields[21]) * _page
+    return state, cpu, rss
+
+
+def open_fds(pid="self"):
+    """How many file descriptors ``pid`` has open, or None."""
+    try:
+        return len(os.listdir("/proc/%s/fd" % pid))
+    except OSError:
+        return None
+
+
+def os_threads(pid="self"):
+    """How many threads ``pid`` has, or None."""
+    try:
+        with open("/proc/%s/status" % pid, "rb") as f:
+            for line in f:
+                if line.startswith(b"Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
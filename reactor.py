@@ -0,0 +1,273 @@
+"""One event loop that watches every session's PTY instead of a polling task each.
+
+Under eventlet the fds are registered with the hub's own epoll; in threading
+mode a dedicated thread runs a private epoll. Either way nothing wakes up
+until a registered fd is actually ready or a timer is due, and callbacks
+always run on the reactor's own greenlet/thread (never inside the eventlet
+hub, where they would not be allowed to emit).
+"""
+import heapq
+import itertools
+import logging
+import os
+import select
+import threading
+import time
+
+
+class Timer:
+    """Handle returned by Reactor.call_later; cancel() is idempotent."""
+
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline, callback):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+READ = "read"
+WRITE = "write"
+
+
+class _HubPoller:
+    """Readiness source backed by the eventlet hub (already epoll on Linux)."""
+
+    def __init__(self):
+        from eventlet.hubs import get_hub
+        from eventlet.queue import LightQueue
+
+        self._hub = get_hub()
+        self._ready = LightQueue()
+        self._queued = set()
+        self._listeners = {READ: {}, WRITE: {}}
+
+    def set_interest(self, fd, read, write):
+        for kind, wanted, evtype, callback in (
+            (READ, read, self._hub.READ, self._on_readable),
+            (WRITE, write, self._hub.WRITE, self._on_writable),
+        ):
+            listeners = self._listeners[kind]
+            if wanted and fd not in listeners:
+                listeners[fd] = self._hub.add(evtype, fd, callback, self._on_closed, None)
+            elif not wanted and fd in listeners:
+                self._hub.remove(listeners.pop(fd))
+                self._queued.discard((fd, kind))
+
+    def _queue(self, event):
+        # Runs on the hub greenlet: only queue the event, never switch from
+        # here. The hub is level-triggered, so dedupe until it is drained.
+        if event not in self._queued:
+            self._queued.add(event)
+            self._ready.put(event)
+
+    def _on_readable(self, fd):
+        self._queue((fd, READ))
+
+    def _on_writable(self, fd):
+        self._queue((fd, WRITE))
+
+    def _on_closed(self, exc):
+        pass
+
+    def wake(self):
+        self._ready.put(None)
+
+    def wait(self, timeout):
+        from eventlet.queue import Empty
+
+        try:
+            if timeout is not None and timeout <= 0:
+                ready = [self._ready.get_nowait()]
+            else:
+                ready = [self._ready.get(timeout=timeout)]
+        except Empty:
+            return []
+        while True:
+            try:
+                ready.append(self._ready.get_nowait())
+            except Empty:
+                break
+        for event in ready:
+            self._queued.discard(event)
+        return [event for event in ready if event is not None]
+
+
+class _EpollPoller:
+    """Readiness source for threading mode: a plain epoll on its own thread."""
+
+    def __init__(self):
+        self._epoll = select.epoll()
+        self._masks = {}
+        # Self-pipe so other threads can interrupt poll() for a new timer.
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._epoll.register(self._wake_r, select.EPOLLIN)
+
+    def set_interest(self, fd, read, write):
+        mask = (select.EPOLLIN if read else 0) | (select.EPOLLOUT if write else 0)
+        try:
+            if not mask:
+                if self._masks.pop(fd, None) is not None:
+                    self._epoll.unregister(fd)
+            elif fd in self._masks:
+                if self._masks[fd] != mask:
+                    self._epoll.modify(fd, mask)
+                    self._masks[fd] = mask
+            else:
+                self._epoll.register(fd, mask)
+                self._masks[fd] = mask
+        except (OSError, ValueError):
+            self._masks.pop(fd, None)
+
+    def wake(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def wait(self, timeout):
+        try:
+            events = self._epoll.poll(-1 if timeout is None else timeout)
+        except InterruptedError:
+            return []
+        ready = []
+        for fd, mask in events:
+            if fd == self._wake_r:
+                try:
+                    os.read(self._wake_r, 4096)
+                except BlockingIOError:
+                    pass
+                continue
+            # Errors and hangups are reported to readers, which see EOF/EIO.
+            if mask & (select.EPOLLIN | select.EPOLLERR | select.EPOLLHUP):
+                ready.append((fd, READ))
+            if mask & select.EPOLLOUT:
+                ready.append((fd, WRITE))
+        return ready
+
+
+class Reactor:
+    """Dispatch ready fds and due timers to callbacks from a single loop."""
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+        self._readers = {}
+        self._writers = {}
+        self._paused = set()
+        self._poller = None
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._timer_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._poller is None:
+            if self.socketio.async_mode == "eventlet":
+                self._poller = _HubPoller()
+            else:
+                self._poller = _EpollPoller()
+            self.socketio.start_background_task(self._run)
+
+    def _update(self, fd):
+        self._poller.set_interest(
+            fd,
+            fd in self._readers and fd not in self._paused,
+            fd in self._writers,
+        )
+
+    def add_reader(self, fd, callback):
+        """Call ``callback(fd)`` on the reactor each time ``fd`` is readable.
+
+        The fd should be non-blocking: a wakeup may occasionally be stale.
+        """
+        self._ensure_started()
+        self._readers[fd] = callback
+        self._update(fd)
+
+    def remove_reader(self, fd):
+        """Stop watching ``fd``. Always call this before closing the fd."""
+        self._readers.pop(fd, None)
+        self._writers.pop(fd, None)
+        self._paused.discard(fd)
+        if self._poller is not None:
+            self._update(fd)
+
+    def pause_reader(self, fd):
+        """Stop reading ``fd`` for now but keep its callback registered.
+
+        Whoever writes into the fd's other end is left to block in the kernel,
+        which is how slow browsers push back on the game.
+        """
+        if fd in self._readers and fd not in self._paused:
+            self._paused.add(fd)
+            self._update(fd)
+
+    def resume_reader(self, fd):
+        """Undo pause_reader()."""
+        if fd in self._paused:
+            self._paused.discard(fd)
+            self._update(fd)
+
+    def add_writer(self, fd, callback):
+        """Call ``callback(fd)`` on the reactor while ``fd`` is writable."""
+        self._ensure_started()
+        self._writers[fd] = callback
+        self._update(fd)
+
+    def remove_writer(self, fd):
+        if self._writers.pop(fd, None) is not None:
+            self._update(fd)
+
+    def call_later(self, delay, callback):
+        """Run ``callback()`` on the reactor after ``delay`` seconds."""
+        self._ensure_started()
+        timer = Timer(time.monotonic() + delay, callback)
+        with self._timer_lock:
+            heapq.heappush(self._timers, (timer.deadline, next(self._timer_seq), timer))
+            # Cancelled timers are skipped when the loop picks its timeout, so
+            # they must not hide that this one is now the earliest.
+            while self._timers[0][2].cancelled:
+                heapq.heappop(self._timers)
+            earliest = self._timers[0][2] is timer
+        if earliest:
+            self._poller.wake()
+        return timer
+
+    def _next_timeout(self):
+        with self._timer_lock:
+            while self._timers and self._timers[0][2].cancelled:
+                heapq.heappop(self._timers)
+            if not self._timers:
+                return None
+            return max(0.0, self._timers[0][0] - time.monotonic())
+
+    def _run_timers(self):
+        now = time.monotonic()
+        due = []
+        with self._timer_lock:
+            while self._timers and self._timers[0][0] <= now:
+                due.append(heapq.heappop(self._timers)[2])
+        for timer in due:
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback()
+            except Exception:
+                logging.exception("reactor timer callback failed")
+
+    def _run(self):
+        while True:
+            for fd, kind in self._poller.wait(self._next_timeout()):
+                handlers = self._readers if kind == READ else self._writers
+                callback = handlers.get(fd)
+                if callback is None:
+                    continue
+                try:
+                    callback(fd)
+                except Exception:
+                    logging.exception("reactor %s callback for fd %s failed", kind, fd)
+            self._run_timers()
@@ -0,0 +1,254 @@
+"""Play every path through game.py's maze without a terminal.
+
+Drives the game's own rules (game.arrive() and game.transition()) with
+injected answers: at each node every listed answer, plus one answer that
+matches none of them. The story's pauses go on a virtual clock instead
+of being slept, and nothing is printed. It reports:
+
+- sequences: every answer sequence up to --depth, with the endings
+  reached and the fastest and slowest game time to each;
+- states: every reachable (node, lives, visits, invalid answers) state,
+  whatever the depth, and the dead ends among them, meaning states that
+  can never reach an ending, answers leading to nodes that do not
+  exist, and nodes with nothing to answer;
+- maps: the map shown on arriving at each junction with each set of
+  visited junctions, drawn with MazeMap.view(). A view that fails, comes
+  out empty, leaves a visited junction undrawn or has no marker for the
+  player is listed;
+- throughput: transitions per second on a random walk of --steps steps.
+
+    python3 simulate.py [--depth N] [--steps N] [--maze WxH --junctions N --seed S]
+
+The exit status is 1 if there are dead ends or map problems.
+"""
+import argparse
+import random
+import sys
+import time
+
+import game
+
+# Stands for any answer a node does not list.
+OTHER = "?"
+
+
+def answers(node):
+    """The answers worth trying at ``node``: each choice and one other."""
+    return list(node["choices"]) + [OTHER]
+
+
+def pauses(lines):
+    """Seconds the game would sleep() while showing ``lines``."""
+    return sum(line[1] for line in lines if isinstance(line, tuple))
+
+
+def key(node, name, state):
+    """What tells states apart: invalid answers only count towards patience."""
+    attempts = state["attempts"] if node.get("patience") else 0
+    return name, state["lives"], tuple(state["visits"]), attempts
+
+
+def copy(state):
+    return {"lives": state["lives"], "visits": list(state["visits"]), "attempts": state["attempts"]}
+
+
+class StateGraph:
+    """Every state reachable from the start, and where each answer leads.
+
+    ``edges`` maps a state's key to (answer, target, pause) for every
+    answer tried there: the key of the next state, or the name of an
+    ending, and the seconds the game sleeps on the way.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.edges = {}
+        self.start = None
+        self.start_pause = 0
+        self.transitions = 0
+        self.maps = set()  # (junction here, visited junctions) on arrival
+        self.broken = set()  # (node, answer, missing node)
+
+    def run(self, start="junction1"):
+        nodes = self.nodes
+        state = game.newState()
+        self.start_pause = pauses(game.arrive(start, state, nodes, view=None))
+        self._arrived(start, state)
+        self.start = key(nodes[start], start, state)
+        states = {self.start: state}
+        todo = [self.start]
+        while todo:
+            current = todo.pop()
+            name = current[0]
+            edges = self.edges[current] = []
+            for answer in answers(nodes[name]):
+                after = copy(states[current])
+                next_name, lines = game.transition(name, after, answer, nodes)
+                self.transitions += 1
+                pause = pauses(lines)
+                if next_name is None:
+                    next_name = name
+                elif next_name not in nodes:
+                    if next_name not in game.endings:
+                        self.broken.add((name, answer, next_name))
+                    edges.append((answer, next_name, pause))
+                    continue
+                else:
+                    pause += pauses(game.arrive(next_name, after, nodes, view=None))
+                    self._arrived(next_name, after)
+                target = key(nodes[next_name], next_name, after)
+                edges.append((answer, target, pause))
+                if target not in states:
+                    states[target] = after
+                    todo.append(target)
+        return self
+
+    def _arrived(self, name, state):
+        number = self.nodes[name].get("visit")
+        if number:
+            self.maps.add((number, frozenset(state["visits"])))
+
+    def dead_ends(self):
+        """States from which no ending can be reached."""
+        reaches = set()
+        changed = True
+        while changed:
+            changed = False
+            for state, edges in self.edges.items():
+                if state not in reaches and any(
+                    target in reaches or target in game.endings for _, target, _ in edges
+                ):
+                    reaches.add(state)
+                    changed = True
+        return [state for state in self.edges if state not in reaches]
+
+    def silent(self):
+        """Nodes with nothing to answer: no choices and no "otherwise"."""
+        return [name for name, node in self.nodes.items() if not node["choices"] and not node.get("otherwise")]
+
+
+class Enumeration:
+    """Every answer sequence up to ``depth`` moves, replayed on ``graph``.
+
+    Each move is looked up in the graph the game's rules built, so
+    millions of sequences take seconds.
+    """
+
+    def __init__(self, graph, depth):
+        self.graph = graph
+        self.depth = depth
+        self.steps = 0
+        self.sequences = 0
+        self.endings = {}  # ending -> [sequences, fewest moves, fastest, slowest]
+
+    def run(self):
+        self._explore(self.graph.start, self.depth, self.graph.start_pause)
+        return self
+
+    def _explore(self, state, remaining, clock):
+        edges = self.graph.edges[state]
+        self.steps += len(edges)
+        for _, target, pause in edges:
+            if target.__class__ is str:
+                self._ended(target, self.depth - remaining + 1, clock + pause)
+            elif remaining > 1:
+                self._explore(target, remaining - 1, clock + pause)
+            else:
+                self.sequences += 1
+
+    def _ended(self, ending, moves, spent):
+        self.sequences += 1
+        record = self.endings.get(ending)
+        if record is None:
+            self.endings[ending] = [1, moves, spent, spent]
+        else:
+            record[0] += 1
+            record[1] = min(record[1], moves)
+            record[2] = min(record[2], spent)
+            record[3] = max(record[3], spent)
+
+
+def map_problems(view, maps):
+    """(here, visited, problem) for each map view that is not right."""
+    drawn = set(view.junctions)
+    problems = []
+    for here, visited in sorted(maps, key=lambda item: (item[0], sorted(item[1]))):
+        try:
+            text = view.view(visited, here=here)
+        except Exception as exc:
+            problems.append((here, visited, "fails: %r" % exc))
+            continue
+        if visited and not text:
+            problems.append((here, visited, "empty"))
+        for number in sorted(visited - drawn):
+            problems.append((here, visited, "junction %d is not drawn" % number))
+        if here in visited and view.marker_at(here) is None:
+            problems.append((here, visited, "no marker for junction %d" % here))
+    return problems
+
+
+def benchmark(nodes, steps, seed=0, start="junction1"):
+    """Transitions per second on a random walk, restarting at each ending."""
+    rng = random.Random(seed)
+    options = {name: answers(node) for name, node in nodes.items()}
+    choices = [rng.randrange(1 << 30) for _ in range(4096)]
+    name, state = start, game.newState()
+    game.arrive(name, state, nodes, view=None)
+    started = time.perf_counter()
+    for i in range(steps):
+        listed = options[name]
+        next_name, _ = game.transition(name, state, listed[choices[i & 4095] % len(listed)], nodes)
+        if next_name is None:
+            continue
+        if next_name not in nodes:
+            next_name, state = start, game.newState()
+        game.arrive(next_name, state, nodes, view=None)
+        name = next_name
+    return steps / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--depth", type=int, default=12, help="moves per enumerated answer sequence")
+    parser.add_argument("--steps", type=int, default=1000000, help="random-walk transitions to time")
+    parser.add_argument("--maze", type=game.size, metavar="WxH", help="simulate a random maze instead, as game.py --maze")
+    parser.add_argument("--junctions", type=int, default=5, help="junctions in a random maze")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random maze")
+    args = parser.parse_args()
+    if args.maze:
+        nodes, view = game.generatedMaze(args.maze[0], args.maze[1], args.junctions, args.seed)
+    else:
+        nodes, view = game.maze, game.mazeMap
+
+    graph = StateGraph(nodes).run()
+    dead = graph.dead_ends()
+    silent = graph.silent()
+    print("reachable states: %d (%d transitions), dead ends: %d" % (
+        len(graph.edges), graph.transitions, len(dead) + len(graph.broken) + len(silent)))
+    for state in dead[:10]:
+        print("  no way out of %s with %d lives, visits %s, %d invalid answers" % state)
+    for name, answer, missing in sorted(graph.broken):
+        print("  %s: answer %r leads to missing node %r" % (name, answer, missing))
+    for name in silent:
+        print("  %s has nothing to answer" % name)
+
+    started = time.perf_counter()
+    sequences = Enumeration(graph, args.depth).run()
+    elapsed = time.perf_counter() - started
+    print("sequences up to %d moves: %d (%d steps in %.2fs, %.0f/s)" % (
+        args.depth, sequences.sequences, sequences.steps, elapsed, sequences.steps / elapsed))
+    for ending, (count, moves, fastest, slowest) in sorted(sequences.endings.items()):
+        print("  %-8s %10d sequences, fewest %d moves, game time %gs to %gs" % (
+            ending, count, moves, fastest, slowest))
+
+    problems = map_problems(view, graph.maps)
+    print("map views on arrival: %d, problems: %d" % (len(graph.maps), len(problems)))
+    for here, visited, problem in problems[:10]:
+        print("  at junction %d with %s visited: %s" % (here, sorted(visited), problem))
+
+    print("random walk: %.0f transitions/s" % benchmark(nodes, args.steps, args.seed))
+    return 1 if dead or graph.broken or silent or problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+"""Check that churning sessions leaves nothing behind in the server.
+
+Starts main.py on a free loopback port and runs connect / disconnect
+cycles against it from several clients at once, tens of thousands of
+them if asked. Each cycle is one of:
+
+- abort: disconnect straight after connecting, while the game starts;
+- input: answer a question or two, disconnect with the game in input();
+- scene: answer and disconnect before the reply (a scene, which the
+  browser would still be playing) has arrived or been acknowledged;
+- reconnect: disconnect, come back with the session's token and offset,
+  answer, and disconnect for good, leaving the session to expire;
+- finish: play to the credits, so the game exits on its own.
+
+game.py no longer sleeps in the server once it sends events (the
+browser plays its pauses), so "scene" stands in for a disconnect mid
+sleep().
+
+Every --check-every cycles the clients stop, the server is given time to
+expire and reap what was left (--reconnect-grace and --kill-timeout are
+set short), and the harness reads from /proc: the server's open fds and
+OS threads and RSS, plus every process descended from it, whether live
+or a zombie. Greenlets come from /metrics. The first checkpoint, after
+--warmup cycles, is the baseline. A later checkpoint that does not
+come back to it, within --slack (--rss-slack MiB for memory) and within
+--settle seconds, is a leak, and the exit status is 1.
+
+    python3 soak.py --cycles 20000 --json soak-$(git describe --always).json
+    python3 soak.py --server-options "--session-mode inproc"
+
+The clients need ``pip install -r requirements-dev.txt``, as for
+loadtest.py.
+"""
+import argparse
+import collections
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import socketio
+
+from loadtest import PATHS, Failure, scrape, start_server
+from metrics import open_fds, os_threads, proc_stat
+
+KINDS = ("abort", "input", "scene", "reconnect", "finish")
+
+# python-socketio's default; main.py does not change it.
+PING_INTERVAL = 25
+
+# Short enough that each checkpoint only waits a few seconds for detached
+# sessions to expire and ended games to be reaped.
+SERVER_OPTIONS = [
+    "--reconnect-grace", "1", "--kill-timeout", "1", "--idle-timeout", "0", "--max-sessions", "1000",
+    "--count-greenlets",
+]
+
+
+class Browser:
+    """A Socket.IO client standing in for one index.html tab."""
+
+    def __init__(self, url, timeout, ack=True):
+        self.url = url
+        self.timeout = timeout
+        self.ack = ack
+        self.changed = threading.Condition()
+        self.received = 0  # bytes of output, the replay offset
+        self.messages = 0
+        self.last = time.perf_counter()
+        self.token = None
+        self.closed = None
+        self.client = socketio.Client(reconnection=False)
+        for event, handler in [
+            ("pty-output", self.on_output),
+            ("pty-replay", self.on_replay),
+            ("game-event", self.on_event),
+            ("session", self.on_session),
+            ("pty-closed", self.on_closed),
+        ]:
+            self.client.on(event, handler, namespace="/pty")
+
+    def connect(self, auth=None):
+        try:
+            self.client.connect(
+                self.url, namespaces=["/pty"], transports=["websocket"], auth=auth, wait_timeout=self.timeout
+            )
+        except socketio.exceptions.ConnectionError:
+            raise Failure("connect error")
+
+    def disconnect(self):
+        self.client.disconnect()
+
+    def send(self, line):
+        self.client.emit("pty-input", {"input": line + "\r"}, namespace="/pty")
+
+    def wait(self, predicate, what):
+        with self.changed:
+            if not self.changed.wait_for(predicate, self.timeout):
+                raise Failure("timeout: %s" % what)
+        if self.closed and self.closed != "game over" and what != "game end":
+            raise Failure("closed: %s" % self.closed)
+
+    def settle(self, quiet=0.1):
+        """Wait for output to start and then stop for ``quiet`` seconds."""
+        self.wait(lambda: self.messages or self.closed, "first byte")
+        with self.changed:
+            while not self.closed and time.perf_counter() - self.last < quiet:
+                self.changed.wait(quiet)
+
+    def arrival(self, size=0):
+        with self.changed:
+            self.received += size
+            self.messages += 1
+            self.last = time.perf_counter()
+            self.changed.notify_all()
+
+    def on_output(self, data):
+        self.arrival(len(data))
+        return True if self.ack else None
+
+    def on_replay(self, replay):
+        self.received = replay["offset"]
+        self.arrival(len(replay["data"]))
+
+    def on_event(self, event):
+        self.arrival(event.get("size", 0))
+
+    def on_session(self, info):
+        with self.changed:
+            self.token = info["token"]
+            self.changed.notify_all()
+
+    def on_closed(self, info):
+        with self.changed:
+            self.closed = info.get("reason") or "closed"
+            self.changed.notify_all()
+
+
+def cycle(kind, url, timeout):
+    """Run one cycle of ``kind``."""
+    answers = PATHS["escape"]
+    browser = Browser(url, timeout, ack=kind != "scene")
+    browser.connect()
+    try:
+        if kind == "abort":
+            return
+        browser.settle()
+        if kind == "input":
+            for answer in answers[: random.randint(1, 2)]:
+                browser.send(answer)
+                browser.settle()
+        elif kind == "scene":
+            browser.send(answers[0])
+            seen = browser.messages
+            browser.send(answers[1])
+            # Leave as soon as the game starts answering.
+            browser.wait(lambda: browser.messages > seen, "reply")
+        elif kind == "reconnect":
+            browser.send(answers[0])
+            browser.settle()
+            browser.wait(lambda: browser.token, "session")
+            token, offset = browser.token, browser.received
+            browser.disconnect()
+            browser = Browser(url, timeout)
+            browser.connect({"token": token, "offset": offset})
+            browser.wait(lambda: browser.token, "resume")
+            if browser.token != token:
+                raise Failure("not resumed")
+            browser.send(answers[1])
+            browser.settle()
+        elif kind == "finish":
+            for answer in answers:
+                browser.send(answer)
+                browser.settle()
+            browser.wait(lambda: browser.closed, "game end")
+    finally:
+        browser.disconnect()
+
+
+def run_batch(url, count, options, done):
+    """Run ``count`` cycles on --clients clients; tallies go into ``done``."""
+    work = queue.Queue()
+    for i in range(count):
+        work.put(options.kinds[(done["cycles"] + i) % len(options.kinds)])
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                kind = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                cycle(kind, url, options.timeout)
+                failure = None
+            except Failure as exc:
+                failure = "%s: %s" % (kind, exc)
+            except Exception as exc:
+                failure = "%s: error: %s" % (kind, type(exc).__name__)
+            with lock:
+                done["cycles"] += 1
+                done["kinds"][kind] += 1
+                if failure:
+                    done["failures"][failure] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(options.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def descendants(root):
+    """(live, zombie) pids of every process descended from ``root``."""
+    parents = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open("/proc/%s/stat" % name, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        fields = data[data.rfind(b")") + 2:].split()
+        parents[int(name)] = (int(fields[1]), fields[0].decode())
+    live, zombies = [], []
+    family = {root}
+    # Parents come before children only by accident, so sweep to a fixpoint.
+    grown = True
+    while grown:
+        grown = False
+        for pid, (ppid, state) in parents.items():
+            if ppid in family and pid not in family:
+                family.add(pid)
+                (zombies if state == "Z" else live).append(pid)
+                grown = True
+    return live, zombies
+
+
+def readyz(url):
+    try:
+        with urllib.request.urlopen(url + "/readyz", timeout=5) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as exc:
+        return json.load(exc)
+    except OSError:
+        return {}
+
+
+def measure(server, url, options, baseline):
+    """Wait for the server to be idle again, then take a checkpoint.
+
+    The baseline waits out engine.io's ping interval: every closed
+    connection leaves a greenlet asleep in its ping loop until then.
+    Later checkpoints wait, up to --settle seconds, for the counts to
+    come back down to the baseline.
+    """
+    deadline = time.monotonic() + options.settle
+    while True:
+        point = snapshot(server, url)
+        idle = point["sessions"] == 0 and not point["zombies"]
+        if baseline is None:
+            if idle:
+                time.sleep(PING_INTERVAL + options.metrics_interval * 2)
+                return snapshot(server, url)
+        elif idle and not leaks(point, baseline, options):
+            return point
+        if time.monotonic() > deadline:
+            return point
+        time.sleep(options.metrics_interval)
+
+
+def snapshot(server, url):
+    live, zombies = descendants(server.pid)
+    stat = proc_stat(server.pid)
+    return {
+        "sessions": readyz(url).get("sessions"),
+        "fds": open_fds(server.pid),
+        "threads": os_threads(server.pid),
+        "greenlets": int(scrape(url, {"greenlets": "pyxterm_server_greenlets"}).get("greenlets", -1)),
+        "rss": stat[2] if stat else None,
+        "children": len(live),
+        "zombies": len(zombies),
+    }
+
+
+def leaks(point, baseline, options):
+    """What ``point`` has that ``baseline`` did not, beyond the slack."""
+    found = []
+    if point["sessions"]:
+        found.append("sessions %d" % point["sessions"])
+    if point["zombies"]:
+        found.append("zombies %d" % point["zombies"])
+    for key in ("fds", "threads", "greenlets", "children"):
+        if point[key] is not None and point[key] - baseline[key] > options.slack:
+            found.append("%s +%d" % (key, point[key] - baseline[key]))
+    if point["rss"] - baseline["rss"] > options.rss_slack * 1048576:
+        found.append("rss +%.1f MiB" % ((point["rss"] - baseline["rss"]) / 1048576))
+    return found
+
+
+def version():
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=here, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(point, leaked):
+    print(
+        "%8d %7.0f %6d %5d %7d %9d %8d %7d %8.1f  %s"
+        % (
+            point["cycles"],
+            point["seconds"],
+            sum(point["failures"].values()),
+            point["fds"],
+            point["threads"],
+            point["greenlets"],
+            point["children"],
+            point["zombies"],
+            point["rss"] / 1048576,
+            ", ".join(leaked) if leaked else "ok",
+        ),
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cycles", type=int, default=10000, help="connect/disconnect cycles to run after the warmup")
+    parser.add_argument("--warmup", type=int, default=200, help="cycles run before the baseline is taken")
+    parser.add_argument("--check-every", type=int, default=1000, help="cycles between checkpoints")
+    parser.add_argument("--clients", type=int, default=8, help="clients cycling at once")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="kinds of cycle, taken in turn (%s)" % ", ".join(KINDS))
+    parser.add_argument("--server-options", default="", help='more options for main.py, e.g. "--no-zygote"')
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the server in a cycle")
+    parser.add_argument("--settle", type=float, default=60.0, help="seconds to wait for the server to go idle")
+    parser.add_argument("--slack", type=int, default=2, help="fds, threads, greenlets or games above baseline allowed")
+    parser.add_argument("--rss-slack", type=float, default=16.0, help="MiB of server RSS growth allowed")
+    parser.add_argument("--fail-fast", action="store_true", help="stop at the first checkpoint with a leak")
+    parser.add_argument("--json", metavar="FILE", help="also write the report here, to compare versions")
+    options = parser.parse_args()
+    options.kinds = options.kinds.split(",")
+    unknown = [kind for kind in options.kinds if kind not in KINDS]
+    if unknown:
+        parser.error("unknown kind %s" % ", ".join(unknown))
+    options.metrics_interval = 1.0
+    server, url = start_server(SERVER_OPTIONS + options.server_options.split())
+    done = {"cycles": 0, "kinds": collections.Counter(), "failures": collections.Counter()}
+    started = time.monotonic()
+    checkpoints = []
+    leaked_any = False
+    try:
+        print("soaking %s (pid %d), %s" % (url, server.pid, ",".join(options.kinds)))
+        print(
+            "%8s %7s %6s %5s %7s %9s %8s %7s %8s  %s"
+            % ("cycles", "seconds", "failed", "fds", "threads", "greenlets", "children", "zombies", "rss MiB", "leaks")
+        )
+        run_batch(url, options.warmup, options, done)
+        baseline = None
+        total = options.warmup + options.cycles
+        while True:
+            point = measure(server, url, options, baseline)
+            point.update(
+                cycles=done["cycles"],
+                seconds=time.monotonic() - started,
+                failures=dict(done["failures"]),
+            )
+            if baseline is None:
+                baseline = point
+            leaked = leaks(point, baseline, options)
+            point["leaks"] = leaked
+            checkpoints.append(point)
+            report(point, leaked)
+            leaked_any = leaked_any or bool(leaked)
+            if done["cycles"] >= total or (leaked and options.fail_fast):
+                break
+            run_batch(url, min(options.check_every, total - done["cycles"]), options, done)
+    finally:
+        server.terminate()
+        server.wait()
+    for failure, count in done["failures"].most_common():
+        print("%8d x %s" % (count, failure))
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(
+                {
+                    "version": version(),
+                    "options": vars(options),
+                    "cycles": dict(done["kinds"]),
+                    "failures": dict(done["failures"]),
+                    "baseline": checkpoints[0],
+                    "checkpoints": checkpoints,
+                },
+                f,
+                indent=2,
+            )
+    return 1 if leaked_any else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
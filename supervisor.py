@@ -0,0 +1,226 @@
+"""Keeps track of game children: reaping, kill escalation and resource limits.
+
+Nothing here ever blocks the event loop. Each child gets a pidfd (Linux
+5.3+) registered with the reactor, which becomes readable the moment the
+process exits; our own children are then reaped with a non-blocking
+waitpid. Children forked by the zygote are reaped by the zygote itself,
+the pidfd just tells us they are gone. Where pidfds are not available a
+SIGCHLD handler (own children, through a wakeup pipe) and a slow poll
+(zygote children) take their place.
+
+terminate() sends SIGTERM to the child's process group (every game child
+is a session leader) and comes back with SIGKILL if anything in the group
+is still alive after a timeout. apply_limits() runs inside a freshly forked
+child to cap its address space, CPU time and process count.
+"""
+import logging
+import os
+import resource
+import signal
+import threading
+import time
+
+# Name used in limits dicts -> resource constant.
+LIMITS = {
+    "as": resource.RLIMIT_AS,
+    "cpu": resource.RLIMIT_CPU,
+    "nproc": resource.RLIMIT_NPROC,
+}
+
+
+def apply_limits(limits):
+    """Set hard resource limits on the calling process (call in the child).
+
+    ``limits`` maps "as" (bytes), "cpu" (seconds) and "nproc" (processes
+    for this user) to a value; missing or 0 entries are left alone. The CPU
+    limit is soft with a few seconds of grace, so the game gets SIGXCPU
+    before the kernel's SIGKILL.
+    """
+    for name, value in (limits or {}).items():
+        if not value:
+            continue
+        soft = hard = int(value)
+        if name == "cpu":
+            hard = soft + 5
+        try:
+            resource.setrlimit(LIMITS[name], (soft, hard))
+        except (KeyError, ValueError, OSError) as exc:
+            print("could not set rlimit %s=%s: %s" % (name, value, exc), flush=True)
+
+
+class Supervisor:
+    """Watch game children from the reactor and end them without blocking."""
+
+    def __init__(self, reactor, kill_timeout=5.0):
+        self.reactor = reactor
+        self.kill_timeout = kill_timeout
+        self._children = {}  # pid -> {own, pidfd}
+        self._terminating = set()
+        self._stopping = {}  # pid -> when terminate() was called
+        # Called with the seconds from terminate() to a child being gone.
+        self.on_stopped = None
+        self._lock = threading.Lock()
+        self._use_pidfd = hasattr(os, "pidfd_open")
+        self._poll_timer = None
+        # Written to by the SIGCHLD handler, read on the reactor.
+        self._wakeup = None
+        self._listening = False
+        if not self._use_pidfd:
+            try:
+                signal.signal(signal.SIGCHLD, self._on_sigchld)
+                self._wakeup = os.pipe()
+                for fd in self._wakeup:
+                    os.set_blocking(fd, False)
+            except ValueError:
+                # Not the main thread; the poll timer still reaps.
+                pass
+
+    @property
+    def count(self):
+        return len(self._children)
+
+    def pids(self):
+        return list(self._children)
+
+    def watch(self, pid, own=True):
+        """Start tracking ``pid``; ``own`` is False for zygote children."""
+        child = {"own": own, "pidfd": None}
+        if self._use_pidfd:
+            try:
+                child["pidfd"] = os.pidfd_open(pid)
+            except OSError:
+                # Already gone (or pidfds unsupported by this kernel).
+                pass
+        with self._lock:
+            self._children[pid] = child
+        if child["pidfd"] is not None:
+            self.reactor.add_reader(child["pidfd"], lambda _fd: self._check(pid, exited=True))
+        else:
+            if self._wakeup and not self._listening:
+                self._listening = True
+                self.reactor.add_reader(self._wakeup[0], self._on_wakeup)
+            self.reactor.call_later(0, lambda: self._check(pid))
+            self._ensure_polling()
+
+    def terminate(self, pid):
+        """Ask ``pid``'s group to exit now and force it after ``kill_timeout``."""
+        if pid not in self._children or pid in self._terminating:
+            return
+        self._terminating.add(pid)
+        self._stopping.setdefault(pid, time.monotonic())
+        self._signal(pid, signal.SIGTERM)
+        self.reactor.call_later(self.kill_timeout, lambda: self._escalate(pid))
+
+    def _escalate(self, pid):
+        self._terminating.discard(pid)
+        # Once forgotten, the pid may already belong to someone else.
+        if pid not in self._children:
+            return
+        if not self._signal(pid, 0):
+            return
+        logging.warning("pid %s still running %ss after SIGTERM; killing it", pid, self.kill_timeout)
+        self._signal(pid, signal.SIGKILL)
+
+    def _signal(self, pid, signum):
+        """Signal tracked ``pid`` and its process group; False if both are gone.
+
+        The pidfd goes first: it is race-free even if the pid has been
+        recycled. The group (the game's own children) is signalled too.
+        """
+        child = self._children.get(pid)
+        if child is None:
+            return False
+        sent = False
+        if child["pidfd"] is not None:
+            try:
+                signal.pidfd_send_signal(child["pidfd"], signum)
+                sent = True
+            except OSError:
+                # The leader is gone; what it left in its group may not be.
+                pass
+        try:
+            os.killpg(pid, signum)
+            return True
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            return sent
+        if child["pidfd"] is not None:
+            return sent
+        try:
+            os.kill(pid, signum)
+            return True
+        except OSError:
+            return False
+
+    def _check(self, pid, exited=False):
+        """Reap or notice ``pid`` if it has exited; True once it is gone.
+
+        ``exited`` is set when the child's pidfd became readable.
+        """
+        child = self._children.get(pid)
+        if child is None:
+            return True
+        if child["own"]:
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, None
+            if not done:
+                return False
+            if status is not None:
+                logging.info("child pid %s exited with status %s", pid, os.waitstatus_to_exitcode(status))
+        elif not exited:
+            # Not ours to wait for: gone once the zygote has reaped it.
+            try:
+                os.kill(pid, 0)
+                return False
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                return False
+        self._forget(pid)
+        return True
+
+    def _forget(self, pid):
+        with self._lock:
+            child = self._children.pop(pid, None)
+        if child is None:
+            return
+        if child["pidfd"] is not None:
+            self.reactor.remove_reader(child["pidfd"])
+            os.close(child["pidfd"])
+        stopping = self._stopping.pop(pid, None)
+        if stopping is not None and self.on_stopped:
+            self.on_stopped(time.monotonic() - stopping)
+
+    def _on_sigchld(self, signum, frame):
+        # Signal context: no locks (call_later takes one), just wake the
+        # reactor through the pipe.
+        try:
+            os.write(self._wakeup[1], b"\0")
+        except BlockingIOError:
+            # A wakeup is already pending.
+            pass
+
+    def _on_wakeup(self, fd):
+        try:
+            while os.read(fd, 512):
+                pass
+        except BlockingIOError:
+            pass
+        self._check_all()
+
+    def _check_all(self):
+        for pid in list(self._children):
+            self._check(pid)
+
+    def _ensure_polling(self):
+        if self._poll_timer is None:
+            self._poll_timer = self.reactor.call_later(1.0, self._poll)
+
+    def _poll(self):
+        self._poll_timer = None
+        self._check_all()
+        if self._children:
+            self._ensure_polling()
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+
+# The modules under test live at the top of the repository.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# A fake reactor (timers run only when a test says so) and a recorded
+# socketio.emit, for driving main.py's session pipeline without a server.
+
+
+class FakeTimer:
+    def __init__(self, callback):
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeReactor:
+    def __init__(self):
+        self.timers = []
+
+    def call_later(self, delay, callback):
+        timer = FakeTimer(callback)
+        self.timers.append(timer)
+        return timer
+
+    def run(self):
+        while self.timers:
+            timer = self.timers.pop(0)
+            if not timer.cancelled:
+                timer.callback()
+
+    def add_reader(self, fd, callback):
+        pass
+
+    def remove_reader(self, fd):
+        pass
+
+
+class Server:
+    """main.py with its reactor and socket replaced by fakes."""
+
+    def __init__(self, main, monkeypatch):
+        self.main = main
+        self.reactor = FakeReactor()
+        self.sent = []  # (sid, event, data)
+        monkeypatch.setattr(main, "reactor", self.reactor)
+        monkeypatch.setattr(main.socketio, "emit", self.emit)
+        monkeypatch.setattr(main.socketio.server.manager, "is_connected", lambda sid, namespace: True)
+        config = main.app.config
+        for name in ("clients", "sessions", "browsers"):
+            monkeypatch.setitem(config, name, {})
+        # Output stays in the coalescer until the test flushes it.
+        monkeypatch.setitem(config, "coalesce_window", 60.0)
+        monkeypatch.setitem(config, "minimize_sgr", False)
+
+    def emit(self, event, data=None, namespace=None, to=None, callback=None):
+        self.sent.append((to, event, data))
+
+    def connect(self, sid, auth=None):
+        self.main.register_browser(sid, auth or {})
+
+    def start(self, sid, auth=None):
+        """A session attached to ``sid`` with nothing behind its pipeline."""
+        self.connect(sid, auth)
+        client = self.main.new_session(sid, None, None)
+        self.main.build_pipeline(client, lambda: None, lambda: None)
+        return client
+
+    def detach(self, client):
+        self.main.app.config["clients"].pop(client["sid"], None)
+        client["sid"] = None
+
+    def received(self, sid, event):
+        return [data for to, name, data in self.sent if to == sid and name == event]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    main = pytest.importorskip("main")
+    return Server(main, monkeypatch)
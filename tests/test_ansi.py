@@ -0,0 +1,124 @@
+"""SGRMinimizer must not change what a terminal shows, however reads split."""
+import random
+import re
+
+from ansi import SGRMinimizer
+
+# A CSI sequence, any other two-byte escape, or one character.
+_token = re.compile(rb"\x1b\[[0-?]*[ -/]*[@-~]|\x1b.|.", re.S)
+
+
+def render(data):
+    """What a terminal would show: each character or other escape with its attributes.
+
+    A model independent of ansi.py. SGR codes it does not know are
+    dropped, as terminals do; every other sequence is kept in place
+    with the attributes current at that point.
+    """
+    attrs = {}
+    saved = {}
+    shown = []
+    for token in _token.findall(data):
+        if token.startswith(b"\x1b[") and token.endswith(b"m") and token[2:3] not in b"<=>?":
+            codes = [int(code or 0) for code in token[2:-1].split(b";")]
+            while codes:
+                code = codes.pop(0)
+                if code == 0:
+                    attrs = {}
+                elif 1 <= code <= 9:
+                    attrs[code] = True
+                elif code == 22:
+                    attrs.pop(1, None)
+                    attrs.pop(2, None)
+                elif 23 <= code <= 29:
+                    attrs.pop(code - 20, None)
+                elif 30 <= code <= 37 or 90 <= code <= 97:
+                    attrs["fg"] = code
+                elif 40 <= code <= 47 or 100 <= code <= 107:
+                    attrs["bg"] = code
+                elif code in (39, 49):
+                    attrs.pop("fg" if code == 39 else "bg", None)
+                elif code in (38, 48):
+                    size = 1 if codes[:1] == [5] else 3
+                    attrs["fg" if code == 38 else "bg"] = tuple(codes[: size + 1])
+                    del codes[: size + 1]
+            continue
+        if token == b"\x1b7":
+            saved = dict(attrs)
+        elif token == b"\x1b8":
+            attrs = dict(saved)
+        elif token in (b"\x1bc", b"\x1b[!p"):
+            attrs = {}
+        shown.append((token, tuple(sorted(attrs.items(), key=str))))
+    return shown
+
+
+def game_output(rng, size):
+    """Output shaped like game.py's: colour changes every few characters."""
+    pieces = [
+        b"\x1b[0m",
+        b"\x1b[m",
+        b"\x1b[0m\x1b[31m\x1b[1m",
+        b"\x1b[0;32;1m",
+        b"\x1b[33m",
+        b"\x1b[4m",
+        b"\x1b[24m",
+        b"\x1b[22m",
+        b"\x1b[7;44m",
+        b"\x1b[38;5;208m",
+        b"\x1b[48;2;10;20;30m",
+        b"\x1b[39;49m",
+        b"\x1b[58;5;3m",  # underline colour: not modelled by the minimizer
+        b"\x1b[2J\x1b[H",
+        b"\x1b[?25l",
+        b"\x1b7",
+        b"\x1b8",
+        b"\x1b[K",
+        b"\r\n",
+        "█░ café ".encode(),
+        b"You are at a junction. ",
+    ]
+    out = bytearray()
+    while len(out) < size:
+        out += rng.choice(pieces)
+        out += bytes(rng.choice(b"abc .") for _ in range(rng.randrange(0, 4)))
+    return bytes(out)
+
+
+def minimized(data, cuts):
+    sgr = SGRMinimizer()
+    out = bytearray()
+    start = 0
+    for cut in cuts + [len(data)]:
+        out += sgr.feed(data[start:cut])
+        start = cut
+    return bytes(out + sgr.flush())
+
+
+def test_random_splits_render_the_same():
+    rng = random.Random(1234)
+    for _ in range(200):
+        data = game_output(rng, rng.randrange(50, 2000))
+        expected = render(data)
+        assert render(minimized(data, [])) == expected
+        for _ in range(5):
+            cuts = sorted(rng.sample(range(1, len(data)), rng.randrange(1, min(40, len(data) - 1))))
+            assert render(minimized(data, cuts)) == expected, cuts
+
+
+def test_split_at_every_byte():
+    data = game_output(random.Random(99), 400)
+    assert render(minimized(data, list(range(1, len(data))))) == render(data)
+
+
+def test_redundant_sequences_are_dropped():
+    sgr = SGRMinimizer()
+    out = sgr.feed(b"\x1b[0m\x1b[31m\x1b[1ma\x1b[0m\x1b[31m\x1b[1mb")
+    assert out == b"\x1b[1;31mab"
+
+
+def test_flush_returns_a_split_escape():
+    sgr = SGRMinimizer()
+    assert sgr.feed(b"abc\x1b[3") == b"abc"
+    assert sgr.flush() == b"\x1b[3"
+    assert sgr.flush() == b""
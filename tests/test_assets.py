@@ -0,0 +1,36 @@
+"""The on-disk asset cache and looking assets up by id."""
+import pytest
+
+assets = pytest.importorskip("assets")
+
+
+def test_compiling_an_asset_prunes_its_stale_cache_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "CACHE_DIR", str(tmp_path))
+    for name in ("title.0123456789abcdef.bin", "credits.0123456789abcdef.bin", "titles.0123456789abcdef.bin"):
+        (tmp_path / name).write_bytes(b"old")
+
+    data = assets._load("title")
+
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert "title.0123456789abcdef.bin" not in names
+    assert "credits.0123456789abcdef.bin" in names
+    assert "titles.0123456789abcdef.bin" in names
+    (current,) = [name for name in names if name.startswith("title.")]
+    assert (tmp_path / current).read_bytes() == data
+    # A second start finds it without compiling or pruning anything.
+    assert assets._load("title") == data
+    assert sorted(path.name for path in tmp_path.iterdir()) == names
+
+
+def test_unknown_ids_load_the_assets_once(monkeypatch):
+    monkeypatch.setattr(assets, "_ids", {})
+    monkeypatch.setattr(assets, "_preloaded", False)
+    calls = []
+    preload = assets.preload
+    monkeypatch.setattr(assets, "preload", lambda: calls.append(1) or preload())
+
+    assert assets.find("0000000000000000") is None
+    assert assets.find("0000000000000000") is None
+    assert assets.find("ffffffffffffffff") is None
+    assert calls == [1]
+    assert assets.find(assets.asset_id("title")) == assets.printed_bytes("title")
@@ -0,0 +1,109 @@
+"""A replay with cached assets cut out expands back to the scrollback.
+
+The browser is modelled after index.html: ``storeAsset`` keeps at most
+MAX_ASSETS, evicting the oldest, and ``expandAssets`` puts each cached
+asset back at its position in the replay.
+"""
+import json
+
+import pytest
+
+assets = pytest.importorskip("assets")
+
+MAX_ASSETS = 64
+
+
+class Browser:
+    def __init__(self, cache=None):
+        self.cache = dict(cache or {})
+
+    def store(self, digest, data):
+        if digest in self.cache:
+            return
+        if len(self.cache) >= MAX_ASSETS:
+            del self.cache[next(iter(self.cache))]
+        self.cache[digest] = data.decode("utf-8") if isinstance(data, bytes) else data
+
+    def learn(self, server, sid):
+        for event in server.received(sid, "game-event"):
+            if event["type"] == "asset" and "data" in event:
+                self.store(event["id"], event["data"])
+
+    def auth(self):
+        return {"assets": list(self.cache)}
+
+    def expand(self, data, refs):
+        parts = []
+        pos = 0
+        for at, digest in refs:
+            parts += [data[pos:at], self.cache.get(digest, "").encode()]
+            pos = at
+        parts.append(data[pos:])
+        return b"".join(parts)
+
+
+def frame(name):
+    event = {"type": "asset", "id": assets.asset_id(name)}
+    return b"\x1b_game:" + json.dumps(event).encode() + b"\x1b\\"
+
+
+def play(server, client, *items):
+    """Feed output, with asset names standing for their frames."""
+    for item in items:
+        server.main.forward_output(client, frame(item) if isinstance(item, str) else item)
+    server.main.flush_output(client)
+
+
+def replay_of(server, client, browser, sid, offset):
+    server.detach(client)
+    server.connect(sid, browser.auth())
+    server.main.resume_session(client, sid, offset)
+    (replay,) = server.received(sid, "pty-replay")
+    return replay
+
+
+def test_cached_assets_are_cut_and_expand_back(server):
+    client = server.start("a")
+    browser = Browser()
+    play(server, client, b"\x1b[32mhello\r\n", "title", b"between\r\n", "startMap", b"end\r\n")
+    browser.learn(server, "a")
+
+    replay = replay_of(server, client, browser, "b", 0)
+    assert [digest for _, digest in replay["assets"]] == [assets.asset_id("title"), assets.asset_id("startMap")]
+    assert len(replay["data"]) < client["scrollback"].total - len(assets.printed_bytes("title"))
+    assert browser.expand(replay["data"], replay["assets"]) == client["scrollback"].since(0)
+
+
+def test_evicted_asset_is_replayed_inline(server):
+    client = server.start("a")
+    browser = Browser()
+    play(server, client, b"one\r\n", "title", b"two\r\n", "aliens", b"three\r\n")
+    browser.learn(server, "a")
+    # Filling the cache pushes out the oldest entry, the title.
+    for n in range(MAX_ASSETS - 1):
+        browser.store("%016x" % n, "x")
+    assert assets.asset_id("title") not in browser.cache
+
+    replay = replay_of(server, client, browser, "b", 0)
+    assert [digest for _, digest in replay["assets"]] == [assets.asset_id("aliens")]
+    assert assets.printed_bytes("title") in replay["data"]
+    assert browser.expand(replay["data"], replay["assets"]) == client["scrollback"].since(0)
+
+
+def test_asset_partly_trimmed_from_the_scrollback_is_replayed_inline(server, monkeypatch):
+    monkeypatch.setitem(server.main.app.config, "scrollback_bytes", 1)
+    client = server.start("a")
+    block = client["scrollback"].block_size
+    browser = Browser()
+    # The credits straddle the first block, which is dropped; the title
+    # after them is still whole.
+    play(server, client, b"\x1b[31m" + b"x" * (block - 100), "credits", b"\x1b[0mok\r\n", "title")
+    browser.learn(server, "a")
+    scrollback = client["scrollback"]
+    assert scrollback.start == block
+
+    replay = replay_of(server, client, browser, "b", -1)
+    assert replay["reset"]
+    assert [digest for _, digest in replay["assets"]] == [assets.asset_id("title")]
+    expected = scrollback.prologue + scrollback.since(scrollback.start)
+    assert browser.expand(replay["data"], replay["assets"]) == expected
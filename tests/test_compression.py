@@ -0,0 +1,77 @@
+"""A dictionary-compressed connection inflates back to exactly what was sent.
+
+Output, game events and a resume replay share one deflate stream per
+browser connection, in the order they are emitted.
+"""
+import json
+import zlib
+
+import pytest
+
+compression = pytest.importorskip("compression")
+
+
+def frame(event):
+    return b"\x1b_game:" + json.dumps(event).encode() + b"\x1b\\"
+
+
+def inflate(server, sid):
+    """Each message to ``sid`` in order: (event, inflated payload)."""
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS, zdict=compression.dictionary())
+    messages = []
+    for to, event, data in server.sent:
+        if to != sid:
+            continue
+        if event == "pty-output":
+            messages.append((event, inflater.decompress(data)))
+        elif event == "game-event":
+            messages.append((event, json.loads(inflater.decompress(data))))
+        elif event == "pty-replay":
+            messages.append((event, dict(data, data=inflater.decompress(data["data"]))))
+    return messages
+
+
+@pytest.fixture
+def dictionary(server, monkeypatch):
+    monkeypatch.setitem(server.main.app.config, "compression", "dictionary")
+    return {"dictionary": compression.dictionary_id()}
+
+
+def test_stream_inflates_to_the_output_and_events(server, dictionary):
+    main = server.main
+    client = server.start("a", dictionary)
+    assert client["deflate"] is not None
+    title = {"type": "title", "name": "junction1:"}
+    output = [b"You are in a maze.\r\n", b"\x1b[1;33mWhich way?\x1b[0m ", b"north\r\n" * 50]
+    main.forward_output(client, output[0] + frame(title) + output[1])
+    client["out"].flush()
+    main.forward_output(client, output[2])
+    client["out"].flush()
+
+    messages = inflate(server, "a")
+    assert b"".join(data for event, data in messages if event == "pty-output") == b"".join(output)
+    assert [data for event, data in messages if event == "game-event"] == [title]
+
+
+def test_replay_after_reconnect_inflates_to_the_scrollback(server, dictionary):
+    main = server.main
+    client = server.start("a", dictionary)
+    main.forward_output(client, b"before the drop\r\n")
+    client["out"].flush()
+    server.detach(client)
+    main.forward_output(client, b"while away\r\n" + frame({"type": "title", "name": "junction2:"}))
+    main.forward_output(client, b"still batched\r\n")
+
+    server.connect("b", dictionary)
+    main.resume_session(client, "b", len(b"before the drop\r\n"))
+    main.forward_output(client, b"after\r\n")
+    client["out"].flush()
+
+    messages = inflate(server, "b")
+    assert [event for event, _ in messages] == ["pty-replay", "game-event", "pty-output"]
+    replay = messages[0][1]
+    assert not replay["reset"]
+    assert replay["data"] == b"while away\r\nstill batched\r\n"
+    assert messages[1][1]["type"] == "snapshot"
+    assert messages[2][1] == b"after\r\n"
+    assert replay["data"] + messages[2][1] == client["scrollback"].since(replay["offset"])
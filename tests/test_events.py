@@ -0,0 +1,115 @@
+"""FrameParser must find the same output and events however reads split."""
+import json
+
+from events import FrameParser, frame
+
+
+def parse(chunks):
+    """Feed ``chunks`` in turn; returns the output and events, merged."""
+    parser = FrameParser()
+    items = []
+    for chunk in chunks:
+        items.extend(parser.feed(chunk))
+    items.append(parser.flush())
+    merged = []
+    for item in items:
+        if isinstance(item, bytes) and merged and isinstance(merged[-1], bytes):
+            merged[-1] += item
+        elif item != b"":
+            merged.append(item)
+    return merged
+
+
+def stream():
+    title = {"type": "title", "name": "junction1:"}
+    scene = {"type": "scene", "steps": [[0, "It is dark.\n"], [1.5, "\x1b[31mA noise!\x1b[0m"]]}
+    data = (
+        b"\x1b[1mWelcome\x1b[0m\r\n"
+        + frame(title).encode()
+        + "café \x1b_other\x1b\\ ".encode()
+        + frame(scene).encode()
+        + frame(title).encode()
+        + b"Left or right? "
+    )
+    return data, [
+        "\x1b[1mWelcome\x1b[0m\r\n".encode(),
+        title,
+        "café \x1b_other\x1b\\ ".encode(),
+        scene,
+        title,
+        b"Left or right? ",
+    ]
+
+
+def test_whole_stream():
+    data, expected = stream()
+    assert parse([data]) == expected
+
+
+def test_split_at_every_boundary():
+    data, expected = stream()
+    for cut in range(1, len(data)):
+        assert parse([data[:cut], data[cut:]]) == expected, cut
+
+
+def test_split_into_single_bytes():
+    data, expected = stream()
+    assert parse([data[i:i + 1] for i in range(len(data))]) == expected
+
+
+def test_frame_split_across_many_reads():
+    event = {"type": "lives", "lives": 2, "text": "x" * 5000}
+    data = b"before" + frame(event).encode() + b"after"
+    chunks = [data[i:i + 700] for i in range(0, len(data), 700)]
+    assert parse(chunks) == [b"before", event, b"after"]
+
+
+def test_malformed_frame_is_passed_on():
+    assert parse([b"a\x1b_game:{nope\x1b\\b"]) == [b"a\x1b_game:{nope\x1b\\b"]
+
+
+def test_frame_that_is_not_an_object_is_passed_on():
+    for body in (b"5", b'"text"', b"[1, 2]", b"null"):
+        data = b"a\x1b_game:" + body + b"\x1b\\" + frame({"type": "title"}).encode() + b"b"
+        for cut in range(1, len(data)):
+            assert parse([data[:cut], data[cut:]]) == [
+                b"a\x1b_game:" + body + b"\x1b\\",
+                {"type": "title"},
+                b"b",
+            ], (body, cut)
+
+
+def test_bad_frames_do_not_stop_the_output(server):
+    main = server.main
+    client = server.start("a")
+    data = (
+        b"one\x1b_game:5\x1b\\two"
+        + frame({"type": "scene", "steps": [1, [0.5], ["x", "y"], [0.5, "ok"]]}).encode()
+        + frame({"type": "scene", "steps": 3}).encode()
+        + b"three"
+    )
+    main.forward_output(client, data)
+    client["out"].flush()
+    output = b"".join(server.received("a", "pty-output"))
+    assert output.replace(b"\x1b_game:5\x1b\\", b"") == b"onetwothree"
+    scenes = server.received("a", "game-event")
+    assert [scene["steps"] for scene in scenes] == [[[0.5, "ok"]], []]
+
+
+def test_flush_drops_an_unfinished_frame():
+    parser = FrameParser()
+    assert parser.feed(b"bye" + frame({"type": "title"}).encode()[:10]) == [b"bye"]
+    assert parser.flush() == b""
+
+
+def test_flush_returns_a_possible_prefix():
+    parser = FrameParser()
+    assert parser.feed(b"bye\x1b_ga") == [b"bye"]
+    assert parser.flush() == b"\x1b_ga"
+    assert parser.flush() == b""
+
+
+def test_frame_json_never_contains_esc():
+    encoded = frame({"type": "scene", "steps": [[0, "\x1b[31mred"]]})
+    assert encoded.count("\x1b") == 2
+    assert json.loads(encoded[len("\x1b_game:"):-2])["steps"][0][1] == "\x1b[31mred"
@@ -0,0 +1,23 @@
+"""Keystroke echo on loopback must stay well under Nagle's ~40 ms delay.
+
+Runs loadtest.py, which starts main.py and plays one scripted game, in
+its own process: the other tests import main.py, and its eventlet
+monkey patching would also patch the Socket.IO client here.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("websocket")
+pytest.importorskip("requests")
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_echo_is_fast():
+    # ~8 ms with TCP_NODELAY, ~50 ms without.
+    command = [sys.executable, "loadtest.py", "--start", "", "--ramp", "1", "--paths", "escape", "--max-echo-ms", "25"]
+    result = subprocess.run(command, cwd=HERE, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout
@@ -0,0 +1,59 @@
+"""Line mode: when the server re-reads the pty's mode, and what it reports."""
+import os
+import termios
+import tty
+
+import pytest
+
+
+@pytest.fixture
+def pty_session(server):
+    master, slave = os.openpty()
+    client = server.start("a")
+    client["fd"] = master
+    yield client, slave
+    os.close(master)
+    os.close(slave)
+
+
+def modes(server):
+    return server.received("a", "pty-mode")
+
+
+def grant_line_mode(server, client):
+    server.main.check_pty_mode(client)
+    assert server.main.app.config["clients"]["a"] is client
+    client["line_mode"] = True
+    server.main.set_echo(client["fd"], False)
+
+
+def test_idle_line_mode_is_not_polled(server, pty_session):
+    client, _ = pty_session
+    grant_line_mode(server, client)
+    server.main.poll_pty_mode(client)
+    assert server.reactor.timers == []
+
+
+def test_pending_line_is_polled_until_the_child_goes_raw(server, pty_session):
+    client, slave = pty_session
+    grant_line_mode(server, client)
+    client["line_pending"] = True
+    server.main.poll_pty_mode(client)
+    assert len(server.reactor.timers) == 1
+    # The child goes raw without printing anything.
+    tty.setraw(slave)
+    server.reactor.run()
+    assert not client["line_mode"]
+    assert modes(server)[-1] == {"canonical": False, "echo": True, "line": False}
+    # The echo the child had before line mode took it over is back.
+    assert termios.tcgetattr(client["fd"])[3] & termios.ECHO
+    assert server.reactor.timers == []
+
+
+def test_echo_off_prompt_is_reported(server, pty_session):
+    client, slave = pty_session
+    attrs = termios.tcgetattr(slave)
+    attrs[3] &= ~termios.ECHO
+    termios.tcsetattr(slave, termios.TCSANOW, attrs)
+    server.main.check_pty_mode(client)
+    assert modes(server)[-1] == {"canonical": True, "echo": False, "line": False}
@@ -0,0 +1,73 @@
+"""MapPane keeps a large maze's map right with a bounded write per move."""
+import re
+
+import pytest
+
+from mazemap import MapPane
+
+game = pytest.importorskip("game")
+
+# Nothing the pane writes should come near reprinting a 100x100 map
+# (about 100 KB): at most a redraw of its 60x11 cells.
+MAX_MOVE_BYTES = 1024
+
+_token = re.compile(r"\x1b\[(\d*);?(\d*)([HKm])|\x1b([78])|(.)", re.S)
+
+
+class Screen:
+    """The top of a terminal: cursor addressing, erase to end of line and
+    save/restore cursor. Colours are dropped."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.rows = [[" "] * width for _ in range(height)]
+        self.y = self.x = 0
+        self.saved = (0, 0)
+
+    def write(self, text):
+        for row, col, final, save, ch in _token.findall(text):
+            if final == "H":
+                self.y, self.x = int(row or 1) - 1, int(col or 1) - 1
+            elif final == "K":
+                self.rows[self.y][self.x:] = [" "] * (self.width - self.x)
+            elif save == "7":
+                self.saved = (self.y, self.x)
+            elif save == "8":
+                self.y, self.x = self.saved
+            elif ch:
+                self.rows[self.y][self.x] = ch
+                self.x += 1
+
+    def text(self):
+        return ["".join(row) for row in self.rows]
+
+
+def expected(pane, visited, here):
+    top, left = pane.origin
+    rows = [
+        [pane.map.char_at(top + y, left + x, visited) for x in range(pane.width)]
+        for y in range(pane.height)
+    ]
+    marker = pane.map.marker_at(here)
+    if marker and here in visited:
+        y, x, glyph = marker
+        if top <= y < top + pane.height and left <= x < left + pane.width:
+            rows[y - top][x - left] = glyph
+    return ["".join(row) for row in rows]
+
+
+def test_moves_through_a_large_maze_stay_small_and_correct():
+    junctions = 100
+    _, maze_map = game.generatedMaze(100, 100, junctions, 1)
+    pane = MapPane(maze_map)
+    screen = Screen(pane.width, pane.height)
+    # Walk out of the maze, then lose a life near the end: everything but
+    # the first junction is forgotten and the player is back at the start.
+    moves = [list(range(1, n + 1)) for n in range(1, junctions + 1)] + [[1]]
+    for visits in moves:
+        here = visits[-1]
+        out = pane.update(visits, here)
+        assert len(out.encode()) <= MAX_MOVE_BYTES
+        screen.write(out)
+        assert screen.text() == expected(pane, frozenset(visits), here)
+    assert len(maze_map.view(set(range(1, junctions + 1))).encode()) > 50 * MAX_MOVE_BYTES
@@ -0,0 +1,52 @@
+"""A resumed browser must end up with the session's output exactly once, in order.
+
+Sessions are driven through main.py's own pipeline by the ``server``
+fixture in conftest.py.
+"""
+
+
+def screen(server, sid):
+    """What the browser on ``sid`` has printed, following index.html's rules."""
+    shown = b""
+    for to, event, data in server.sent:
+        if to != sid:
+            continue
+        if event == "pty-output":
+            shown += data
+        elif event == "pty-replay":
+            if data["reset"]:
+                shown = b""
+            shown += data["data"]
+    return shown
+
+
+def test_resume_replays_pending_output_once_in_order(server):
+    main = server.main
+    client = server.start("a")
+    main.send_output(client, b"AAAA")
+    client["out"].flush()
+    server.detach(client)
+    main.send_output(client, b"BBBB")
+    client["out"].flush()
+    # Still batched in the coalescer when the browser comes back.
+    main.send_output(client, b"CCCC")
+    assert client["out"].pending == 4
+
+    server.connect("b")
+    main.resume_session(client, "b", 4)
+    server.reactor.run()
+
+    assert server.received("b", "pty-output") == []
+    assert [data["data"] for data in server.received("b", "pty-replay")] == [b"BBBBCCCC"]
+    assert screen(server, "a") + screen(server, "b") == b"AAAABBBBCCCC"
+
+
+def test_resume_elsewhere_replays_pending_output(server):
+    main = server.main
+    client = server.start("a")
+    main.send_output(client, b"AAAA")
+    server.connect("b")
+    main.resume_session(client, "b", 0)
+
+    assert [event for to, event, _ in server.sent if to == "a"] == ["pty-output", "pty-closed"]
+    assert screen(server, "b") == b"AAAA"
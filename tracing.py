@@ -0,0 +1,66 @@
+"""Where a traced keystroke's time went, hop by hop.
+
+With tracing on (main.py --trace-sample), the browser tags a sampled
+keystroke with an ID. The server notes when it arrived, was written to
+the PTY (or handed to the in-process game), when the first output after
+it was read back and when that output was emitted. The browser sends
+back how long the round trip took on its clock and how long term.write
+took to render the echo. The two clocks are never compared; every hop is
+a difference of two readings from the same clock:
+
+- network: the browser's round trip minus the time the server held the key;
+- input: arrival to PTY write (the input rate limit and queue);
+- game: PTY write to the echo being read (the kernel and the game);
+- output: echo read to emit (output coalescing and SGR minimising);
+- render: echo arriving in the browser to term.write finishing;
+- total: keypress to rendered echo, as the player sees it.
+"""
+
+HOPS = ("network", "input", "game", "output", "render", "total")
+
+
+def hops(trace):
+    """Seconds spent in each hop of a finished ``trace`` record."""
+    server = trace["emitted"] - trace["received"]
+    return {
+        "network": max(0.0, trace["round_trip"] - server),
+        "input": trace["written"] - trace["received"],
+        "game": trace["read"] - trace["written"],
+        "output": trace["emitted"] - trace["read"],
+        "render": trace["render"],
+        "total": trace["round_trip"] + trace["render"],
+    }
+
+
+def chrome_trace(traces):
+    """Finished traces in the Trace Event format (chrome://tracing, Perfetto).
+
+    Each keystroke is a row of spans on the server's clock. Network time
+    is split evenly between the two directions, since only the round
+    trip is known.
+    """
+    events = []
+    for trace in traces:
+        spent = hops(trace)
+        half = spent["network"] / 2
+        spans = [
+            ("network to server (est.)", trace["received"] - half, half),
+            ("input queue", trace["received"], spent["input"]),
+            ("game", trace["written"], spent["game"]),
+            ("output", trace["read"], spent["output"]),
+            ("network to browser (est.)", trace["emitted"], half),
+            ("render", trace["emitted"] + half, spent["render"]),
+        ]
+        for name, start, duration in spans:
+            events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": round(start * 1e6, 1),
+                    "dur": round(duration * 1e6, 1),
+                    "pid": trace["session"],
+                    "tid": trace["id"],
+                    "args": {"bytes": trace["bytes"]},
+                }
+            )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -0,0 +1,191 @@
+"""Fork server ("zygote") that keeps game.py imported and forks a child per session.
+
+The zygote is started once by main.py as a fresh interpreter (so it never
+sees eventlet's monkey patching), imports the game and its assets, then
+waits on a Unix socket. Each request carries the slave end of a new PTY
+and the read end of a "start" pipe; the zygote forks a child onto that PTY
+and replies with the child's pid. The child blocks on the start pipe until
+the server writes a byte to it, which lets the server keep a small pool of
+pre-forked sessions ready before any visitor arrives.
+"""
+import fcntl
+import json
+import os
+import signal
+import socket
+import sys
+import termios
+import threading
+
+
+def _reap(signum, frame):
+    """SIGCHLD handler: collect every exited child so none linger as zombies."""
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+def _run_child(ctl, slave_fd, start_fd, argv):
+    """Runs in the forked child: attach to the PTY, wait for go, play the game."""
+    ctl.close()
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    os.setsid()
+    fcntl.ioctl(slave_fd, termios.TIOCSCTTY, 0)
+    for target in (0, 1, 2):
+        os.dup2(slave_fd, target)
+    if slave_fd > 2:
+        os.close(slave_fd)
+    from supervisor import apply_limits
+
+    apply_limits(json.loads(os.environ.pop("GAME_RLIMITS", "{}")))
+
+    # Pooled children sit here until the server hands them to a visitor.
+    # EOF means the server discarded this session without using it.
+    while True:
+        try:
+            go = os.read(start_fd, 1)
+            break
+        except InterruptedError:
+            continue
+    os.close(start_fd)
+    if not go:
+        os._exit(0)
+
+    # The standard streams were set up for the zygote's own stdio; rebuild
+    # them on the PTY so print()/input() behave like a fresh interpreter.
+    sys.stdin = open(0, "r", encoding="utf-8", closefd=False)
+    sys.stdout = open(1, "w", encoding="utf-8", buffering=1, closefd=False)
+    sys.stderr = open(2, "w", encoding="utf-8", buffering=1, closefd=False)
+    sys.argv = argv
+
+    import game
+
+    code = 0
+    try:
+        game.main()
+    except SystemExit as exc:
+        code = exc.code if isinstance(exc.code, int) else 0
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+    os._exit(code)
+
+
+def serve(ctl_fd, argv):
+    """Zygote main loop: one fork per request until the server goes away."""
+    ctl = socket.socket(fileno=ctl_fd)
+    # The server may have created the pair under eventlet, which leaves
+    # our end non-blocking.
+    ctl.setblocking(True)
+    signal.signal(signal.SIGCHLD, _reap)
+    # Preload everything a session needs so children share these pages
+    # copy-on-write instead of importing them again.
+    import assets
+    import game  # noqa: F401
+
+    assets.preload()
+
+    while True:
+        try:
+            msg, fds, _, _ = socket.recv_fds(ctl, 64, 2)
+        except OSError:
+            return
+        if not msg:
+            return
+        if len(fds) != 2:
+            for fd in fds:
+                os.close(fd)
+            ctl.sendall(b"-1\n")
+            continue
+        slave_fd, start_fd = fds
+        pid = os.fork()
+        if pid == 0:
+            _run_child(ctl, slave_fd, start_fd, argv)
+        os.close(slave_fd)
+        os.close(start_fd)
+        ctl.sendall(b"%d\n" % pid)
+
+
+class ZygoteClient:
+    """Server-side handle used by main.py to start and talk to the zygote."""
+
+    def __init__(self, cwd, argv, limits=None):
+        import subprocess
+
+        self._args = (cwd, argv, limits)
+        self._sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._reader = self._sock.makefile("rb")
+        self._lock = threading.Lock()
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), str(child_sock.fileno())] + argv,
+            pass_fds=[child_sock.fileno()],
+            cwd=cwd,
+            # Limits are applied by each forked child, not the zygote
+            # itself; GAME_EVENTS has game.py send its events.
+            env=dict(os.environ, GAME_RLIMITS=json.dumps(limits or {}), GAME_EVENTS="1"),
+        )
+        child_sock.close()
+
+    def spawn(self):
+        """Fork a new game child on a fresh PTY.
+
+        Returns (master_fd, pid, start_fd); write a byte to start_fd (and
+        close it) to let the child begin playing, or just close it to
+        discard the session.
+        """
+        master_fd, slave_fd = os.openpty()
+        start_r, start_w = os.pipe()
+        try:
+            with self._lock:
+                socket.send_fds(self._sock, [b"spawn"], [slave_fd, start_r])
+                line = self._reader.readline()
+        finally:
+            os.close(slave_fd)
+            os.close(start_r)
+        pid = int(line or b"-1")
+        if pid <= 0:
+            os.close(master_fd)
+            os.close(start_w)
+            raise OSError("zygote failed to fork a session")
+        return master_fd, pid, start_w
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def restart(self):
+        """Close this zygote and start a new one with the same arguments."""
+        self.close()
+        return ZygoteClient(*self._args)
+
+    def close(self):
+        """Let the zygote exit and reap it.
+
+        Closing the socket ends its loop; children it already forked keep
+        running on their own.
+        """
+        for stream in (self._reader, self._sock):
+            try:
+                stream.close()
+            except Exception:
+                pass
+        try:
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+            self.proc.wait()
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]), ["game.py"] + sys.argv[2:])